@@ -0,0 +1,164 @@
+"""
+AI 結果快取模組 - Campus Help
+將 Gemini 的風險審查與描述優化結果存入 SQLite 側檔（與主資料庫分開，不影響 DATABASE_URL）：
+1. key 為 (prompt 版本, 模型, 種類, 分類, 正規化後的描述) 的雜湊，內容相同就命中
+2. TTL 過期 + 容量上限（淘汰最久未使用的項目）
+3. 跨程序重啟保留，多個 Streamlit 程序可共用同一個檔案
+4. 命中/未命中統計，顯示於管理員面板
+快取發生任何錯誤都只視為未命中，不影響 AI 功能本身。
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+
+def normalize_text(text):
+    """正規化描述：全形轉半形、統一大小寫、合併空白，讓只差排版的內容得到同一個 key"""
+    text = unicodedata.normalize('NFKC', text or '')
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def make_key(kind, model_name, prompt_version, category, text):
+    """快取 key：各欄位的 SHA-256"""
+    payload = json.dumps(
+        [kind, model_name, prompt_version, category or '', normalize_text(text)],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class AIResultCache:
+    """以 SQLite 檔案保存的 AI 結果快取（執行緒安全）"""
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_entries=5000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._conn = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self):
+        """第一次使用時才開檔建表"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS ai_cache (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_ai_cache_last_used_at ON ai_cache (last_used_at)")
+            self._conn = conn
+        return self._conn
+
+    def get(self, key):
+        """
+        讀取快取
+
+        Returns:
+            tuple: (是否命中, 值)
+        """
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute("SELECT value, created_at FROM ai_cache WHERE key = ?", (key,)).fetchone()
+                if row is None or row[1] + self.ttl_seconds < now:
+                    if row is not None:
+                        conn.execute("DELETE FROM ai_cache WHERE key = ?", (key,))
+                    self.misses += 1
+                    return False, None
+
+                conn.execute("UPDATE ai_cache SET last_used_at = ? WHERE key = ?", (now, key))
+                self.hits += 1
+                return True, json.loads(row[0])
+            except Exception as e:
+                print(f"⚠️ 讀取 AI 快取失敗: {e}")
+                self.misses += 1
+                return False, None
+
+    def set(self, key, kind, value):
+        """寫入快取；順便清除過期項目，超過容量時淘汰最久未使用的項目"""
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO ai_cache (key, kind, value, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+                        (key, kind, json.dumps(value, ensure_ascii=False), now, now)
+                    )
+                    conn.execute("DELETE FROM ai_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+
+                    excess = conn.execute("SELECT COUNT(*) FROM ai_cache").fetchone()[0] - self.max_entries
+                    if excess > 0:
+                        conn.execute(
+                            "DELETE FROM ai_cache WHERE key IN "
+                            "(SELECT key FROM ai_cache ORDER BY last_used_at LIMIT ?)",
+                            (excess,)
+                        )
+                        self.evictions += excess
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            except Exception as e:
+                print(f"⚠️ 寫入 AI 快取失敗: {e}")
+
+    def clear(self):
+        """清除全部項目"""
+        with self._lock:
+            try:
+                self._connect().execute("DELETE FROM ai_cache")
+            except Exception as e:
+                print(f"⚠️ 清除 AI 快取失敗: {e}")
+
+    def stats(self):
+        """命中統計（命中數即省下的 API 呼叫數）"""
+        with self._lock:
+            try:
+                rows = self._connect().execute("SELECT kind, COUNT(*) FROM ai_cache GROUP BY kind").fetchall()
+            except Exception as e:
+                print(f"⚠️ 讀取 AI 快取統計失敗: {e}")
+                rows = []
+            lookups = self.hits + self.misses
+            return {
+                'entries': sum(count for _, count in rows),
+                'entries_by_kind': dict(rows),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+if __name__ == '__main__':
+    import os
+    import tempfile
+
+    print("測試 AI 結果快取...")
+    cache = AIResultCache(os.path.join(tempfile.mkdtemp(), 'ai_cache.db'), ttl_seconds=60, max_entries=3)
+    key = make_key('risk', 'gemini-2.0-flash', 1, '日常支援', '幫忙搬宿舍行李')
+    cache.set(key, 'risk', {'risk_level': 'safe'})
+    print(f"   {cache.get(make_key('risk', 'gemini-2.0-flash', 1, '日常支援', '  幫忙搬宿舍行李'))}")
+    print(f"   {cache.stats()}")
+    cache.close()
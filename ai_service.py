@@ -4,9 +4,20 @@ AI 服務模組 - Campus Help (最終穩定版)
 1. 使用穩定模型 gemini-2.0-flash
 2. 降低 AI 溫度避免過度優化
 3. 加強 Prompt 約束力
+4. 整個程序共用一個 Gemini 模型（第一次使用時建立），每次呼叫只剩 API 請求本身
+5. 風險審查與描述優化的結果存入 AI 快取，相同內容不重複呼叫 API
+6. 風險審查與描述解析的批次版本：多則描述依 token 預算合併成少數幾個 prompt
+7. 通過關鍵字檢測後先由本地風險模型判定，只有不確定的描述才呼叫 AI
+8. 描述優化的串流版本：模型產生一段就顯示一段，不必等整段回應
 """
+import json
 import os
+import threading
 from dotenv import load_dotenv
+from ai_cache import AIResultCache, make_key
+from config import Config
+from keyword_matcher import KeywordMatcher
+from risk_classifier import RiskClassifier, classifier_text, get_classifier
 
 load_dotenv()
 
@@ -21,9 +32,165 @@ except ImportError:
     print("⚠️  警告: google-generativeai 未安裝，AI 功能將使用模擬模式")
 
 
+# ========== 共用模型 ==========
+
+_model = None
+_model_ready = False
+_model_lock = threading.Lock()
+
+
+def _create_gemini_model():
+    """設定 API Key 並建立 Gemini 模型；無法使用時回傳 None（模擬模式）"""
+    api_key = os.getenv('GEMINI_API_KEY')
+    
+    if DEMO_MODE:
+        print("⚠️ AI Demo 模式已啟用（不呼叫真實 API）")
+        return None
+    
+    if not (GEMINI_AVAILABLE and api_key):
+        print("⚠️  Gemini API Key 未設定，使用模擬模式")
+        return None
+    
+    try:
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel(
+            Config.GEMINI_MODEL,
+            generation_config={'temperature': Config.GEMINI_TEMPERATURE}
+        )
+        print(f"✅ Gemini AI 已啟用 ({Config.GEMINI_MODEL}, temperature={Config.GEMINI_TEMPERATURE})")
+        return model
+    except Exception as e:
+        print(f"⚠️  Gemini 初始化失敗: {e}")
+        return None
+
+
+_model_factory = _create_gemini_model
+
+
+def get_model():
+    """
+    取得程序共用的模型（執行緒安全，只建立一次）
+
+    Streamlit 的所有 session 共用同一個模組，因此也共用同一個模型。
+
+    Returns:
+        模型實例；未設定 API Key 或初始化失敗時為 None
+    """
+    global _model, _model_ready
+    
+    if not _model_ready:
+        with _model_lock:
+            if not _model_ready:
+                _model = _model_factory()
+                _model_ready = True
+    return _model
+
+
+def reset_model(factory=None):
+    """
+    捨棄目前的模型，下次 get_model() 時重新建立
+
+    Args:
+        factory: 建立模型的函數（測試時可傳入假模型），None 表示使用 Gemini
+    """
+    global _model, _model_ready, _model_factory
+    
+    with _model_lock:
+        _model = None
+        _model_ready = False
+        _model_factory = factory or _create_gemini_model
+
+
+# 程序共用的 AI 結果快取（第一次使用時才開檔）
+ai_cache = AIResultCache(
+    Config.AI_CACHE_PATH,
+    ttl_seconds=Config.AI_CACHE_TTL_SECONDS,
+    max_entries=Config.AI_CACHE_MAX_ENTRIES
+)
+
+
+# ========== 批次呼叫 ==========
+
+def estimate_tokens(text):
+    """粗估 token 數：中日韓文字約一字一個 token，其餘約四個字元一個 token"""
+    text = text or ''
+    wide = sum(1 for char in text if char >= '\u2e80')
+    return wide + (len(text) - wide + 3) // 4
+
+
+def split_batches(costs, token_budget, max_items):
+    """
+    依序將項目分組，每組的 token 總數不超過預算、項數不超過 max_items
+
+    單一項目就超過預算時自成一組（以單則 prompt 呼叫）。
+
+    Returns:
+        list: 每組的項目索引
+    """
+    groups, group, used = [], [], 0
+    for i, cost in enumerate(costs):
+        if group and (used + cost > token_budget or len(group) >= max_items):
+            groups.append(group)
+            group, used = [], 0
+        group.append(i)
+        used += cost
+    if group:
+        groups.append(group)
+    return groups
+
+
+def run_batched(model, items, costs, batch_call, single_call, token_budget, max_items):
+    """
+    分組呼叫模型：多於一項的組以 batch_call 一次處理，回應中缺少的項目
+    （或整組呼叫/解析失敗時的全部項目）再以 single_call 逐則處理
+
+    Args:
+        batch_call: (model, 項目列表) → 同長度的結果列表，缺少的項目為 None；失敗時拋出例外
+        single_call: (model, 項目) → 結果；失敗時拋出例外
+
+    Returns:
+        tuple: (與 items 同順序的結果，逐則也失敗的項目為該例外, 模型呼叫次數)
+    """
+    results = [None] * len(items)
+    calls = 0
+    
+    for group in split_batches(costs, token_budget, max_items):
+        if len(group) > 1:
+            calls += 1
+            try:
+                for i, result in zip(group, batch_call(model, [items[i] for i in group])):
+                    results[i] = result
+            except Exception as e:
+                print(f"⚠️ 批次呼叫失敗（{len(group)} 則），改為逐則呼叫: {e}")
+        
+        for i in group:
+            if results[i] is None:
+                calls += 1
+                try:
+                    results[i] = single_call(model, items[i])
+                except Exception as e:
+                    print(f"⚠️ 單則呼叫失敗: {e}")
+                    results[i] = e
+    
+    return results, calls
+
+
 class AIService:
     """AI 服務類別"""
     
+    # 🔧 Prompt 版本：修改 prompt 內容時遞增，舊的快取結果就不會再被使用
+    PROMPT_VERSIONS = {
+        'optimize': 1,
+        'risk': 1,
+        'risk_batch': 1
+    }
+    
+    # 🔧 批次 prompt 中每則的額外 token（編號標題 + 預期的回應長度），用於依預算分組
+    BATCH_ITEM_TOKENS = {
+        'risk': 100,
+        'parse': 120
+    }
+    
     # 敏感關鍵字清單
     DANGER_KEYWORDS = {
         'critical': [
@@ -49,27 +216,8 @@ class AIService:
     }
     
     def __init__(self):
-        """初始化 AI 服務"""
-        self.api_key = os.getenv('GEMINI_API_KEY')
-        self.model = None
-        
-        if DEMO_MODE:
-            print("⚠️ AI Demo 模式已啟用（不呼叫真實 API）")
-            return
-        
-        if GEMINI_AVAILABLE and self.api_key:
-            try:
-                genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel(
-                    'gemini-2.0-flash',
-                    generation_config={'temperature': 0.5}
-                )
-                print("✅ Gemini AI 已啟用 (gemini-2.0-flash, temperature=0.3)")
-            except Exception as e:
-                print(f"⚠️  Gemini 初始化失敗: {e}")
-                self.model = None
-        else:
-            print("⚠️  Gemini API Key 未設定，使用模擬模式")
+        """初始化 AI 服務（使用程序共用的模型）"""
+        self.model = get_model()
     
     @staticmethod
     def optimize_task_description(description):
@@ -80,17 +228,55 @@ class AIService:
                 'optimized_description': f"{description}\n\n✨ **AI 優化建議（Demo 模式）**：\n• 建議加上具體時間需求（例：週三下午2點）\n• 建議說明任務難度與所需技能\n• 建議提供聯絡方式或集合地點"
             }
         
-        service = AIService()
+        model = get_model()
         
-        if not service.model:
+        if not model:
             return {
                 'success': True,
                 'optimized_description': f"{description}\n\n💡 [AI 建議] 可以補充任務的具體要求、注意事項或期望成果，讓幫助者更容易理解。"
             }
         
+        cache_key = AIService.optimize_cache_key(description)
+        hit, optimized = ai_cache.get(cache_key)
+        if hit:
+            return {
+                'success': True,
+                'optimized_description': optimized,
+                'cached': True
+            }
+        
         try:
-            # 🔧 修改：加強 Prompt 約束，避免過度優化
-            prompt = f"""
+            response = model.generate_content(AIService.optimize_prompt(description))
+            optimized = response.text.strip()
+            
+            '''
+            # 🔧 防呆機制：如果優化結果太長（超過 2 倍），才返回建議
+            if len(optimized) > len(description) * 2.0:
+                return {
+                    'success': True,
+                    'optimized_description': f"{description}\n\n💡 **AI 建議**：可以補充具體時間、地點和預算，讓幫助者更容易評估。"
+                }
+            '''
+            
+            ai_cache.set(cache_key, 'optimize', optimized)
+            
+            return {
+                'success': True,
+                'optimized_description': optimized
+            }
+        
+        except Exception as e:
+            print(f"AI 優化失敗: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    @staticmethod
+    def optimize_prompt(description):
+        """描述優化 prompt（修改內容時請遞增 PROMPT_VERSIONS['optimize']）"""
+        # 🔧 修改：加強 Prompt 約束，避免過度優化
+        return f"""
 你是一個任務描述優化助手。請**謹慎優化**以下任務描述，保持原意並補充必要資訊。
 
 【原始描述】
@@ -113,54 +299,110 @@ class AIService:
 
 現在請優化上面的任務描述：
 """
-            
-            response = service.model.generate_content(prompt)
-            optimized = response.text.strip()
-            
-            '''
-            # 🔧 防呆機制：如果優化結果太長（超過 2 倍），才返回建議
-            if len(optimized) > len(description) * 2.0:
-                return {
-                    'success': True,
-                    'optimized_description': f"{description}\n\n💡 **AI 建議**：可以補充具體時間、地點和預算，讓幫助者更容易評估。"
-                }
-            '''
-            
-            return {
-                'success': True,
-                'optimized_description': optimized
-            }
+    
+    @staticmethod
+    def optimize_cache_key(description):
+        """描述優化結果的 AI 快取 key（串流與非串流版共用）"""
+        return make_key('optimize', Config.GEMINI_MODEL, AIService.PROMPT_VERSIONS['optimize'], None, description)
+    
+    @staticmethod
+    def stream_optimized_description(description):
+        """
+        串流版 optimize_task_description：模型每產生一段文字就 yield，頁面可以邊收邊顯示
+        
+        Demo/模擬模式與快取命中時一次 yield 全文；完整的結果寫入 AI 快取（與非串流版共用）。
+        中途失敗時 yield 錯誤說明後結束，已顯示的部分保留，不寫入快取。
+        
+        Yields:
+            str: 文字片段
+        """
+        model = None if DEMO_MODE else get_model()
+        
+        if not model:
+            yield AIService.optimize_task_description(description)['optimized_description']
+            return
+        
+        cache_key = AIService.optimize_cache_key(description)
+        hit, optimized = ai_cache.get(cache_key)
+        if hit:
+            yield optimized
+            return
         
+        chunks = []
+        try:
+            response = model.generate_content(AIService.optimize_prompt(description), stream=True)
+            for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # 沒有文字的片段（例如只帶結束原因）
+                    continue
+                
+                if not chunks:
+                    text = text.lstrip()
+                if text:
+                    chunks.append(text)
+                    yield text
         except Exception as e:
             print(f"AI 優化失敗: {e}")
-            return {
-                'success': False,
-                'error': str(e)
-            }
+            yield f"\n\n⚠️ AI 優化中斷：{e}"
+            return
+        
+        optimized = ''.join(chunks).strip()
+        if optimized:
+            ai_cache.set(cache_key, 'optimize', optimized)
     
     @staticmethod
     def risk_assessment(description, category):
         """任務風險審查"""
-        service = AIService()
         
-        # 關鍵字檢測（不變）
-        critical_flags = []
-        high_flags = []
-        medium_flags = []
+        keyword_result = AIService.keyword_screen(description)
+        if keyword_result:
+            return keyword_result
         
-        desc_lower = description.lower()
+        local_result = AIService.local_screen(description, category)
+        if local_result:
+            return local_result
         
-        for keyword in service.DANGER_KEYWORDS['critical']:
-            if keyword in desc_lower:
-                critical_flags.append(keyword)
+        model = None if DEMO_MODE else get_model()
+        if not model:
+            return AIService.passed_result()
         
-        for keyword in service.DANGER_KEYWORDS['high']:
-            if keyword in desc_lower:
-                high_flags.append(keyword)
+        # AI 語意分析（相同分類與描述直接使用快取結果）
+        cache_key = AIService.risk_cache_key(description, category)
+        hit, data = ai_cache.get(cache_key)
+        if hit:
+            return {
+                'success': True,
+                'data': data,
+                'cached': True
+            }
         
-        for keyword in service.DANGER_KEYWORDS['medium']:
-            if keyword in desc_lower:
-                medium_flags.append(keyword)
+        try:
+            data = AIService.semantic_risk_assessment(model, description, category)
+            ai_cache.set(cache_key, 'risk', data)
+            
+            return {
+                'success': True,
+                'data': data
+            }
+        
+        except Exception as e:
+            print(f"AI 風險審查失敗: {e}")
+            return AIService.keyword_only_result()
+    
+    @staticmethod
+    def keyword_screen(description):
+        """
+        關鍵字檢測：單次掃描找出所有等級的命中
+        
+        Returns:
+            dict: 命中時的審查結果（與 risk_assessment 格式相同）；未命中為 None
+        """
+        hits = DANGER_MATCHER.match(description)
+        critical_flags = hits.get('critical', [])
+        high_flags = hits.get('high', [])
+        medium_flags = hits.get('medium', [])
         
         if critical_flags:
             return {
@@ -204,23 +446,111 @@ class AIService:
                 }
             }
         
-        if DEMO_MODE or not service.model:
+        return None
+    
+    @staticmethod
+    def local_screen(description, category):
+        """
+        本地風險模型判定（不呼叫 API，約數十微秒）
+        
+        Returns:
+            dict: 有把握時的審查結果（與 risk_assessment 格式相同，加上 'local'）；
+                  模型未載入或機率落在不確定區間時為 None（交給 AI）
+        """
+        classifier = get_classifier()
+        if classifier is None:
+            return None
+        
+        decision, probability = classifier.decide(classifier_text(description, category))
+        
+        if decision == RiskClassifier.SAFE:
             return {
                 'success': True,
                 'data': {
                     'risk_level': 'safe',
-                    'risk_score': 0.1,
+                    'risk_score': round(probability, 3),
                     'recommendation': '自動通過',
-                    'reason': '未發現明顯風險',
+                    'reason': '本地模型判定為低風險',
                     'flags': [],
                     'can_appeal': False,
                     'warning': None
-                }
+                },
+                'local': True
             }
         
-        # AI 語意分析（不變）
-        try:
-            prompt = f"""
+        if decision == RiskClassifier.RISKY:
+            return {
+                'success': True,
+                'data': {
+                    'risk_level': 'high',
+                    'risk_score': round(probability, 3),
+                    'recommendation': '需人工審核',
+                    'reason': '本地模型判定為高風險，需人工確認',
+                    'flags': ['本地模型'],
+                    'can_appeal': True,
+                    'warning': '⚠️ 高風險：任務已送交人工審核，如有誤判可點擊「申訴」按鈕。'
+                },
+                'local': True
+            }
+        
+        return None
+    
+    @staticmethod
+    def passed_result():
+        """未設定模型（模擬模式）且關鍵字檢測通過時的結果"""
+        return {
+            'success': True,
+            'data': {
+                'risk_level': 'safe',
+                'risk_score': 0.1,
+                'recommendation': '自動通過',
+                'reason': '未發現明顯風險',
+                'flags': [],
+                'can_appeal': False,
+                'warning': None
+            }
+        }
+    
+    @staticmethod
+    def keyword_only_result():
+        """AI 無法使用時的結果（已通過關鍵字檢測）"""
+        return {
+            'success': True,
+            'data': {
+                'risk_level': 'safe',
+                'risk_score': 0.2,
+                'recommendation': '自動通過',
+                'reason': 'AI 審查暫時無法使用，已通過關鍵字檢測',
+                'flags': [],
+                'can_appeal': False
+            }
+        }
+    
+    @staticmethod
+    def queued_result():
+        """通過關鍵字檢測、AI 審查改由背景工作者進行時的結果（任務先進入審核中）"""
+        return {
+            'success': True,
+            'data': {
+                'risk_level': 'pending',
+                'risk_score': None,
+                'recommendation': '送交審查',
+                'reason': '已通過關鍵字檢測，AI 審查將在背景進行',
+                'flags': [],
+                'can_appeal': False,
+                'warning': None
+            }
+        }
+    
+    @staticmethod
+    def risk_cache_key(description, category):
+        """風險審查結果的 AI 快取 key"""
+        return make_key('risk', Config.GEMINI_MODEL, AIService.PROMPT_VERSIONS['risk'], category, description)
+    
+    @staticmethod
+    def risk_prompt(description, category):
+        """風險審查 prompt（修改內容時請遞增 PROMPT_VERSIONS['risk']）"""
+        return f"""
 你是一個內容安全審查專家。請評估以下任務是否違反平台規範。
 
 任務分類：{category}
@@ -246,65 +576,207 @@ class AIService:
 
 只輸出 JSON，不要其他文字。
 """
-            
-            response = service.model.generate_content(prompt)
-            result_text = response.text.strip()
-            
-            if result_text.startswith('```json'):
-                result_text = result_text.replace('```json', '').replace('```', '').strip()
-            
-            import json
-            data = json.loads(result_text)
-            data['can_appeal'] = data['risk_level'] in ['medium', 'high']
-            
-            return {
-                'success': True,
-                'data': data
-            }
+    
+    @staticmethod
+    def semantic_risk_assessment(model, description, category):
+        """
+        呼叫模型做語意風險分析
         
-        except Exception as e:
-            print(f"AI 風險審查失敗: {e}")
-            return {
-                'success': True,
-                'data': {
-                    'risk_level': 'safe',
-                    'risk_score': 0.2,
-                    'recommendation': '自動通過',
-                    'reason': 'AI 審查暫時無法使用，已通過關鍵字檢測',
-                    'flags': [],
-                    'can_appeal': False
-                }
-            }
+        Returns:
+            dict: 審查結果的 data
+        
+        Raises:
+            呼叫失敗或回應不是合法 JSON 時拋出例外（由呼叫端決定如何降級）
+        """
+        response = model.generate_content(AIService.risk_prompt(description, category))
+        result_text = response.text.strip()
+        
+        if result_text.startswith('```json'):
+            result_text = result_text.replace('```json', '').replace('```', '').strip()
+        
+        data = json.loads(result_text)
+        data['can_appeal'] = data['risk_level'] in ['medium', 'high']
+        return data
     
     @staticmethod
-    def parse_task_description(description):
-        """解析任務描述（保留，但可選用）"""
-        if DEMO_MODE:
-            return {
-                'success': True,
-                'data': {
-                    'required_skills': ['通用技能'],
-                    'estimated_time': '未指定',
-                    'location_type': '實體',
-                    'urgency': 'normal'
-                }
-            }
+    def batch_risk_prompt(items):
+        """
+        多則任務合併成一個風險審查 prompt（修改內容時請遞增 PROMPT_VERSIONS['risk_batch']）
+
+        Args:
+            items (list): [(描述, 分類), ...]
+        """
+        tasks = "\n\n".join(
+            f"【任務 {i}】\n任務分類：{category}\n任務描述：\n{description}"
+            for i, (description, category) in enumerate(items)
+        )
+        return f"""
+你是一個內容安全審查專家。請逐一評估以下 {len(items)} 個任務是否違反平台規範。
+
+{tasks}
+
+平台禁止事項：
+1. 代考、代寫報告（違反學術誠信）
+2. 代購菸酒、成人內容（法律限制）
+3. 金錢借貸相關（超出服務範圍）
+4. 危險或違規活動（安全考量）
+5. 深夜私人場所見面（安全風險）
+
+請以 JSON 陣列回應，每個任務一個物件，id 為任務編號：
+[
+  {{
+    "id": 0,
+    "risk_level": "safe/low/medium/high/critical",
+    "risk_score": 0.0-1.0,
+    "recommendation": "自動通過/警告但允許/需人工審核/自動拒絕",
+    "reason": "簡短說明",
+    "flags": ["風險標記列表"],
+    "hidden_risk": "是否有隱藏的違規暗示"
+  }}
+]
+
+只輸出 JSON，不要其他文字。
+"""
+    
+    @staticmethod
+    def parse_batch_response(text, count, required_key):
+        """
+        解析批次回應：JSON 陣列依 id 對回各則
         
-        service = AIService()
+        Returns:
+            list: 長度為 count；缺少或缺少 required_key 的項目為 None（由呼叫端逐則重試）
         
-        if not service.model:
-            return {
-                'success': True,
-                'data': {
-                    'required_skills': ['通用技能'],
-                    'estimated_time': '未指定',
-                    'location_type': '實體',
-                    'urgency': 'normal'
-                }
-            }
+        Raises:
+            回應不是 JSON 陣列時拋出例外
+        """
+        result_text = text.strip()
+        if result_text.startswith('```json'):
+            result_text = result_text.replace('```json', '').replace('```', '').strip()
         
-        try:
-            prompt = f"""
+        results = json.loads(result_text)
+        if not isinstance(results, list):
+            raise ValueError('批次回應不是 JSON 陣列')
+        
+        by_id = {result.get('id'): result for result in results if isinstance(result, dict)}
+        parsed = []
+        for i in range(count):
+            result = by_id.get(i)
+            if result is None or required_key not in result:
+                parsed.append(None)
+                continue
+            result = dict(result)
+            result.pop('id', None)
+            parsed.append(result)
+        return parsed
+    
+    @staticmethod
+    def semantic_risk_assessment_batch(model, items):
+        """
+        一次呼叫模型審查多則任務
+        
+        Args:
+            items (list): [(描述, 分類), ...]
+        
+        Returns:
+            list: 與 items 同順序的審查結果 data；回應中缺少的項目為 None
+        
+        Raises:
+            呼叫失敗或回應不是 JSON 陣列時拋出例外（由呼叫端改為逐則審查）
+        """
+        response = model.generate_content(AIService.batch_risk_prompt(items))
+        results = AIService.parse_batch_response(response.text, len(items), 'risk_level')
+        for data in results:
+            if data is not None:
+                data['can_appeal'] = data['risk_level'] in ['medium', 'high']
+        return results
+    
+    @staticmethod
+    def semantic_risk_assessments(model, items, token_budget=None, max_items=None):
+        """
+        語意風險分析多則任務：依 token 預算分組，每組一個 prompt；
+        批次回應缺少或無法解析的項目逐則重試
+        
+        Args:
+            items (list): [(描述, 分類), ...]
+        
+        Returns:
+            tuple: (與 items 同順序的 data，逐則也失敗的項目為該例外, 模型呼叫次數)
+        """
+        overhead = estimate_tokens(AIService.batch_risk_prompt([]))
+        costs = [
+            estimate_tokens(description) + estimate_tokens(category) + AIService.BATCH_ITEM_TOKENS['risk']
+            for description, category in items
+        ]
+        return run_batched(
+            model, items, costs,
+            batch_call=AIService.semantic_risk_assessment_batch,
+            single_call=lambda model, item: AIService.semantic_risk_assessment(model, *item),
+            token_budget=(token_budget or Config.AI_BATCH_TOKEN_BUDGET) - overhead,
+            max_items=max_items or Config.AI_BATCH_MAX_ITEMS
+        )
+    
+    @staticmethod
+    def risk_assessment_batch(items, token_budget=None, max_items=None):
+        """
+        批次版 risk_assessment：結果格式、關鍵字檢測、本地模型、快取與降級都與單則相同，
+        需要 AI 的描述依 token 預算合併成少數幾個 prompt
+        
+        Args:
+            items (list): [(描述, 分類), ...]
+        
+        Returns:
+            tuple: (與 items 同順序的審查結果, {'ai_items': 送 AI 審查的則數, 'ai_calls': 模型呼叫次數})
+        """
+        results = [
+            AIService.keyword_screen(description) or AIService.local_screen(description, category)
+            for description, category in items
+        ]
+        
+        model = None if DEMO_MODE else get_model()
+        pending = []
+        for i, (description, category) in enumerate(items):
+            if results[i] is not None:
+                continue
+            if not model:
+                results[i] = AIService.passed_result()
+                continue
+            hit, data = ai_cache.get(AIService.risk_cache_key(description, category))
+            if hit:
+                results[i] = {'success': True, 'data': data, 'cached': True}
+            else:
+                pending.append(i)
+        
+        if not pending:
+            return results, {'ai_items': 0, 'ai_calls': 0}
+        
+        assessed, calls = AIService.semantic_risk_assessments(
+            model, [items[i] for i in pending], token_budget, max_items
+        )
+        for i, data in zip(pending, assessed):
+            if isinstance(data, Exception):
+                results[i] = AIService.keyword_only_result()
+            else:
+                ai_cache.set(AIService.risk_cache_key(*items[i]), 'risk', data)
+                results[i] = {'success': True, 'data': data}
+        return results, {'ai_items': len(pending), 'ai_calls': calls}
+    
+    @staticmethod
+    def default_parse_result():
+        """未設定模型（Demo/模擬模式）時的解析結果"""
+        return {
+            'success': True,
+            'data': {
+                'required_skills': ['通用技能'],
+                'estimated_time': '未指定',
+                'location_type': '實體',
+                'urgency': 'normal'
+            }
+        }
+    
+    @staticmethod
+    def parse_prompt(description):
+        """任務描述解析 prompt"""
+        return f"""
 請分析以下任務描述，提取關鍵資訊。
 
 任務描述：
@@ -321,19 +793,67 @@ class AIService:
 
 只輸出 JSON，不要其他文字。
 """
-            
-            response = service.model.generate_content(prompt)
-            result_text = response.text.strip()
-            
-            if result_text.startswith('```json'):
-                result_text = result_text.replace('```json', '').replace('```', '').strip()
-            
-            import json
-            data = json.loads(result_text)
-            
+    
+    @staticmethod
+    def batch_parse_prompt(descriptions):
+        """多則任務描述合併成一個解析 prompt"""
+        tasks = "\n\n".join(
+            f"【任務 {i}】\n任務描述：\n{description}" for i, description in enumerate(descriptions)
+        )
+        return f"""
+請逐一分析以下 {len(descriptions)} 個任務描述，提取關鍵資訊。
+
+{tasks}
+
+請以 JSON 陣列回應，每個任務一個物件，id 為任務編號：
+[
+  {{
+    "id": 0,
+    "required_skills": ["所需技能列表"],
+    "estimated_time": "預估時長",
+    "location_type": "實體/線上/混合",
+    "urgency": "low/normal/high",
+    "key_points": ["關鍵要點列表"]
+  }}
+]
+
+只輸出 JSON，不要其他文字。
+"""
+    
+    @staticmethod
+    def semantic_parse(model, description):
+        """
+        呼叫模型解析單則描述
+        
+        Raises:
+            呼叫失敗或回應不是合法 JSON 時拋出例外
+        """
+        response = model.generate_content(AIService.parse_prompt(description))
+        result_text = response.text.strip()
+        
+        if result_text.startswith('```json'):
+            result_text = result_text.replace('```json', '').replace('```', '').strip()
+        
+        return json.loads(result_text)
+    
+    @staticmethod
+    def semantic_parse_batch(model, descriptions):
+        """一次呼叫模型解析多則描述；回應中缺少的項目為 None"""
+        response = model.generate_content(AIService.batch_parse_prompt(descriptions))
+        return AIService.parse_batch_response(response.text, len(descriptions), 'required_skills')
+    
+    @staticmethod
+    def parse_task_description(description):
+        """解析任務描述（保留，但可選用）"""
+        model = None if DEMO_MODE else get_model()
+        
+        if not model:
+            return AIService.default_parse_result()
+        
+        try:
             return {
                 'success': True,
-                'data': data
+                'data': AIService.semantic_parse(model, description)
             }
         
         except Exception as e:
@@ -342,6 +862,41 @@ class AIService:
                 'success': False,
                 'error': str(e)
             }
+    
+    @staticmethod
+    def parse_task_descriptions(descriptions, token_budget=None, max_items=None):
+        """
+        批次版 parse_task_description：依 token 預算合併成少數幾個 prompt
+        
+        Returns:
+            tuple: (與 descriptions 同順序的解析結果, {'ai_items': 送 AI 解析的則數, 'ai_calls': 模型呼叫次數})
+        """
+        model = None if DEMO_MODE else get_model()
+        
+        if not model:
+            return [AIService.default_parse_result() for _ in descriptions], {'ai_items': 0, 'ai_calls': 0}
+        
+        overhead = estimate_tokens(AIService.batch_parse_prompt([]))
+        parsed, calls = run_batched(
+            model, list(descriptions),
+            [estimate_tokens(description) + AIService.BATCH_ITEM_TOKENS['parse'] for description in descriptions],
+            batch_call=AIService.semantic_parse_batch,
+            single_call=AIService.semantic_parse,
+            token_budget=(token_budget or Config.AI_BATCH_TOKEN_BUDGET) - overhead,
+            max_items=max_items or Config.AI_BATCH_MAX_ITEMS
+        )
+        
+        results = []
+        for data in parsed:
+            if isinstance(data, Exception):
+                results.append({'success': False, 'error': str(data)})
+            else:
+                results.append({'success': True, 'data': data})
+        return results, {'ai_items': len(results), 'ai_calls': calls}
+
+
+# 敏感關鍵字自動機，模組載入時建立一次
+DANGER_MATCHER = KeywordMatcher(AIService.DANGER_KEYWORDS)
 
 
 if __name__ == '__main__':
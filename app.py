@@ -9,10 +9,17 @@ from database import (
     apply_for_task, get_task_applications,
     accept_application, complete_task,
     submit_review, get_reviews_for_user, check_review_status,
-    cancel_task, update_user_skills, get_user_by_id
+    cancel_task, update_user_skills, update_user_availability, get_user_by_id,
+    search_tasks, count_search_results, get_platform_stats,
+    get_recommendations, get_recommendation_stats, get_tasks_by_ids, get_upcoming_tasks,
+    session_scope, release_session, get_pool_status, read_cache, get_moderation_queue_stats
 )
 from matching_engine import MatchingEngine
-from ai_service import AIService
+from ai_service import AIService, ai_cache
+from moderation import moderation_client
+from moderation_worker import start_in_background, get_background_worker
+from risk_classifier import get_classifier
+import schedule
 from config import Config
 import streamlit.components.v1 as components
 
@@ -24,32 +31,26 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# 🔧 每次腳本執行都從乾淨的 Session 開始，避免連線累積
+release_session()
+
 # ========== 🔧 自動初始化資料庫（只在第一次部署時執行） ==========
 import os
+from database import get_database_status, engine
 
-# 檢查資料庫是否存在且有效
-db_exists = os.path.exists('campus_help.db')
-db_valid = False
-
-if db_exists:
-    # 檢查資料庫是否有效（嘗試查詢）
-    try:
-        from database import Session, User
-        session = Session()
-        session.query(User).first()
-        session.close()
-        db_valid = True
-    except:
-        db_valid = False
+# 檢查資料庫是否已建立且有效（依 Config.DATABASE_URL，不限 SQLite）
+db_status = get_database_status()
 
-# 如果資料庫不存在或無效，重新初始化
-if not db_exists or not db_valid:
+# 如果資料庫尚未建立或無效，重新初始化
+if db_status != 'ready':
     try:
-        from database import init_db, seed_test_data
+        from database import Base, init_db, seed_test_data
         
-        # 如果檔案存在但無效，先刪除
-        if db_exists and not db_valid:
-            os.remove('campus_help.db')
+        # 本機 SQLite 檔案無效時先清空重建；伺服器型資料庫查詢失敗可能只是暫時斷線，不自動清除
+        if db_status == 'error':
+            if engine.dialect.name != 'sqlite':
+                raise RuntimeError("無法連線至資料庫，請確認 DATABASE_URL 設定")
+            Base.metadata.drop_all(engine)
         
         init_db()
         seed_test_data()
@@ -237,6 +238,13 @@ if 'previous_user' not in st.session_state:
 from database import auto_complete_expired_tasks
 auto_complete_expired_tasks()
 
+# 🔧 背景審查工作者（每個程序只啟動一次；另外執行 moderation_worker.py 時可關閉）
+if Config.MODERATION_QUEUE_ENABLED and Config.MODERATION_WORKER_IN_APP:
+    start_in_background()
+
+# 🔧 載入本地風險模型（程序內只載入一次；模型檔不存在時提示一次訓練方式）
+get_classifier()
+
 # ========== 輔助函數 ==========
 def scroll_to_top_and_rerun():
     """重新運行（放棄滾動功能）"""
@@ -249,57 +257,54 @@ def get_risk_badge(risk_level):
         'low': ('🛡️ 低風險', 'risk-low'),
         'medium': ('⚠️ 中等風險', 'risk-medium'),
         'high': ('🚨 高風險', 'risk-high'),
-        'critical': ('❌ 嚴重違規', 'risk-critical')
+        'critical': ('❌ 嚴重違規', 'risk-critical'),
+        'pending': ('⏳ 審查中', 'risk-low')
     }
     text, css_class = risk_map.get(risk_level, ('❓ 未知', 'risk-medium'))
     return f"<div class='{css_class}'>{text}</div>"
 
+def get_page_token(state_key, filters=None):
+    """
+    取得目前頁的分頁位置（cursor 或 offset），第一頁為 None
+
+    篩選條件改變時自動回到第一頁。
+    """
+    state = st.session_state.get(state_key)
+    if state is None or state['filters'] != filters:
+        state = {'filters': filters, 'tokens': [None]}
+        st.session_state[state_key] = state
+    return state['tokens'][-1]
+
+def split_page(items):
+    """查詢時多取一筆，用來判斷是否還有下一頁"""
+    return items[:Config.TASK_PAGE_SIZE], len(items) > Config.TASK_PAGE_SIZE
+
+def render_pager(state_key, has_more, next_token):
+    """分頁按鈕：每次只渲染一頁，「載入下一頁」以 next_token 取得下一頁"""
+    state = st.session_state[state_key]
+    page_number = len(state['tokens'])
+    
+    if page_number == 1 and not has_more:
+        return
+    
+    col_prev, col_info, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if page_number > 1 and st.button("⬅️ 上一頁", key=f"{state_key}_prev", use_container_width=True):
+            state['tokens'].pop()
+            st.rerun()
+    with col_info:
+        st.markdown(f"<div style='text-align: center;'>第 {page_number} 頁</div>", unsafe_allow_html=True)
+    with col_next:
+        if has_more and st.button("⬇️ 載入下一頁", key=f"{state_key}_next", use_container_width=True):
+            state['tokens'].append(next_token)
+            st.rerun()
+
 def show_notification(message, icon="🔔"):
     """顯示即時通知（加長顯示時間）"""
     st.toast(f"{icon} {message}", icon=icon)
     import time
     time.sleep(2)
 
-def get_platform_stats():
-    """取得平台統計數據"""
-    users = get_all_users()
-    all_tasks = get_all_tasks()
-    
-    total_users = len(users)
-    total_tasks = len(all_tasks)
-    completed_tasks = len([t for t in all_tasks if t['status'] == 'completed'])
-    open_tasks = len([t for t in all_tasks if t['status'] == 'open'])
-    in_progress_tasks = len([t for t in all_tasks if t['status'] == 'in_progress'])
-    
-    total_points = sum(u['points'] for u in users)
-    points_in_tasks = sum(t['points_offered'] for t in all_tasks if t['status'] == 'open')
-    
-    category_counts = {}
-    for task in all_tasks:
-        cat = task['category']
-        category_counts[cat] = category_counts.get(cat, 0) + 1
-    
-    campus_counts = {}
-    for task in all_tasks:
-        campus = task['campus']
-        campus_counts[campus] = campus_counts.get(campus, 0) + 1
-    
-    top_users = sorted(users, key=lambda x: x['completed_tasks'], reverse=True)[:3]
-    
-    return {
-        'total_users': total_users,
-        'total_tasks': total_tasks,
-        'completed_tasks': completed_tasks,
-        'open_tasks': open_tasks,
-        'in_progress_tasks': in_progress_tasks,
-        'total_points': total_points,
-        'points_in_tasks': points_in_tasks,
-        'category_counts': category_counts,
-        'campus_counts': campus_counts,
-        'top_users': top_users,
-        'completion_rate': (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
-    }
-
 # ========== 側邊欄 ==========
 with st.sidebar:
     st.markdown("### 👤 使用者登入")
@@ -494,52 +499,89 @@ with st.sidebar:
         # 查看資料庫狀態
         if st.sidebar.button("📊 查看資料庫狀態", key="view_db_status", use_container_width=True):
             try:
-                from database import Session, User, Task, TaskApplication
-                session = Session()
+                from database import User, Task, TaskApplication
+                with session_scope() as session:
+                    user_count = session.query(User).count()
+                    task_count = session.query(Task).count()
+                    app_count = session.query(TaskApplication).count()
                 
-                user_count = session.query(User).count()
-                task_count = session.query(Task).count()
-                app_count = session.query(TaskApplication).count()
-                
-                session.close()
+                pool_status = get_pool_status()
+                cache_stats = read_cache.stats()
+                recommendation_stats = get_recommendation_stats()
+                ai_cache_stats = ai_cache.stats()
+                moderation_stats = moderation_client.stats()
+                queue_stats = get_moderation_queue_stats()
+                worker = get_background_worker()
+                worker_stats = worker.stats() if worker else None
+                classifier = get_classifier()
+                classifier_stats = classifier.stats() if classifier else None
                 
                 st.sidebar.info(f"""
                 **📊 資料庫狀態**
                 - 使用者數：{user_count} 位
                 - 任務數：{task_count} 個
                 - 申請數：{app_count} 筆
-                """)
-            except Exception as e:
-                st.sidebar.error(f"❌ 查詢失敗：{str(e)}")
-        
-        # 詳細資料庫資訊（展開式）
-        with st.sidebar.expander("🔍 詳細資料庫資訊"):
-            try:
-                from database import Session, User, Task, TaskApplication
-                session = Session()
                 
-                # 統計資訊
-                users = session.query(User).all()
-                tasks = session.query(Task).all()
-                apps = session.query(TaskApplication).all()
+                **🔌 連線池**（{pool_status['pool_class']}）
+                - 使用中連線：{pool_status['checked_out']}
+                - 池大小：{pool_status['size']}
+                - 溢出連線：{pool_status['overflow']}
                 
-                st.write(f"**👥 使用者**：{len(users)} 位")
-                for user in users[:5]:  # 只顯示前 5 位
-                    st.text(f"  - {user.name} ({user.points} 點)")
+                **⚡ 讀取快取**
+                - 命中率：{cache_stats['hit_rate']:.0%}（命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']}）
+                - 項目數：{cache_stats['entries']} / {cache_stats['max_entries']}
+                - 失效 / 淘汰：{cache_stats['invalidations']} / {cache_stats['evictions']}
                 
-                if len(users) > 5:
-                    st.text(f"  ... 還有 {len(users) - 5} 位")
+                **🤖 推薦快取**
+                - 命中率：{recommendation_stats['hit_rate']:.0%}（命中 {recommendation_stats['hits']} / 未命中 {recommendation_stats['misses']}）
+                - 計算次數：{recommendation_stats['computations']}（平均 {recommendation_stats['avg_compute_ms']:.1f} ms）
                 
-                st.write(f"**📋 任務**：{len(tasks)} 個")
-                for task in tasks[:5]:
-                    st.text(f"  - {task.title} ({task.status})")
+                **🧠 AI 結果快取**
+                - 命中率：{ai_cache_stats['hit_rate']:.0%}（省下 {ai_cache_stats['hits']} 次 API 呼叫 / 未命中 {ai_cache_stats['misses']}）
+                - 項目數：{ai_cache_stats['entries']} / {ai_cache_stats['max_entries']}（淘汰 {ai_cache_stats['evictions']}）
                 
-                if len(tasks) > 5:
-                    st.text(f"  ... 還有 {len(tasks) - 5} 個")
+                **🛡️ AI 審查**（斷路器：{moderation_stats['breaker_state']}）
+                - 模型呼叫：{moderation_stats['ai_calls']} / 審查 {moderation_stats['requests']} 次
+                - 降級：逾時 {moderation_stats['timeout']}、失敗 {moderation_stats['error']}、忙碌 {moderation_stats['busy']}、暫停 {moderation_stats['circuit_open']}
                 
-                st.write(f"**✉️ 申請**：{len(apps)} 筆")
+                **📨 審查佇列**（{'本程序工作者執行中' if worker_stats and worker_stats['running'] else '由獨立工作者處理'}）
+                - 等待 / 處理中：{queue_stats['queued']} / {queue_stats['processing']}（最久等待 {queue_stats['oldest_wait_seconds']:.0f} 秒）
+                - 審核中任務：{queue_stats['pending_review_tasks']}、已標記：{queue_stats['flagged_tasks']}
+                - 本程序已處理：{worker_stats['tasks'] if worker_stats else 0} 個（模型呼叫 {worker_stats['ai_calls'] if worker_stats else 0} 次）
                 
-                session.close()
+                **🧮 本地風險模型**（{f"{classifier_stats['features']:,} 個特徵" if classifier_stats else '未載入，全部送 AI'}）
+                - 判定：{classifier_stats['predictions'] if classifier_stats else 0} 次，省下 {classifier_stats['avoided_rate'] if classifier_stats else 0:.0%} 的 AI 呼叫（平均 {classifier_stats['avg_us'] if classifier_stats else 0:.0f} µs）
+                """)
+            except Exception as e:
+                st.sidebar.error(f"❌ 查詢失敗：{str(e)}")
+        
+        # 詳細資料庫資訊（展開式）
+        with st.sidebar.expander("🔍 詳細資料庫資訊"):
+            try:
+                from database import User, Task, TaskApplication
+                with session_scope() as session:
+                    # 統計資訊（只取前 5 筆，不載入整張表）
+                    user_count = session.query(User).count()
+                    task_count = session.query(Task).count()
+                    app_count = session.query(TaskApplication).count()
+                    users = session.query(User).order_by(User.id).limit(5).all()
+                    tasks = session.query(Task).order_by(Task.id).limit(5).all()
+                    
+                    st.write(f"**👥 使用者**：{user_count} 位")
+                    for user in users:  # 只顯示前 5 位
+                        st.text(f"  - {user.name} ({user.points} 點)")
+                    
+                    if user_count > 5:
+                        st.text(f"  ... 還有 {user_count - 5} 位")
+                    
+                    st.write(f"**📋 任務**：{task_count} 個")
+                    for task in tasks:
+                        st.text(f"  - {task.title} ({task.status})")
+                    
+                    if task_count > 5:
+                        st.text(f"  ... 還有 {task_count - 5} 個")
+                    
+                    st.write(f"**✉️ 申請**：{app_count} 筆")
             except Exception as e:
                 st.error(f"查詢失敗：{str(e)}")
 
@@ -612,20 +654,41 @@ if st.session_state.page == 'home':
             ["全部"] + Config.CAMPUSES
         )
     
-    tasks = get_all_tasks(
-        status='open',
+    # 🔧 搜尋、篩選、排序、分頁都在資料庫完成；每次只渲染一頁
+    search_filters = dict(
+        query=search_query.strip(),
+        category=filter_category if filter_category != "全部" else None,
+        campus=filter_campus if filter_campus != "全部" else None,
         exclude_user_id=st.session_state.current_user['id'] if st.session_state.current_user else None
     )
+    page_token = get_page_token('home_pager', tuple(search_filters.items()))
+    
+    if search_filters['query']:
+        # 關鍵字搜尋依相關度排序，以 offset 分頁
+        offset = page_token or 0
+        tasks, has_more = split_page(search_tasks(limit=Config.TASK_PAGE_SIZE + 1, offset=offset, **search_filters))
+        next_page_token = offset + len(tasks)
+    else:
+        tasks = get_all_tasks(
+            status='open',
+            exclude_user_id=search_filters['exclude_user_id'],
+            category=search_filters['category'],
+            campus=search_filters['campus'],
+            cursor=page_token,
+            page_size=Config.TASK_PAGE_SIZE + 1
+        )
+        tasks, has_more = split_page(tasks)
+        next_page_token = tasks[-1]['cursor'] if tasks else None
     
-    if search_query:
-        tasks = [t for t in tasks if search_query.lower() in t['title'].lower() or 
-                                     search_query.lower() in t['description'].lower()]
-    if filter_category != "全部":
-        tasks = [t for t in tasks if t['category'] == filter_category]
-    if filter_campus != "全部":
-        tasks = [t for t in tasks if t['campus'] == filter_campus]
+    st.markdown(f"找到 **{count_search_results(**search_filters)}** 個任務 | 🛡️ 所有任務已通過安全審查")
     
-    st.markdown(f"找到 **{len(tasks)}** 個任務 | 🛡️ 所有任務已通過安全審查")
+    # 🔧 24 小時內開始的任務（依開始時間排序，由資料庫索引查詢）
+    upcoming_tasks = get_upcoming_tasks(hours=24, exclude_user_id=search_filters['exclude_user_id'], limit=5)
+    if upcoming_tasks:
+        with st.expander(f"⏰ 24 小時內開始的任務（{len(upcoming_tasks)}）"):
+            for task in upcoming_tasks:
+                duration = f"，約 {task['duration_minutes']} 分鐘" if task.get('duration_minutes') else ""
+                st.markdown(f"- **{task['starts_at']}** {task['title']}（{task['campus']}{duration}）")
     
     if tasks:
         for task in tasks:
@@ -704,8 +767,11 @@ if st.session_state.page == 'home':
                             - 信任值：{publisher['trust_score']:.0%}
                             """)                                                   
                 st.markdown("---")
+        
+        render_pager('home_pager', has_more, next_page_token)
     else:
         st.info("目前沒有符合條件的任務")
+        render_pager('home_pager', False, None)
 
 # 發布任務頁面
 elif st.session_state.page == 'publish':
@@ -761,6 +827,8 @@ elif st.session_state.page == 'publish':
                     )
                     if not task_duration or task_duration.strip() == "":
                         task_duration = None
+                    elif schedule.parse_duration_minutes(task_duration) is None:
+                        st.caption(f"⚠️ 無法辨識時長，媒合時以 {schedule.DEFAULT_DURATION_MINUTES} 分鐘計")
 
             with col2:
                 campus = st.selectbox("校區 *", Config.CAMPUSES, key="campus_select")
@@ -792,13 +860,13 @@ elif st.session_state.page == 'publish':
 
         # ✅ 表單結束後再處理按鈕邏輯
         if ai_optimize and description:
-            with st.spinner("AI 正在優化您的任務描述..."):
-                optimized = AIService.optimize_task_description(description)
-                if optimized['success']:
-                    show_notification("AI 描述優化完成！", "🤖")
-                    st.success("✅ AI 優化建議：")
-                    st.info(optimized['optimized_description'])
-                    st.markdown("**提示**: 您可以複製上面的優化版本重新填入描述欄位")
+            # 🔧 串流顯示：模型產生第一段文字就開始顯示，不必等整段回應
+            st.success("✅ AI 優化建議：")
+            with st.container(border=True):
+                optimized = st.write_stream(AIService.stream_optimized_description(description))
+            if optimized and 'AI 優化中斷' not in optimized:
+                show_notification("AI 描述優化完成！", "🤖")
+                st.markdown("**提示**: 您可以複製上面的優化版本重新填入描述欄位")
 
         if submitted:
             if not all([title, description, category, location, campus]):
@@ -809,7 +877,19 @@ elif st.session_state.page == 'publish':
                 st.error("❌ 點數不足，無法發布任務")
             else:
                 with st.spinner("🛡️ 正在進行 AI 安全審查..."):
-                    risk_check = AIService.risk_assessment(description, category)
+                    if Config.MODERATION_QUEUE_ENABLED:
+                        # 🔧 發布時只做關鍵字檢測與本地模型判定，不確定的由背景工作者批次送 AI，不必等模型回應
+                        risk_check = (
+                            AIService.keyword_screen(description)
+                            or AIService.local_screen(description, category)
+                            or AIService.queued_result()
+                        )
+                    else:
+                        # 🔧 有期限與斷路器的審查：AI 逾時或失敗時改用關鍵字檢測結果，不讓頁面卡住
+                        risk_check = moderation_client.assess(description, category)
+                    
+                    if risk_check.get('degraded'):
+                        st.caption(f"⚡ {risk_check['data']['reason']}")
                     
                     if risk_check['success']:
                         risk_data = risk_check['data']
@@ -860,8 +940,11 @@ elif st.session_state.page == 'publish':
                                 st.info("📧 您會收到 Email 通知審核結果")
                                 st.warning("⏰ 預計 1-3 個工作天內回覆")
                         
-                        elif risk_data.get('recommendation') in ['警告但允許', '允許發布', '自動通過']:
-                            if risk_level in ['medium', 'low', 'safe']:
+                        elif risk_data.get('recommendation') in ['警告但允許', '允許發布', '自動通過', '送交審查']:
+                            review = risk_data.get('recommendation') == '送交審查'
+                            if review:
+                                st.info(f"⏳ {risk_data.get('reason')}")
+                            elif risk_level in ['medium', 'low', 'safe']:
                                 if risk_level == 'medium':
                                     st.warning(f"⚠️ {risk_data.get('reason')}")
                                 if risk_data.get('warning'):
@@ -884,10 +967,14 @@ elif st.session_state.page == 'publish':
                                 'task_duration': task_duration
                             }
                             
-                            task_id = create_task(task_data)
+                            task_id = create_task(task_data, review=review)
                             if task_id:
-                                show_notification(f"任務發布成功！已扣除 {points_offered} 點", "🎉")
-                                st.success("✅ 任務發布成功！")
+                                if review:
+                                    show_notification(f"任務已送出審查！已扣除 {points_offered} 點", "📨")
+                                    st.success("✅ 任務已送出！審查通過後會自動開放，可在「我的任務」查看狀態")
+                                else:
+                                    show_notification(f"任務發布成功！已扣除 {points_offered} 點", "🎉")
+                                    st.success("✅ 任務發布成功！")
                                 st.info(f"💰 已扣除 {points_offered} 點 | 🛡️ 交易安全保護已啟用")
                                 st.balloons()
                                 st.session_state.current_user = get_user_by_name(st.session_state.current_user['name'])
@@ -913,11 +1000,19 @@ elif st.session_state.page == 'my_tasks':
         tab1, tab2 = st.tabs(["📤 我發布的", "📥 我接的"])
         
         with tab1:
-            my_published = get_user_tasks(st.session_state.current_user['id'], task_type='published')
+            published_cursor = get_page_token('published_pager', st.session_state.current_user['id'])
+            my_published, published_has_more = split_page(get_user_tasks(
+                st.session_state.current_user['id'],
+                task_type='published',
+                cursor=published_cursor,
+                page_size=Config.TASK_PAGE_SIZE + 1
+            ))
             
             if my_published:
                 for task in my_published:
                     status_icon = {
+                        'pending_review': '⏳',
+                        'flagged': '🚩',
                         'open': '🟢',
                         'in_progress': '🟡',
                         'completed': '✅',
@@ -955,6 +1050,8 @@ elif st.session_state.page == 'my_tasks':
                         with col2:
                             st.markdown(f"### 💰 {task['points_offered']} 點")
                             status_map = {
+                                'pending_review': '⏳ 審核中',
+                                'flagged': '🚩 已標記',
                                 'open': '🟢 開放中',
                                 'in_progress': '🟡 進行中',
                                 'completed': '✅ 已完成',
@@ -962,7 +1059,10 @@ elif st.session_state.page == 'my_tasks':
                             }
                             st.markdown(f"**狀態**: {status_map.get(task['status'], task['status'])}")
                         
-                        if task['status'] == 'open':
+                        if task['status'] == 'flagged':
+                            st.warning(f"🚩 審查未通過，等待人工審核：{task.get('moderation_reason') or '需人工確認'}（取消任務可取回點數）")
+                        
+                        if task['status'] in ('open', 'pending_review', 'flagged'):
                             if st.button(f"❌ 取消任務", key=f"cancel_{task['id']}", use_container_width=True):
                                 result = cancel_task(task['id'], st.session_state.current_user['id'])
                                 if result:
@@ -1108,11 +1208,20 @@ elif st.session_state.page == 'my_tasks':
                                         show_notification("評價提交成功！", "⭐")
                                         st.success("✅ 評價提交成功！")
                                         scroll_to_top_and_rerun()
+                
+                render_pager('published_pager', published_has_more, my_published[-1]['cursor'])
             else:
                 st.info("您還沒有發布任何任務")
+                render_pager('published_pager', False, None)
         
         with tab2:
-            my_applied = get_user_tasks(st.session_state.current_user['id'], task_type='applied')
+            applied_cursor = get_page_token('applied_pager', st.session_state.current_user['id'])
+            my_applied, applied_has_more = split_page(get_user_tasks(
+                st.session_state.current_user['id'],
+                task_type='applied',
+                cursor=applied_cursor,
+                page_size=Config.TASK_PAGE_SIZE + 1
+            ))
             
             if my_applied:
                 for task in my_applied:
@@ -1243,8 +1352,11 @@ elif st.session_state.page == 'my_tasks':
                                         scroll_to_top_and_rerun()
                         
                         st.markdown("---")
+                
+                render_pager('applied_pager', applied_has_more, my_applied[-1]['cursor'])
             else:
                 st.info("您還沒有申請任何任務")
+                render_pager('applied_pager', False, None)
 
 # AI 推薦頁面
 elif st.session_state.page == 'ai_recommend':
@@ -1256,28 +1368,35 @@ elif st.session_state.page == 'ai_recommend':
         st.markdown(f"### 為 **{st.session_state.current_user['name']}** 推薦的任務")
         st.info("🛡️ **安全保障**：所有推薦任務已通過多重安全審查")
         
-        all_tasks = get_all_tasks(
-            status='open',
-            exclude_user_id=st.session_state.current_user['id']
-        )
+        # 🔧 推薦排名依使用者與開放任務版本快取，重新整理/點擊按鈕不會重算；只載入前 5 名的完整資料
+        with st.spinner("🛡️ AI 正在計算最佳媒合並進行安全檢查..."):
+            result = get_recommendations(st.session_state.current_user, top_n=5)
         
-        if all_tasks:
-            with st.spinner("🛡️ AI 正在計算最佳媒合並進行安全檢查..."):
-                matcher = MatchingEngine()
-                recommendations = []
-                
-                for task in all_tasks:
-                    score_data = matcher.calculate_match_score(st.session_state.current_user, task)
-                    recommendations.append({'task': task, 'score': score_data['total_score'], 'scores': score_data})
-                
-                recommendations.sort(key=lambda x: x['score'], reverse=True)
+        if result['open_tasks']:
+            with st.spinner("📋 載入推薦任務..."):
+                tasks_by_id = {
+                    task['id']: task
+                    for task in get_tasks_by_ids(tuple(task_id for task_id, _ in result['ranking']))
+                }
+                recommendations = [
+                    {'task': tasks_by_id[task_id], 'score': details['total_score'], 'details': details}
+                    for task_id, details in result['ranking'] if task_id in tasks_by_id
+                ]
                 
+                recommendation_stats = get_recommendation_stats()
                 st.markdown("### 🏆 Top 5 推薦任務")
+                st.caption(
+                    f"{'⚡ 快取結果' if result['cached'] else '📦 預先計算結果' if result['precomputed'] else '🔄 重新計算'}｜"
+                    f"評分 {result['scored']} / {result['open_tasks']} 個開放任務，耗時 {result['compute_ms']:.1f} ms｜"
+                    f"推薦快取命中率 {recommendation_stats['hit_rate']:.0%}"
+                )
+                if not recommendations:
+                    st.info("目前沒有可推薦的任務")
                 
-                for i, rec in enumerate(recommendations[:5], 1):
+                for i, rec in enumerate(recommendations, 1):
                     task = rec['task']
                     score = rec['score']
-                    scores = rec['scores']
+                    scores = rec['details']
                     
                     # 🔧 改用普通 container
                     with st.container():
@@ -1482,6 +1601,37 @@ elif st.session_state.page == 'skills':
                     st.success(f"✅ 已移除技能：{skill_to_remove}")
                     st.session_state.current_user = get_user_by_name(st.session_state.current_user['name'])
                     scroll_to_top_and_rerun()
+        
+        # 🔧 每週可接任務的時段（AI 推薦的時間相符分數依此計算）
+        st.markdown("---")
+        st.markdown("#### 🗓️ 可接任務時段")
+        
+        availability = schedule.decode(st.session_state.current_user.get('availability'))
+        if availability:
+            st.caption(f"目前設定：{schedule.describe(availability)}")
+        else:
+            st.caption("目前未設定，推薦時視為任何時段都有空")
+        
+        day_hours = schedule.to_day_hours(availability)
+        hour_options = list(range(schedule.SLOTS_PER_DAY))
+        selected_hours = {}
+        day_cols = st.columns(schedule.DAYS)
+        for weekday, col in enumerate(day_cols):
+            with col:
+                selected_hours[weekday] = st.multiselect(
+                    schedule.DAY_NAMES[weekday],
+                    hour_options,
+                    default=day_hours[weekday],
+                    format_func=lambda hour: f"{hour:02d}:00",
+                    key=f"availability_{weekday}"
+                )
+        
+        if st.button("💾 儲存可接時段", use_container_width=True):
+            if update_user_availability(st.session_state.current_user['id'], schedule.from_day_hours(selected_hours)):
+                show_notification("可接時段已更新！", "✅")
+                st.success("✅ 可接時段已更新！")
+                st.session_state.current_user = get_user_by_name(st.session_state.current_user['name'])
+                scroll_to_top_and_rerun()
 
 # 統計儀表板頁面
 elif st.session_state.page == 'statistics':
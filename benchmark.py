@@ -0,0 +1,415 @@
+"""
+效能基準測試 - Campus Help
+用法：
+    python benchmark.py              # 執行全部基準測試
+    python benchmark.py indexes      # 索引建立前後的查詢計畫與耗時
+    python benchmark.py search       # FTS5 全文檢索與 LIKE 掃描的延遲比較
+    python benchmark.py matching     # 媒合逐筆評分與 NumPy 批次評分的比較
+    python benchmark.py keywords     # 逐一子字串比對與 Aho-Corasick 關鍵字比對的比較
+    python benchmark.py precompute   # 使用者 × 任務矩陣預先計算全部推薦
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import Session as OrmSession
+
+import database
+import schedule
+from config import Config
+from database import Base, User, Task, TaskApplication, Review
+from keyword_matcher import KeywordMatcher
+from matching_engine import MatchingEngine, OpenTaskIndex
+from precompute_recommendations import compute_recommendations
+
+# 組合任務描述用的片語
+DESCRIPTION_PHRASES = [
+    '幫忙搬宿舍行李', '需要攝影記錄活動', '教微積分解題', '修理筆電無法開機', '代購午餐便當',
+    '英文簡報修改', '程式設計作業除錯', '組裝書桌家具', '陪同去圖書館找資料', '翻譯日文文件',
+    '社團海報設計', '幫忙排隊領包裹', '借用相機拍照', '整理實驗數據', '活動場地布置'
+]
+
+
+def _timeit(func, repeat=20):
+    """回傳單次呼叫的平均毫秒數"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def _fill_database(bench_engine, n_tasks, n_users=2000):
+    """以 Core 批次寫入大量測試資料"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    statuses = ['open'] * 6 + ['in_progress'] * 2 + ['completed', 'cancelled']
+
+    with bench_engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {
+                'email': f'user{i}@scu.edu.tw',
+                'name': f'使用者{i}',
+                'campus': rng.choice(Config.CAMPUSES),
+                'status': 'active'
+            }
+            for i in range(1, n_users + 1)
+        ])
+
+        tasks = []
+        for i in range(1, n_tasks + 1):
+            status = rng.choice(statuses)
+            created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+            tasks.append({
+                'publisher_id': rng.randint(1, n_users),
+                'accepted_user_id': rng.randint(1, n_users) if status != 'open' else None,
+                'title': f'任務 {i} {rng.choice(DESCRIPTION_PHRASES)}',
+                'description': '，'.join(rng.sample(DESCRIPTION_PHRASES, 4)) + f'，編號 {i}',
+                'location': rng.choice(['圖書館', '第一教研大樓', '望星廣場', '宿舍', '線上']),
+                'category': rng.choice(Config.CATEGORIES),
+                'campus': rng.choice(Config.CAMPUSES),
+                'points_offered': rng.randint(Config.POINTS_MIN, Config.POINTS_MAX),
+                'status': status,
+                'created_at': created_at,
+                'accepted_at': created_at + timedelta(hours=1) if status != 'open' else None
+            })
+        conn.execute(Task.__table__.insert(), tasks)
+
+        pairs = {(rng.randint(1, n_tasks), rng.randint(1, n_users)) for _ in range(n_tasks)}
+        conn.execute(TaskApplication.__table__.insert(), [
+            {'task_id': task_id, 'applicant_id': applicant_id, 'status': 'pending', 'applied_at': now}
+            for task_id, applicant_id in pairs
+        ])
+
+        conn.execute(Review.__table__.insert(), [
+            {
+                'task_id': i,
+                'reviewer_id': rng.randint(1, n_users),
+                'reviewee_id': rng.randint(1, n_users),
+                'rating': rng.choice([3.0, 4.0, 4.5, 5.0]),
+                'created_at': now - timedelta(days=rng.randint(0, 365))
+            }
+            for i in range(1, n_tasks // 5 + 1)
+        ])
+
+
+def bench_indexes(n_tasks=100_000):
+    """比較索引建立前後，熱門查詢的查詢計畫（全表掃描 → 索引查找）與耗時"""
+    print("=" * 50)
+    print(f"  索引基準測試（{n_tasks:,} 筆任務）")
+    print("=" * 50)
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    bench_engine = create_engine(f'sqlite:///{path}')
+
+    try:
+        Base.metadata.create_all(bench_engine)
+        indexes = [index for table in Base.metadata.sorted_tables for index in table.indexes]
+        for index in indexes:
+            index.drop(bench_engine)
+
+        print("\n📦 寫入測試資料...")
+        _fill_database(bench_engine, n_tasks)
+
+        five_days_ago = datetime.utcnow() - timedelta(days=5)
+        queries = {
+            '首頁開放任務': select(Task.id).where(Task.status == 'open').order_by(Task.created_at.desc()).limit(20),
+            '我發布的任務': select(Task.id).where(Task.publisher_id == 123).order_by(Task.created_at.desc()),
+            '我接的任務': select(Task.id).where(Task.accepted_user_id == 123),
+            '自動完成過期任務': select(Task.id).where(Task.status == 'in_progress', Task.accepted_at < five_days_ago),
+            '重複申請檢查': select(TaskApplication.id).where(TaskApplication.task_id == 123, TaskApplication.applicant_id == 45),
+            '使用者收到的評價': select(Review.id).where(Review.reviewee_id == 123).order_by(Review.created_at.desc()),
+        }
+
+        def run(label):
+            print(f"\n🔍 {label}")
+            with OrmSession(bench_engine) as session:
+                for name, query in queries.items():
+                    sql = str(query.compile(bench_engine, compile_kwargs={'literal_binds': True}))
+                    plan = session.execute(text(f'EXPLAIN QUERY PLAN {sql}')).fetchall()
+                    elapsed = _timeit(lambda: session.execute(query).fetchall())
+                    print(f"   {name:<10} {elapsed:8.3f} ms | {' / '.join(row[-1] for row in plan)}")
+
+        run("建立索引前")
+        for index in indexes:
+            index.create(bench_engine)
+        with bench_engine.begin() as conn:
+            conn.execute(text('ANALYZE'))
+        run("建立索引後")
+    finally:
+        bench_engine.dispose()
+        os.remove(path)
+
+
+def bench_search(sizes=(10_000, 100_000, 300_000), queries=('編號 4242', '修理筆電')):
+    """比較任務表成長時，FTS5 全文檢索與 LIKE 子字串掃描的首頁搜尋延遲（取第一頁 20 筆）"""
+    print("=" * 50)
+    print("  搜尋基準測試")
+    print("=" * 50)
+
+    if not database.fulltext_search_enabled():
+        print("⚠️ 此 SQLite 不支援 FTS5 trigram，略過")
+        return
+
+    for n_tasks in sizes:
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        bench_engine = create_engine(f'sqlite:///{path}')
+
+        try:
+            Base.metadata.create_all(bench_engine)
+            _fill_database(bench_engine, n_tasks)
+
+            def search(session, query):
+                results, rank = database._search_query(
+                    session, database.task_query(session), query, None, None, None, 'open'
+                )
+                order = [rank, Task.created_at.desc()] if rank is not None else [Task.created_at.desc()]
+                return results.order_by(*order).limit(20).all()
+
+            with OrmSession(bench_engine) as session:
+                for query in queries:
+                    fts_ms = _timeit(lambda: search(session, query), repeat=10)
+                    database._fts_supported = False
+                    try:
+                        like_ms = _timeit(lambda: search(session, query), repeat=10)
+                    finally:
+                        database._fts_supported = True
+
+                    print(f"   {n_tasks:>8,} 筆 | {query:<8} | FTS5 {fts_ms:8.2f} ms | LIKE {like_ms:8.2f} ms")
+        finally:
+            bench_engine.dispose()
+            os.remove(path)
+
+
+def _generate_tasks(n_tasks, n_users=2000):
+    """產生媒合評分用的任務字典（不經過資料庫）；約六成有指定時段"""
+    rng = random.Random(42)
+    today = datetime(2026, 1, 5)
+    tasks = []
+    for i in range(1, n_tasks + 1):
+        timed = rng.random() < 0.6
+        tasks.append({
+            'id': i,
+            'publisher_id': rng.randint(1, n_users),
+            'title': f'任務 {i} {rng.choice(DESCRIPTION_PHRASES)}',
+            'description': '，'.join(rng.sample(DESCRIPTION_PHRASES, 4)),
+            'category': rng.choice(Config.CATEGORIES),
+            'campus': rng.choice(Config.CAMPUSES),
+            'is_urgent': rng.random() < 0.2,
+            'accept_deadline': (today + timedelta(days=rng.randint(0, 13))).strftime('%Y-%m-%d'),
+            'task_start_time': f'{rng.randint(8, 21):02d}:{rng.choice([0, 30]):02d}' if timed else None,
+            'task_duration': rng.choice(['30分鐘', '1小時', '2小時', None])
+        })
+        # 與資料庫相同：建立任務時就解析好時段
+        task = tasks[-1]
+        task['time_slots'] = schedule.encode_task_slots(task['accept_deadline'], task['task_start_time'], task['task_duration'])
+    return tasks
+
+
+def _generate_availability(rng):
+    """隨機的每週可接時段；約一半使用者未設定"""
+    if rng.random() < 0.5:
+        return None
+    return schedule.encode(schedule.from_day_hours({
+        weekday: range(start, start + rng.randint(2, 8))
+        for weekday in rng.sample(range(schedule.DAYS), rng.randint(1, 5))
+        for start in [rng.randint(8, 16)]
+    }))
+
+
+def bench_matching(sizes=(10_000, 100_000), top_n=5):
+    """比較逐筆 calculate_match_score + 全排序與 NumPy 批次評分 + argpartition 的推薦延遲"""
+    print("=" * 50)
+    print("  媒合評分基準測試")
+    print("=" * 50)
+
+    matcher = MatchingEngine()
+    user = {
+        'id': 1,
+        'skills': ['攝影', '程式設計', 'Excel'],
+        'campus': Config.CAMPUSES[0],
+        'willing_cross_campus': True,
+        'rating': 4.6,
+        'completed_tasks': 12
+    }
+
+    for n_tasks in sizes:
+        tasks = _generate_tasks(n_tasks)
+
+        def scalar():
+            recommendations = [
+                {'task': task, 'score': matcher.calculate_match_score(user, task)['total_score']}
+                for task in tasks if task['publisher_id'] != user['id']
+            ]
+            recommendations.sort(key=lambda x: x['score'], reverse=True)
+            return recommendations[:top_n]
+
+        build_start = time.perf_counter()
+        block = matcher.build_task_block(tasks)
+        build_ms = (time.perf_counter() - build_start) * 1000
+
+        expected = scalar()
+        actual = matcher.get_top_recommendations(user, block, top_n)
+        scores = matcher.score_batch(user, block)['total_score']
+        identical = (
+            [rec['task']['id'] for rec in expected] == [rec['task']['id'] for rec in actual] and
+            all(matcher.calculate_match_score(user, task)['total_score'] == scores[i] for i, task in enumerate(tasks[:2000]))
+        )
+
+        scalar_ms = _timeit(scalar, repeat=3)
+        batch_ms = _timeit(lambda: matcher.get_top_recommendations(user, block, top_n), repeat=20)
+        print(f"   {n_tasks:>8,} 筆 | 逐筆 {scalar_ms:9.2f} ms | 批次 {batch_ms:7.2f} ms "
+              f"(建立區塊 {build_ms:8.2f} ms) | 結果一致：{'✅' if identical else '❌'}")
+
+        # 串流：從產生器逐批評分，只保留前 N 名
+        def stream():
+            return matcher.get_top_recommendations(user, (dict(task) for task in tasks), top_n)
+
+        def peak_kb(func):
+            tracemalloc.start()
+            try:
+                func()
+                return tracemalloc.get_traced_memory()[1] / 1024
+            finally:
+                tracemalloc.stop()
+
+        identical = [rec['task']['id'] for rec in stream()] == [rec['task']['id'] for rec in expected]
+        stream_ms = _timeit(stream, repeat=3)
+        print(f"   {'':>8}    | 串流 {stream_ms:9.2f} ms | 尖峰記憶體 {peak_kb(stream):9,.0f} KB "
+              f"(整批 {peak_kb(lambda: matcher.get_top_recommendations(user, matcher.build_task_block(tasks), top_n)):9,.0f} KB) "
+              f"| 結果一致：{'✅' if identical else '❌'}")
+
+        # 倒排索引：同分時較新（id 較大）的任務在前，對照組以反向列表全部評分
+        index = OpenTaskIndex()
+        index.rebuild(tasks)
+        newest_first = matcher.build_task_block(tasks[::-1])
+        users = [user] + [
+            {
+                'id': rng_user,
+                'skills': random.Random(rng_user).sample(MatchingEngine.SKILL_VOCABULARY, rng_user % 3),
+                'campus': Config.CAMPUSES[rng_user % len(Config.CAMPUSES)],
+                'willing_cross_campus': rng_user % 2 == 0,
+                'rating': 3.5 + rng_user % 3 * 0.5,
+                'completed_tasks': rng_user,
+                'availability': _generate_availability(random.Random(rng_user))
+            }
+            for rng_user in range(2, 22)
+        ]
+        identical = all(
+            [(rec['task']['id'], rec['score']) for rec in matcher.get_top_recommendations(u, newest_first, top_n)] ==
+            [(task_id, details['total_score']) for task_id, details in matcher.recommend_from_index(u, index, top_n)[0]]
+            for u in users
+        )
+        scored = sum(matcher.recommend_from_index(u, index, top_n)[1] for u in users) / len(users)
+        index_ms = _timeit(lambda: matcher.recommend_from_index(user, index, top_n), repeat=20)
+        print(f"   {'':>8}    | 倒排索引 {index_ms:7.2f} ms | 平均評分 {scored / n_tasks:6.1%} 的任務 "
+              f"| 結果一致：{'✅' if identical else '❌'}")
+
+
+def _generate_users(n_users):
+    """產生媒合評分用的使用者字典"""
+    rng = random.Random(7)
+    return [
+        {
+            'id': i,
+            'skills': rng.sample(MatchingEngine.SKILL_VOCABULARY, rng.randint(0, 3)),
+            'campus': rng.choice(Config.CAMPUSES),
+            'willing_cross_campus': rng.random() < 0.5,
+            'avg_rating': rng.uniform(3.0, 5.0),
+            'trust_score': rng.random(),
+            'completed_tasks': rng.randint(0, 30),
+            'availability': _generate_availability(rng)
+        }
+        for i in range(1, n_users + 1)
+    ]
+
+
+def bench_precompute(n_users=20_000, n_tasks=50_000, top_n=20, workers=(1, os.cpu_count() or 1)):
+    """使用者 × 任務矩陣計算全部使用者的前 N 名（不含資料庫讀寫）"""
+    print("=" * 50)
+    print(f"  推薦預先計算基準測試（{n_users:,} 位使用者 × {n_tasks:,} 個任務）")
+    print("=" * 50)
+
+    users = _generate_users(n_users)
+    index = OpenTaskIndex()
+    index.rebuild(_generate_tasks(n_tasks, n_users))
+    block = index.block(list(range(len(index))))
+
+    # 抽樣驗證與逐一使用者的倒排索引結果一致
+    matcher = MatchingEngine()
+    sample = users[:50]
+    results = compute_recommendations(sample, block, top_n)
+    identical = all(
+        [task_id for task_id, _ in results[user['id']]] ==
+        [task_id for task_id, _ in matcher.recommend_from_index(user, index, top_n)[0]]
+        for user in sample
+    )
+    print(f"   抽樣結果一致：{'✅' if identical else '❌'}")
+
+    for n_workers in sorted(set(workers)):
+        start = time.perf_counter()
+        compute_recommendations(users, block, top_n, workers=n_workers)
+        print(f"   {n_workers:>2} 個行程 | {time.perf_counter() - start:8.1f} 秒")
+
+
+def bench_keywords(keyword_counts=(30, 1_000, 5_000), text_lengths=(200, 5_000), n_texts=50):
+    """比較逐一關鍵字 `in` 檢查與 Aho-Corasick 單次掃描的耗時（每段文字平均）"""
+    print("=" * 50)
+    print("  關鍵字比對基準測試")
+    print("=" * 50)
+
+    rng = random.Random(42)
+    alphabet = ''.join(sorted(set(''.join(DESCRIPTION_PHRASES)))) + 'abcdefghijklmnopqrstuvwxyz'
+
+    for n_keywords in keyword_counts:
+        keywords = list({
+            ''.join(rng.choice(alphabet) for _ in range(rng.randint(2, 4)))
+            for _ in range(n_keywords)
+        })
+        table = {level: keywords[i::3] for i, level in enumerate(['critical', 'high', 'medium'])}
+        matcher = KeywordMatcher(table)
+
+        for length in text_lengths:
+            texts = [''.join(rng.choice(alphabet) for _ in range(length)) for _ in range(n_texts)]
+
+            def naive():
+                return [
+                    {level: [kw for kw in words if kw in text] for level, words in table.items()}
+                    for text in texts
+                ]
+
+            def automaton():
+                return [matcher.match(text) for text in texts]
+
+            identical = all(
+                {level: words for level, words in expected.items() if words} == actual
+                for expected, actual in zip(naive(), automaton())
+            )
+            naive_ms = _timeit(naive, repeat=3) / n_texts
+            automaton_ms = _timeit(automaton, repeat=3) / n_texts
+            print(f"   {len(keywords):>6,} 個關鍵字 | 文字 {length:>6,} 字 | "
+                  f"逐一比對 {naive_ms:8.3f} ms | 自動機 {automaton_ms:8.3f} ms | 結果一致：{'✅' if identical else '❌'}")
+
+
+BENCHMARKS = {
+    'indexes': bench_indexes,
+    'search': bench_search,
+    'matching': bench_matching,
+    'keywords': bench_keywords,
+    'precompute': bench_precompute,
+}
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"❌ 未知的基準測試：{name}（可用：{', '.join(BENCHMARKS)}）")
+            sys.exit(1)
+        BENCHMARKS[name]()
@@ -0,0 +1,126 @@
+"""
+快取模組 - Campus Help
+程序內共用（跨所有 Streamlit 使用者 session）的讀取快取：
+1. TTL 過期 + LRU 容量上限
+2. 以資料類別（namespace）精準失效，由 database.py 的寫入函數觸發
+3. 命中/未命中統計，顯示於管理員面板
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+
+class TTLCache:
+    """有存活時間與容量上限（LRU）的執行緒安全快取"""
+
+    def __init__(self, max_entries=1024, ttl_seconds=60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (到期時間, 所屬 namespaces, 值)
+        self._generations = {}  # namespace -> 失效次數
+        self._epoch = 0  # clear() 次數
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """
+        讀取快取
+
+        Returns:
+            tuple: (是否命中, 值)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[2]
+
+    def generation(self, namespaces):
+        """namespaces 目前的失效版本；讀取資料前取得，寫入快取時用來判斷期間是否有失效"""
+        with self._lock:
+            return self._generation_locked(namespaces)
+
+    def _generation_locked(self, namespaces):
+        return (self._epoch,) + tuple(self._generations.get(namespace, 0) for namespace in namespaces)
+
+    def set(self, key, value, namespaces=(), generation=None):
+        """
+        寫入快取；超過容量時淘汰最久未使用的項目
+
+        若提供 generation 且讀取期間 namespaces 已失效，代表值可能過時，不寫入。
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation_locked(namespaces):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, frozenset(namespaces), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *namespaces):
+        """清除屬於任一 namespace 的項目"""
+        targets = set(namespaces)
+        with self._lock:
+            for namespace in targets:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            stale = [key for key, (_, entry_namespaces, _) in self._entries.items() if entry_namespaces & targets]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        """清除全部項目"""
+        with self._lock:
+            self._epoch += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        """命中統計"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+    def cached(self, *namespaces):
+        """
+        快取函式結果的裝飾器
+
+        key 為 (函式名稱, 參數)，任一 namespace 失效時清除。
+        回傳值由所有 session 共用，呼叫端不可修改。
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                key = (func.__name__, args, tuple(sorted(kwargs.items())))
+                hit, value = self.get(key)
+                if hit:
+                    return value
+
+                generation = self.generation(namespaces)
+                value = func(*args, **kwargs)
+                self.set(key, value, namespaces, generation)
+                return value
+
+            wrapper.uncached = func
+            return wrapper
+        return decorator
@@ -18,8 +18,63 @@ class Config:
     # 資料庫
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///campus_help.db')
     
+    # 🔧 連線池（檔案型 SQLite 與 PostgreSQL 皆使用 QueuePool，多個副本可共用同一台 PostgreSQL）
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    
+    # 🔧 SQLite 連線調校（DATABASE_URL 為 SQLite 時，每條新連線都會套用）
+    # WAL 讓讀取不會被寫入阻塞；cache_size 負值代表以 KiB 計
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+        'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-64000')),
+        'temp_store': os.getenv('SQLITE_TEMP_STORE', 'MEMORY')
+    }
+    
     # Gemini API
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+    # 🔧 模型與溫度（整個程序共用一個模型實例，第一次呼叫 AI 時建立）
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
+    GEMINI_TEMPERATURE = float(os.getenv('GEMINI_TEMPERATURE', '0.5'))
+    
+    # 🔧 AI 結果快取（SQLite 側檔，相同的審查/優化請求不重複呼叫 Gemini）
+    AI_CACHE_PATH = os.getenv('AI_CACHE_PATH', 'ai_cache.db')
+    AI_CACHE_TTL_SECONDS = int(os.getenv('AI_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+    AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', '5000'))
+    
+    # 🔧 AI 審查用戶端（moderation.py）：每次呼叫的期限、同時呼叫數上限、斷路器（連續失敗幾次後暫停多久）
+    # 同步審查（MODERATION_QUEUE_ENABLED=false）與背景審查工作者都經過它；工作者的期限另見 MODERATION_AI_TIMEOUT_SECONDS
+    AI_TIMEOUT_SECONDS = float(os.getenv('AI_TIMEOUT_SECONDS', '8'))
+    AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', '4'))
+    AI_BREAKER_FAILURES = int(os.getenv('AI_BREAKER_FAILURES', '3'))
+    AI_BREAKER_RESET_SECONDS = float(os.getenv('AI_BREAKER_RESET_SECONDS', '30'))
+    
+    # 🔧 批次 prompt（審查佇列、重新審查開放任務）：每個 prompt 的 token 預算（含預期回應）與最多則數
+    AI_BATCH_TOKEN_BUDGET = int(os.getenv('AI_BATCH_TOKEN_BUDGET', '6000'))
+    AI_BATCH_MAX_ITEMS = int(os.getenv('AI_BATCH_MAX_ITEMS', '20'))
+    
+    # 🔧 本地風險模型：只有不確定的描述才送 AI 審查；模型檔不存在時全部送 AI（啟動時提示一次）
+    # 模型檔不隨專案提供：累積違規與正常的 AI 審查結果各至少 10 筆（risk_classifier.MIN_SAMPLES_PER_LABEL）後，
+    # 執行 python train_risk_classifier.py 產生，重新啟動應用程式與審查工作者後生效
+    RISK_MODEL_PATH = os.getenv('RISK_MODEL_PATH', 'risk_model.npz')
+    RISK_LOCAL_ENABLED = os.getenv('RISK_LOCAL_ENABLED', 'true').lower() == 'true'
+    
+    # 🔧 背景審查佇列：發布時只做關鍵字檢測，任務先進入「審核中」，由審查工作者批次送 AI 審查
+    # MODERATION_QUEUE_ENABLED=false 時改回發布當下同步審查（moderation.py）
+    MODERATION_QUEUE_ENABLED = os.getenv('MODERATION_QUEUE_ENABLED', 'true').lower() == 'true'
+    # Streamlit 程序內啟動審查工作者；另外執行 moderation_worker.py 時可設為 false
+    MODERATION_WORKER_IN_APP = os.getenv('MODERATION_WORKER_IN_APP', 'true').lower() == 'true'
+    MODERATION_BATCH_SIZE = int(os.getenv('MODERATION_BATCH_SIZE', '10'))  # 每輪領取的任務數（再依 AI_BATCH_* 分成 prompt）
+    MODERATION_POLL_SECONDS = float(os.getenv('MODERATION_POLL_SECONDS', '2'))
+    MODERATION_MAX_ATTEMPTS = int(os.getenv('MODERATION_MAX_ATTEMPTS', '3'))  # 超過後以關鍵字檢測結果放行
+    MODERATION_CLAIM_TIMEOUT_SECONDS = int(os.getenv('MODERATION_CLAIM_TIMEOUT_SECONDS', '300'))  # 工作者中斷時收回
+    # 工作者每次模型呼叫的期限（批次 prompt 較長，不必像發布頁面一樣快速降級）；逾時、斷路器斷開都算一次失敗
+    MODERATION_AI_TIMEOUT_SECONDS = float(os.getenv('MODERATION_AI_TIMEOUT_SECONDS', '30'))
     
     # 任務分類
     CATEGORIES = [
@@ -38,6 +93,20 @@ class Config:
         "線上"
     ]
     
+    # 🔧 任務列表每頁筆數
+    TASK_PAGE_SIZE = 20
+    
+    # 🔧 跨 session 共用讀取快取（寫入時立即失效；TTL 為多副本部署時的最長延遲）
+    READ_CACHE_TTL_SECONDS = int(os.getenv('READ_CACHE_TTL_SECONDS', '30'))
+    READ_CACHE_MAX_ENTRIES = int(os.getenv('READ_CACHE_MAX_ENTRIES', '2048'))
+    
+    # 🔧 推薦結果快取（開放任務或使用者資料改變時立即失效）
+    RECOMMENDATION_CACHE_TTL_SECONDS = int(os.getenv('RECOMMENDATION_CACHE_TTL_SECONDS', '600'))
+    RECOMMENDATION_CACHE_MAX_ENTRIES = int(os.getenv('RECOMMENDATION_CACHE_MAX_ENTRIES', '1024'))
+    
+    # 🔧 平台統計摘要的最長有效秒數（任務狀態改變時會立即失效）
+    STATS_MAX_AGE_SECONDS = int(os.getenv('STATS_MAX_AGE_SECONDS', '300'))
+    
     # 點數範圍
     POINTS_MIN = 10
     POINTS_MAX = 500
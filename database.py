@@ -7,22 +7,121 @@
 4. 新增任務取消功能
 5. 新增校外選項
 """
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import create_engine, event, inspect, Column, Integer, String, Float, Boolean, Date, DateTime, Time, Text, ForeignKey, Index, func
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql import table, column, literal_column, and_, or_
+from sqlalchemy.pool import QueuePool, StaticPool
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, scoped_session, relationship, joinedload, object_session
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+import hashlib
 import json
+import numpy as np
+import sqlite3
+import threading
+import time
+import schedule
+from cache import TTLCache
+from config import Config
+from matching_engine import MatchingEngine, OpenTaskIndex, TopK
+
+def _build_engine(database_url):
+    """
+    依 DATABASE_URL 建立引擎
+
+    檔案型 SQLite 與 PostgreSQL 等伺服器型資料庫使用 QueuePool（Config.DB_POOL_*），
+    記憶體 SQLite 只能存在於單一連線，改用 StaticPool。
+    """
+    url = make_url(database_url)
+    
+    if url.get_backend_name() == 'sqlite':
+        connect_args = {'check_same_thread': False}
+        if url.database in (None, '', ':memory:'):
+            return create_engine(url, echo=False, poolclass=StaticPool, connect_args=connect_args)
+    else:
+        connect_args = {}
+    
+    return create_engine(
+        url,
+        echo=False,
+        poolclass=QueuePool,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        pool_timeout=Config.DB_POOL_TIMEOUT,
+        pool_recycle=Config.DB_POOL_RECYCLE,
+        pool_pre_ping=Config.DB_POOL_PRE_PING,
+        connect_args=connect_args
+    )
+
 
 # 建立引擎
-engine = create_engine('sqlite:///campus_help.db', echo=False)
+engine = _build_engine(Config.DATABASE_URL)
 Base = declarative_base()
-Session = sessionmaker(bind=engine)
+
+
+if engine.dialect.name == 'sqlite':
+    @event.listens_for(engine, 'connect')
+    def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+        """每條新連線套用 Config.SQLITE_PRAGMAS（WAL、busy_timeout 等）"""
+        cursor = dbapi_connection.cursor()
+        for name, value in Config.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+# 🔧 跨所有使用者 session 共用的讀取快取；寫入函數提交後依資料類別（namespace）失效
+read_cache = TTLCache(max_entries=Config.READ_CACHE_MAX_ENTRIES, ttl_seconds=Config.READ_CACHE_TTL_SECONDS)
+
+SessionFactory = sessionmaker(bind=engine)
+
+# 🔧 寫入函數使用的執行緒 Session；每次 Streamlit 腳本執行開始時由 release_session() 清掉
+Session = scoped_session(SessionFactory)
+
+
+@contextmanager
+def session_scope():
+    """
+    開一個獨立的 Session，離開時提交並關閉（發生例外則回滾）
+
+    不使用執行緒共用的 Session：巢狀呼叫（例如在 session_scope 區塊中呼叫 get_user_by_id）
+    各自關閉自己的 Session，不會讓外層的物件脫離 Session。
+    關閉後連線立即歸還連線池；to_dict() 必須在 with 區塊內呼叫。
+    """
+    session = SessionFactory()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def release_session():
+    """釋放目前執行緒的 Session（每次 Streamlit 腳本執行開始時呼叫）"""
+    Session.remove()
+
+
+def get_pool_status():
+    """取得連線池狀態"""
+    pool = engine.pool
+    return {
+        'pool_class': type(pool).__name__,
+        'size': pool.size() if hasattr(pool, 'size') else None,
+        'checked_out': pool.checkedout() if hasattr(pool, 'checkedout') else None,
+        'overflow': pool.overflow() if hasattr(pool, 'overflow') else None,
+        'status': pool.status()
+    }
 
 # ========== 資料模型 ==========
 
 class User(Base):
     """使用者模型"""
     __tablename__ = 'users'
+    __table_args__ = (
+        Index('ix_users_status_name', 'status', 'name'),
+    )
     
     id = Column(Integer, primary_key=True)
     email = Column(String(120), unique=True, nullable=False)
@@ -40,6 +139,9 @@ class User(Base):
     willing_cross_campus = Column(Boolean, default=False)
     status = Column(String(20), default='active')
     
+    # 🔧 新增：每週可接任務的時段（168 個小時的位元集合，十六進位字串），未設定時為 None
+    availability = Column(String(schedule.HEX_LENGTH), nullable=True)
+    
     created_at = Column(DateTime, default=datetime.utcnow)
     
     def to_dict(self):
@@ -56,6 +158,7 @@ class User(Base):
             'completed_tasks': self.completed_tasks,
             'trust_score': self.trust_score,
             'willing_cross_campus': self.willing_cross_campus,
+            'availability': self.availability,
             'status': self.status
         }
 
@@ -63,6 +166,18 @@ class User(Base):
 class Task(Base):
     """任務模型"""
     __tablename__ = 'tasks'
+    __table_args__ = (
+        # 首頁列表：依狀態篩選並依發布時間排序
+        Index('ix_tasks_status_created_at', 'status', 'created_at'),
+        Index('ix_tasks_publisher_created_at', 'publisher_id', 'created_at'),
+        Index('ix_tasks_accepted_user_id', 'accepted_user_id'),
+        # auto_complete_expired_tasks
+        Index('ix_tasks_status_accepted_at', 'status', 'accepted_at'),
+        # 預先計算推薦：找出上次執行後變動的任務
+        Index('ix_tasks_updated_at', 'updated_at'),
+        # get_upcoming_tasks：即將開始的開放任務
+        Index('ix_tasks_status_starts_at', 'status', 'starts_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     publisher_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -76,15 +191,26 @@ class Task(Base):
     
     points_offered = Column(Integer, nullable=False)
     is_urgent = Column(Boolean, default=False)
-    status = Column(String(20), default='open')
+    status = Column(String(20), default='open')  # pending_review/flagged/open/in_progress/completed/cancelled
+    moderation_reason = Column(String(200), nullable=True)  # 🔧 背景審查的結論（被標記時顯示給發布者）
     
     # 🔧 新增：時間相關欄位
     accept_deadline = Column(String(50), nullable=True)  # 任務預定日期
     task_start_time = Column(String(50), nullable=True) # 接取起始時點
     task_duration = Column(String(50), nullable=True)  # 預估時長
+    # 🔧 新增：上面三個欄位解析後的值，可在 SQL 中篩選/排序（寫入時由 _refresh_task_times 更新）
+    scheduled_date = Column(Date, nullable=True)
+    start_time = Column(Time, nullable=True)
+    duration_minutes = Column(Integer, nullable=True)
+    starts_at = Column(DateTime, nullable=True)  # 預定日期 + 開始時間（本地時間）
     accepted_at = Column(DateTime, nullable=True)  # 接受時間（用於計算自動完成）
     helper_notified_completion = Column(Boolean, default=False)  # 幫助者是否已通知完成
     
+    # 🔧 新增：推斷出的技能需求（JSON 列表），標題/描述/分類變更時才重算
+    required_skills = Column(Text, nullable=True)
+    # 🔧 新增：任務進行的時段（與 User.availability 同格式），預定日期/開始時間/時長變更時才重算
+    time_slots = Column(String(schedule.HEX_LENGTH), nullable=True)
+    
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
@@ -92,12 +218,18 @@ class Task(Base):
     publisher = relationship('User', foreign_keys=[publisher_id])
     accepted_user = relationship('User', foreign_keys=[accepted_user_id])
     
-    def to_dict(self):
-        session = Session()
-        publisher = session.query(User).filter_by(id=self.publisher_id).first()
-        accepted_user = session.query(User).filter_by(id=self.accepted_user_id).first() if self.accepted_user_id else None
+    def to_dict(self, application_count=None):
+        """
+        轉換為字典
+
+        批次序列化請使用 tasks_to_dicts()，由它預先載入發布者/接受者並一次算好申請數，
+        此處只在未提供 application_count 時才另外查詢。
+        """
+        publisher = self.publisher
+        accepted_user = self.accepted_user if self.accepted_user_id else None
         
-        application_count = session.query(TaskApplication).filter_by(task_id=self.id).count()
+        if application_count is None:
+            application_count = object_session(self).query(TaskApplication).filter_by(task_id=self.id).count()
         
         return {
             'id': self.id,
@@ -109,6 +241,7 @@ class Task(Base):
             'points_offered': self.points_offered,
             'is_urgent': self.is_urgent,
             'status': self.status,
+            'moderation_reason': self.moderation_reason,
             'publisher_id': self.publisher_id,
             'publisher_name': publisher.name if publisher else '未知',
             'publisher_rating': publisher.avg_rating if publisher else 0,
@@ -120,10 +253,17 @@ class Task(Base):
             'accept_deadline': self.accept_deadline,
             'task_start_time': self.task_start_time,
             'task_duration': self.task_duration,
+            'scheduled_date': self.scheduled_date.isoformat() if self.scheduled_date else None,
+            'start_time': self.start_time.strftime('%H:%M') if self.start_time else None,
+            'duration_minutes': self.duration_minutes,
+            'starts_at': self.starts_at.strftime('%Y-%m-%d %H:%M') if self.starts_at else None,
             'accepted_at': self.accepted_at.strftime('%Y-%m-%d %H:%M') if self.accepted_at else None,
             'helper_notified_completion': self.helper_notified_completion,
             'days_until_auto_complete': self._calculate_days_until_auto_complete(),
-            'application_count': application_count
+            'application_count': application_count,
+            'required_skills': json.loads(self.required_skills) if self.required_skills is not None else None,
+            'time_slots': self.time_slots,
+            'cursor': (self.created_at.isoformat(), self.id) if self.created_at else None
         }
     
     def _calculate_days_until_auto_complete(self):
@@ -139,6 +279,11 @@ class Task(Base):
 class TaskApplication(Base):
     """任務申請記錄"""
     __tablename__ = 'task_applications'
+    __table_args__ = (
+        # 唯一索引（而非表格約束），才能補建到既有的 SQLite 資料庫
+        Index('uq_task_applications_task_applicant', 'task_id', 'applicant_id', unique=True),
+        Index('ix_task_applications_applicant_applied_at', 'applicant_id', 'applied_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     task_id = Column(Integer, ForeignKey('tasks.id'), nullable=False)
@@ -151,8 +296,7 @@ class TaskApplication(Base):
     applicant = relationship('User', foreign_keys=[applicant_id])
     
     def to_dict(self):
-        session = Session()
-        applicant = session.query(User).filter_by(id=self.applicant_id).first()
+        applicant = self.applicant
         
         return {
             'id': self.id,
@@ -171,6 +315,10 @@ class TaskApplication(Base):
 class Review(Base):
     """評價記錄"""
     __tablename__ = 'reviews'
+    __table_args__ = (
+        Index('uq_reviews_task_reviewer_reviewee', 'task_id', 'reviewer_id', 'reviewee_id', unique=True),
+        Index('ix_reviews_reviewee_created_at', 'reviewee_id', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     task_id = Column(Integer, ForeignKey('tasks.id'), nullable=False)
@@ -187,10 +335,9 @@ class Review(Base):
     reviewee = relationship('User', foreign_keys=[reviewee_id])
     
     def to_dict(self):
-        session = Session()
-        reviewer = session.query(User).filter_by(id=self.reviewer_id).first()
-        reviewee = session.query(User).filter_by(id=self.reviewee_id).first()
-        task = session.query(Task).filter_by(id=self.task_id).first()
+        reviewer = self.reviewer
+        reviewee = self.reviewee
+        task = self.task
         
         return {
             'id': self.id,
@@ -206,32 +353,654 @@ class Review(Base):
         }
 
 
+class PlatformStats(Base):
+    """平台統計摘要（物化結果，任務狀態改變時標記為過期）"""
+    __tablename__ = 'platform_stats'
+    
+    id = Column(Integer, primary_key=True)
+    payload = Column(Text, nullable=False)
+    is_stale = Column(Boolean, default=False)
+    refreshed_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UserRecommendation(Base):
+    """預先計算的推薦結果（由 precompute_recommendations.py 產生）"""
+    __tablename__ = 'user_recommendations'
+    __table_args__ = (
+        Index('ix_user_recommendations_user_rank', 'user_id', 'rank'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    rank = Column(Integer, nullable=False)
+    task_id = Column(Integer, ForeignKey('tasks.id'), nullable=False)
+    
+    score = Column(Float, nullable=False)
+    skill_score = Column(Float)
+    time_score = Column(Float)
+    rating_score = Column(Float)
+    location_score = Column(Float)
+    
+    profile_hash = Column(String(40), nullable=False)  # 計算時的使用者資料，不同則結果無效
+    top_n = Column(Integer)  # 計算時保留的名次；存下的列數較少代表可推薦的任務已全部存下
+    computed_at = Column(DateTime, default=datetime.utcnow)
+    
+    def to_details(self):
+        """轉成與 MatchingEngine.calculate_match_score 相同格式的分數明細"""
+        return {
+            'total_score': self.score,
+            'skill_score': self.skill_score,
+            'time_score': self.time_score,
+            'rating_score': self.rating_score,
+            'location_score': self.location_score,
+            'breakdown': {
+                '技能匹配': f"{self.skill_score:.0%}",
+                '時間相符': f"{self.time_score:.0%}",
+                '評價信任': f"{self.rating_score:.0%}",
+                '地點相符': f"{self.location_score:.0%}"
+            }
+        }
+
+
+class ModerationQueue(Base):
+    """背景審查佇列（每個待審任務一列，由 moderation_worker 批次處理）"""
+    __tablename__ = 'moderation_queue'
+    __table_args__ = (
+        Index('uq_moderation_queue_task_id', 'task_id', unique=True),
+        # 工作者依排入順序領取
+        Index('ix_moderation_queue_status_enqueued_at', 'status', 'enqueued_at'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, ForeignKey('tasks.id'), nullable=False)
+    status = Column(String(20), default='queued')  # queued/processing/done
+    attempts = Column(Integer, default=0)
+    
+    enqueued_at = Column(DateTime, default=datetime.utcnow)
+    claimed_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    verdict = Column(Text, nullable=True)  # 審查結果（JSON）
+    error = Column(Text, nullable=True)  # 最近一次失敗原因
+
+
+# ========== 任務技能需求 ==========
+
+_matcher = MatchingEngine()
+
+
+def infer_required_skills(title, description, category):
+    """推斷任務所需技能，回傳存入 Task.required_skills 的 JSON 字串"""
+    skills = _matcher.infer_task_skills({
+        'title': title or '',
+        'description': description or '',
+        'category': category or ''
+    })
+    return json.dumps(skills, ensure_ascii=False)
+
+
+@event.listens_for(Task, 'before_insert')
+@event.listens_for(Task, 'before_update')
+def _refresh_required_skills(mapper, connection, target):
+    """寫入任務前更新技能需求；只改狀態等其他欄位時不重新推斷"""
+    state = inspect(target)
+    if target.required_skills is None or any(
+        state.attrs[name].history.has_changes() for name in ('title', 'description', 'category')
+    ):
+        target.required_skills = infer_required_skills(target.title, target.description, target.category)
+
+
+# ========== 任務時間 ==========
+
+TIME_FIELDS = ('accept_deadline', 'task_start_time', 'task_duration')
+
+
+def parse_task_times(accept_deadline, task_start_time, task_duration):
+    """
+    解析任務時間文字
+
+    Returns:
+        dict: Task 的 scheduled_date / start_time / duration_minutes / starts_at / time_slots 欄位值
+    """
+    times = schedule.parse_task_times(accept_deadline, task_start_time, task_duration)
+    times['time_slots'] = schedule.encode(schedule.slots_between(times['starts_at'], times['duration_minutes']))
+    return times
+
+
+@event.listens_for(Task, 'before_insert')
+@event.listens_for(Task, 'before_update')
+def _refresh_task_times(mapper, connection, target):
+    """寫入任務前將預定日期/開始時間/時長解析成有型別的欄位與時段，查詢與媒合時不必再解析"""
+    state = inspect(target)
+    if state.pending or any(state.attrs[name].history.has_changes() for name in TIME_FIELDS):
+        for name, value in parse_task_times(target.accept_deadline, target.task_start_time, target.task_duration).items():
+            setattr(target, name, value)
+
+
+def backfill_required_skills(batch_size=500):
+    """為尚未存技能需求的既有任務補算（例如剛加上欄位的舊資料庫）"""
+    filled = 0
+    
+    try:
+        while True:
+            with session_scope() as session:
+                rows = session.query(Task.id, Task.title, Task.description, Task.category).filter(
+                    Task.required_skills.is_(None)
+                ).limit(batch_size).all()
+                
+                if not rows:
+                    break
+                
+                session.bulk_update_mappings(Task, [
+                    {'id': row.id, 'required_skills': infer_required_skills(row.title, row.description, row.category)}
+                    for row in rows
+                ])
+                filled += len(rows)
+    except Exception as e:
+        print(f"⚠️ 補算任務技能需求失敗: {e}")
+    
+    if filled:
+        read_cache.invalidate('tasks')
+        print(f"✅ 已補算 {filled} 筆任務的技能需求")
+    return filled
+
+
+def backfill_task_times(batch_size=500):
+    """
+    將既有任務的時間文字轉成有型別的欄位與時段（例如剛加上欄位的舊資料庫）
+
+    無法解析的文字轉換後仍是 None，因此以 id 遞增分批，不會重複讀取同一筆。
+    """
+    filled = 0
+    last_id = 0
+    
+    try:
+        while True:
+            with session_scope() as session:
+                rows = session.query(Task.id, Task.accept_deadline, Task.task_start_time, Task.task_duration).filter(
+                    Task.id > last_id,
+                    or_(
+                        and_(Task.accept_deadline.isnot(None), Task.scheduled_date.is_(None)),
+                        and_(Task.task_duration.isnot(None), Task.duration_minutes.is_(None)),
+                        and_(Task.task_start_time.isnot(None), Task.start_time.is_(None))
+                    )
+                ).order_by(Task.id).limit(batch_size).all()
+                
+                if not rows:
+                    break
+                last_id = rows[-1].id
+                
+                mappings = [
+                    {'id': row.id, **parse_task_times(row.accept_deadline, row.task_start_time, row.task_duration)}
+                    for row in rows
+                ]
+                session.bulk_update_mappings(Task, mappings)
+                filled += len(rows)
+    except Exception as e:
+        print(f"⚠️ 轉換任務時間失敗: {e}")
+    
+    if filled:
+        read_cache.invalidate('tasks')
+        open_task_index.clear()
+        recommendation_cache.invalidate('open_tasks')
+        print(f"✅ 已轉換 {filled} 筆任務的時間欄位")
+    return filled
+
+
+_task_durations_repaired = False
+
+
+def repair_task_durations(batch_size=500):
+    """
+    重新解析含「十」或「個半」的時長文字，只更新結果改變的任務
+
+    舊版解析器只認單一個中文數字（「十五分鐘」→ 5、「一個半小時」→ 30），
+    已寫入的 duration_minutes 與時段需要更正。每個程序只執行一次（init_db 每次腳本執行都會呼叫）。
+    """
+    global _task_durations_repaired
+    
+    if _task_durations_repaired:
+        return 0
+    
+    repaired = 0
+    last_id = 0
+    
+    try:
+        while True:
+            with session_scope() as session:
+                rows = session.query(
+                    Task.id, Task.accept_deadline, Task.task_start_time, Task.task_duration, Task.duration_minutes
+                ).filter(
+                    Task.id > last_id,
+                    or_(Task.task_duration.like('%十%'), Task.task_duration.like('%個半%'))
+                ).order_by(Task.id).limit(batch_size).all()
+                
+                if not rows:
+                    break
+                last_id = rows[-1].id
+                
+                mappings = []
+                for row in rows:
+                    times = parse_task_times(row.accept_deadline, row.task_start_time, row.task_duration)
+                    if times['duration_minutes'] != row.duration_minutes:
+                        mappings.append({'id': row.id, **times})
+                if mappings:
+                    session.bulk_update_mappings(Task, mappings)
+                    repaired += len(mappings)
+        _task_durations_repaired = True
+    except Exception as e:
+        print(f"⚠️ 更正任務時長失敗: {e}")
+    
+    if repaired:
+        read_cache.invalidate('tasks')
+        open_task_index.clear()
+        recommendation_cache.invalidate('open_tasks')
+        print(f"✅ 已更正 {repaired} 筆任務的時長")
+    return repaired
+
+
+# ========== 開放任務倒排索引 ==========
+
+# 推薦頁以此取候選任務，任務開放/關閉時由寫入函數同步更新
+open_task_index = OpenTaskIndex()
+
+# 推薦排名快取：key 含使用者資料與開放任務的版本；
+# 開放任務變動時失效 'open_tasks'，使用者技能/評價變動時失效 'user:<id>'
+recommendation_cache = TTLCache(
+    max_entries=Config.RECOMMENDATION_CACHE_MAX_ENTRIES,
+    ttl_seconds=Config.RECOMMENDATION_CACHE_TTL_SECONDS
+)
+_recommendation_timing = {'computations': 0, 'total_ms': 0.0, 'last_ms': None}
+_recommendation_timing_lock = threading.Lock()
+
+# 影響推薦分數的使用者欄位
+RECOMMENDATION_PROFILE_FIELDS = (
+    'skills', 'campus', 'willing_cross_campus', 'avg_rating', 'trust_score', 'completed_tasks', 'availability'
+)
+
+
+def _open_task_entry(task):
+    """索引需要的任務欄位（Task 或查詢列皆可）"""
+    return {
+        'id': task.id,
+        'title': task.title or '',
+        'description': task.description or '',
+        'category': task.category or '',
+        'campus': task.campus or '',
+        'is_urgent': task.is_urgent,
+        'publisher_id': task.publisher_id,
+        'required_skills': json.loads(task.required_skills) if task.required_skills is not None else None,
+        'time_slots': task.time_slots
+    }
+
+
+def _index_open_task(task):
+    """任務開放後加入索引，推薦結果隨之失效"""
+    open_task_index.add(_open_task_entry(task))
+    recommendation_cache.invalidate('open_tasks')
+
+
+def _unindex_task(task_id):
+    """任務不再開放時移出索引，推薦結果隨之失效"""
+    open_task_index.remove(task_id)
+    recommendation_cache.invalidate('open_tasks')
+
+
+def _invalidate_user_recommendations(*user_ids):
+    """使用者技能/評價/完成數改變時清除其推薦結果"""
+    recommendation_cache.invalidate(*(f'user:{user_id}' for user_id in user_ids))
+
+
+def _profile_stamp(user):
+    """使用者資料中影響推薦的部分（作為快取 key）"""
+    return tuple(
+        tuple(sorted(value)) if isinstance(value, list) else value
+        for value in (user.get(field) for field in RECOMMENDATION_PROFILE_FIELDS)
+    )
+
+
+def recommendation_profile_hash(user):
+    """使用者資料中影響推薦部分的雜湊，存於 UserRecommendation.profile_hash"""
+    return hashlib.sha1(json.dumps(_profile_stamp(user), ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def merge_rankings(stored, delta, top_n):
+    """既有排名與另外評分的任務合併（排序與 recommend_from_index 相同：分數、任務 id）"""
+    best = TopK(top_n)
+    for task_id, details in stored + delta:
+        best.push((details['total_score'], task_id), (task_id, details))
+    return best.items()
+
+
+def get_precomputed_recommendations(user, top_n=5, index=None):
+    """
+    讀取預先計算的推薦結果，並補上計算後才變動的任務
+
+    只看這位使用者自己的結果：
+    1. 使用者資料改變（profile_hash 不同）→ 無效
+    2. 結果中的任務已關閉或被修改 → 若結果已含全部可推薦任務（列數少於計算時的名次），
+       移除該任務即可；否則第 N+1 名未知，無效
+    3. 計算後新增/修改的開放任務只對這位使用者評分，再與既有結果合併
+    列數少於 top_n 時，只要計算時已存下全部可推薦任務仍然有效。
+
+    Returns:
+        list: [(任務 id, 分數明細)]；無有效結果時為 None
+    """
+    try:
+        index = index or get_open_task_index()
+        with session_scope() as session:
+            rows = (
+                session.query(UserRecommendation)
+                .filter(UserRecommendation.user_id == user.get('id'))
+                .order_by(UserRecommendation.rank)
+                .all()
+            )
+            if not rows or rows[0].profile_hash != recommendation_profile_hash(user):
+                return None
+            
+            complete = rows[0].top_n is not None and len(rows) < rows[0].top_n
+            if len(rows) < top_n and not complete:
+                return None
+            
+            computed_at = min(row.computed_at for row in rows)
+            changed_ids = {
+                task_id for (task_id,) in
+                session.query(Task.id).filter(Task.status == 'open', Task.updated_at > computed_at)
+            }
+            stored = [(row.task_id, row.to_details()) for row in rows]
+        
+        with index.lock:
+            open_ids = set(index.task_ids[index.active_bitmap()].tolist())
+            if any(task_id not in open_ids or task_id in changed_ids for task_id, _ in stored):
+                if not complete:
+                    return None
+                stored = [(task_id, details) for task_id, details in stored
+                          if task_id in open_ids and task_id not in changed_ids]
+            
+            delta = []
+            if changed_ids:
+                block = index.block(np.flatnonzero(np.isin(index.task_ids, list(changed_ids))))
+                ranking = _matcher.top_recommendations_matrix([user], block, top_n)[0]
+                delta = [(int(block['tasks'][i]), details) for i, details in ranking]
+        
+        return merge_rankings(stored, delta, top_n)
+    except Exception as e:
+        print(f"⚠️ 讀取預先計算推薦失敗: {e}")
+        return None
+
+
+def get_recommendations(user, top_n=5):
+    """
+    取得使用者的推薦排名（快取）
+
+    key 為 (使用者 id, 使用者資料, 開放任務版本)，任一改變都會重新取得；
+    未命中時優先使用 precompute_recommendations.py 的有效結果，否則即時計算。
+    只快取排名與分數，任務內容由呼叫端以 get_tasks_by_ids() 取得（申請數等才會是最新的）。
+
+    Returns:
+        dict: 'ranking' [(任務 id, 分數明細)], 'scored' 評分任務數, 'open_tasks' 開放任務數,
+              'compute_ms' 計算耗時, 'cached' 是否來自快取, 'precomputed' 是否為預先計算結果
+    """
+    index = get_open_task_index()
+    key = ('recommendations', user.get('id'), _profile_stamp(user), index.version, top_n)
+    
+    hit, value = recommendation_cache.get(key)
+    if hit:
+        return {**value, 'cached': True}
+    
+    namespaces = ('open_tasks', f"user:{user.get('id')}")
+    generation = recommendation_cache.generation(namespaces)
+    
+    start = time.perf_counter()
+    ranking = get_precomputed_recommendations(user, top_n, index)
+    precomputed = ranking is not None
+    scored = 0
+    if not precomputed:
+        ranking, scored = _matcher.recommend_from_index(user, index, top_n)
+    compute_ms = (time.perf_counter() - start) * 1000
+    
+    value = {
+        'ranking': ranking, 'scored': scored, 'open_tasks': len(index),
+        'compute_ms': compute_ms, 'precomputed': precomputed
+    }
+    recommendation_cache.set(key, value, namespaces, generation)
+    
+    if not precomputed:
+        with _recommendation_timing_lock:
+            _recommendation_timing['computations'] += 1
+            _recommendation_timing['total_ms'] += compute_ms
+            _recommendation_timing['last_ms'] = compute_ms
+    
+    return {**value, 'cached': False}
+
+
+def get_recommendation_stats():
+    """推薦快取命中率與計算耗時"""
+    stats = recommendation_cache.stats()
+    with _recommendation_timing_lock:
+        computations = _recommendation_timing['computations']
+        stats.update({
+            'computations': computations,
+            'avg_compute_ms': _recommendation_timing['total_ms'] / computations if computations else 0.0,
+            'last_compute_ms': _recommendation_timing['last_ms']
+        })
+    return stats
+
+
+def get_open_task_index():
+    """取得開放任務索引；第一次使用（或清空後）從資料庫建立"""
+    with open_task_index.lock:
+        if not open_task_index.loaded:
+            with session_scope() as session:
+                rows = session.query(
+                    Task.id, Task.title, Task.description, Task.category, Task.campus,
+                    Task.is_urgent, Task.publisher_id, Task.required_skills, Task.time_slots
+                ).filter(Task.status == 'open').yield_per(1000)
+                open_task_index.rebuild(_open_task_entry(row) for row in rows)
+    return open_task_index
+
+
+# ========== 全文檢索（SQLite FTS5） ==========
+
+# 以 trigram 分詞，中文不需斷詞即可做子字串比對；由觸發器與 tasks 表同步
+_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+        title, description, location,
+        content='tasks', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF title, description, location ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+        INSERT INTO tasks_fts(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END"""
+]
+
+# trigram 至少需要 3 個字元才能比對
+FTS_MIN_QUERY_LENGTH = 3
+
+tasks_fts = table('tasks_fts', column('rowid'))
+
+_fts_supported = None
+
+
+def fulltext_search_enabled():
+    """目前的資料庫是否支援 FTS5 trigram（SQLite 3.34+）"""
+    global _fts_supported
+    
+    if _fts_supported is None:
+        _fts_supported = False
+        if engine.dialect.name == 'sqlite':
+            # 支援與否取決於連結的 SQLite 函式庫，用記憶體資料庫探測即可
+            probe = sqlite3.connect(':memory:')
+            try:
+                probe.execute("CREATE VIRTUAL TABLE fts_probe USING fts5(x, tokenize='trigram')")
+                _fts_supported = True
+            except sqlite3.Error as e:
+                print(f"⚠️ 不支援 FTS5 trigram，搜尋改用 LIKE: {e}")
+            finally:
+                probe.close()
+    
+    return _fts_supported
+
+
+@event.listens_for(Task.__table__, 'after_create')
+def _create_fulltext_index(target, connection, **kw):
+    """建立 tasks 表之後建立全文索引"""
+    ensure_fulltext_index(connection)
+
+
+@event.listens_for(Task.__table__, 'before_drop')
+def _drop_fulltext_index(target, connection, **kw):
+    """刪除 tasks 表前一併刪除全文索引，避免重建後殘留舊資料"""
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql("DROP TABLE IF EXISTS tasks_fts")
+
+
+def ensure_fulltext_index(connection=None):
+    """建立全文索引與同步觸發器；既有資料庫第一次建立時會從 tasks 重建索引"""
+    if not fulltext_search_enabled():
+        return
+    
+    if connection is None:
+        with engine.begin() as connection:
+            return ensure_fulltext_index(connection)
+    
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'"
+    ).first()
+    
+    for ddl in _FTS_DDL:
+        connection.exec_driver_sql(ddl)
+    
+    if not exists:
+        connection.exec_driver_sql("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')")
+
+
 # ========== 資料庫操作函數 ==========
 
 def init_db():
     """初始化資料庫"""
     Base.metadata.create_all(engine)
+    ensure_columns()
+    ensure_indexes()
+    ensure_fulltext_index()
+    backfill_required_skills()
+    backfill_task_times()
+    repair_task_durations()
+
+
+def get_database_status():
+    """
+    檢查資料庫狀態（不依賴特定後端）
+
+    Returns:
+        str: 'ready' 可正常使用 / 'empty' 尚未建立資料表 / 'error' 無法查詢
+    """
+    try:
+        if not inspect(engine).has_table(User.__tablename__):
+            return 'empty'
+        with session_scope() as session:
+            session.query(User).first()
+        return 'ready'
+    except Exception as e:
+        print(f"⚠️ 資料庫檢查失敗: {e}")
+        return 'error'
+
+
+def ensure_columns():
+    """為既有資料庫補上模型新增的欄位（create_all 不會修改已存在的表格）"""
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        
+        existing = {col['name'] for col in inspector.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in existing:
+                continue
+            
+            try:
+                with engine.begin() as conn:
+                    conn.exec_driver_sql(
+                        f"ALTER TABLE {preparer.format_table(table)} "
+                        f"ADD COLUMN {preparer.format_column(col)} {col.type.compile(dialect=engine.dialect)}"
+                    )
+                print(f"✅ 已新增欄位 {table.name}.{col.name}")
+            except Exception as e:
+                print(f"⚠️ 新增欄位 {table.name}.{col.name} 失敗: {e}")
+
+
+def ensure_indexes():
+    """為既有資料庫補建宣告的索引（create_all 不會替已存在的表格建索引）"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                # 既有資料若有重複列，唯一索引會建立失敗
+                print(f"⚠️ 建立索引 {index.name} 失敗: {e}")
+
+
+def task_query(session):
+    """
+    任務查詢（含申請數）
+
+    以 joinedload 一併載入發布者與接受者，申請數以相關子查詢計算，
+    回傳 (Task, application_count) 列，不論筆數多少都只需一次查詢。
+    子查詢走 (task_id, applicant_id) 索引，且只對實際回傳（分頁後）的列計算，
+    不必先彙總整張 task_applications。
+    """
+    application_count = (
+        session.query(func.count(TaskApplication.id))
+        .filter(TaskApplication.task_id == Task.id)
+        .correlate(Task)
+        .scalar_subquery()
+    )
+    
+    return (
+        session.query(Task, application_count)
+        .options(joinedload(Task.publisher), joinedload(Task.accepted_user))
+    )
+
 
+def tasks_to_dicts(rows):
+    """將 task_query() 的結果批次轉成字典"""
+    return [task.to_dict(application_count=count) for task, count in rows]
 
+
+@read_cache.cached('users')
 def get_all_users():
     """取得所有使用者"""
-    session = Session()
-    users = session.query(User).filter_by(status='active').all()
-    return [u.to_dict() for u in users]
+    with session_scope() as session:
+        users = session.query(User).filter_by(status='active').order_by(User.id).all()
+        return [u.to_dict() for u in users]
 
 
+@read_cache.cached('users')
 def get_user_by_name(name):
     """根據名字取得使用者"""
-    session = Session()
-    user = session.query(User).filter_by(name=name, status='active').first()
-    return user.to_dict() if user else None
+    with session_scope() as session:
+        user = session.query(User).filter_by(name=name, status='active').first()
+        return user.to_dict() if user else None
 
 
+@read_cache.cached('users')
 def get_user_by_id(user_id):
     """根據 ID 取得使用者"""
-    session = Session()
-    user = session.query(User).filter_by(id=user_id).first()
-    return user.to_dict() if user else None
+    with session_scope() as session:
+        user = session.query(User).filter_by(id=user_id).first()
+        return user.to_dict() if user else None
 
 
 def update_user_skills(user_id, skills_list):
@@ -242,6 +1011,8 @@ def update_user_skills(user_id, skills_list):
         if user:
             user.skills = json.dumps(skills_list)
             session.commit()
+            read_cache.invalidate('users')
+            _invalidate_user_recommendations(user_id)
             return True
         return False
     except Exception as e:
@@ -252,23 +1023,180 @@ def update_user_skills(user_id, skills_list):
         session.close()
 
 
-def get_all_tasks(status=None, exclude_user_id=None):
-    """取得所有任務"""
+def update_user_availability(user_id, availability):
+    """
+    更新使用者每週可接任務的時段
+
+    Args:
+        availability (int): schedule 模組的位元集合，0 表示不限時段
+    """
     session = Session()
-    query = session.query(Task)
+    try:
+        user = session.query(User).filter_by(id=user_id).first()
+        if user:
+            user.availability = schedule.encode(availability)
+            session.commit()
+            read_cache.invalidate('users')
+            _invalidate_user_recommendations(user_id)
+            return True
+        return False
+    except Exception as e:
+        session.rollback()
+        print(f"更新可接時段失敗: {e}")
+        return False
+    finally:
+        session.close()
+
+
+def _apply_cursor(query, created_at_column, id_column, cursor):
+    """
+    鍵集分頁：只取排序（新到舊）在 cursor 之後的列
+
+    Args:
+        cursor (tuple): 上一頁最後一筆的 (created_at ISO 字串或 datetime, id)
+    """
+    if not cursor:
+        return query
     
-    if status:
-        query = query.filter_by(status=status)
+    created_at, row_id = cursor
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    
+    return query.filter(or_(
+        created_at_column < created_at,
+        and_(created_at_column == created_at, id_column < row_id)
+    ))
+
+
+@read_cache.cached('tasks', 'users', 'applications')
+def get_all_tasks(status=None, exclude_user_id=None, category=None, campus=None, cursor=None, page_size=None):
+    """
+    取得所有任務（依發布時間新到舊）
+    
+    Args:
+        cursor (tuple): 上一頁最後一筆任務的 'cursor'，None 表示第一頁
+        page_size (int): 每頁筆數，None 表示全部
+    """
+    with session_scope() as session:
+        query = task_query(session)
+        
+        if status:
+            query = query.filter(Task.status == status)
+        
+        if exclude_user_id:
+            query = query.filter(Task.publisher_id != exclude_user_id)
+        
+        if category:
+            query = query.filter(Task.category == category)
+        
+        if campus:
+            query = query.filter(Task.campus == campus)
+        
+        query = _apply_cursor(query, Task.created_at, Task.id, cursor)
+        query = query.order_by(Task.created_at.desc(), Task.id.desc())
+        
+        if page_size:
+            query = query.limit(page_size)
+        
+        return tasks_to_dicts(query.all())
+
+
+def _search_query(session, search, query, category, campus, exclude_user_id, status):
+    """
+    在 search 查詢上加入搜尋條件
+
+    Returns:
+        tuple: (查詢, 排名欄位或 None)
+    """
+    rank = None
+    keyword = (query or '').strip()
+    
+    if keyword:
+        if fulltext_search_enabled() and len(keyword) >= FTS_MIN_QUERY_LENGTH:
+            # 整段關鍵字視為一個片語，與原本的子字串比對語意相同
+            phrase = '"' + keyword.replace('"', '""') + '"'
+            matches = (
+                session.query(
+                    tasks_fts.c.rowid.label('task_id'),
+                    func.bm25(literal_column('tasks_fts')).label('rank')
+                )
+                .filter(literal_column('tasks_fts').op('MATCH')(phrase))
+                .subquery()
+            )
+            search = search.join(matches, matches.c.task_id == Task.id)
+            rank = matches.c.rank
+        else:
+            search = search.filter(or_(
+                Task.title.icontains(keyword, autoescape=True),
+                Task.description.icontains(keyword, autoescape=True),
+                Task.location.icontains(keyword, autoescape=True)
+            ))
     
+    if status:
+        search = search.filter(Task.status == status)
+    if category:
+        search = search.filter(Task.category == category)
+    if campus:
+        search = search.filter(Task.campus == campus)
     if exclude_user_id:
-        query = query.filter(Task.publisher_id != exclude_user_id)
+        search = search.filter(Task.publisher_id != exclude_user_id)
     
-    tasks = query.order_by(Task.created_at.desc()).all()
-    return [t.to_dict() for t in tasks]
+    return search, rank
+
+
+@read_cache.cached('tasks', 'users', 'applications')
+def search_tasks(query='', category=None, campus=None, limit=20, offset=0, exclude_user_id=None, status='open'):
+    """
+    搜尋任務（篩選、排序、分頁皆在資料庫完成）
+    
+    SQLite 支援 FTS5 時以 trigram 全文索引比對標題/描述/地點並依 bm25 排序；
+    關鍵字少於 3 個字或其他資料庫則以 LIKE 比對，依發布時間排序。
+    
+    Args:
+        query (str): 搜尋關鍵字（空字串表示不限）
+        category (str): 分類，None 表示全部
+        campus (str): 校區，None 表示全部
+        limit (int): 每頁筆數，None 表示不限
+        offset (int): 略過筆數
+        exclude_user_id (int): 排除此使用者發布的任務
+        status (str): 任務狀態
+    
+    Returns:
+        list: 任務字典列表
+    """
+    with session_scope() as session:
+        search, rank = _search_query(session, task_query(session), query, category, campus, exclude_user_id, status)
+        
+        if rank is not None:
+            search = search.order_by(rank, Task.created_at.desc())
+        else:
+            search = search.order_by(Task.created_at.desc())
+        
+        if limit is not None:
+            search = search.limit(limit)
+        if offset:
+            search = search.offset(offset)
+        
+        return tasks_to_dicts(search.all())
+
+
+@read_cache.cached('tasks')
+def count_search_results(query='', category=None, campus=None, exclude_user_id=None, status='open'):
+    """計算 search_tasks() 符合條件的總筆數"""
+    with session_scope() as session:
+        search, _ = _search_query(session, session.query(func.count(Task.id)), query, category, campus, exclude_user_id, status)
+        return search.scalar()
 
 
-def create_task(task_data):
-    """建立任務（會扣除發起者點數）"""
+def create_task(task_data, review=False):
+    """
+    建立任務（會扣除發起者點數）
+
+    Args:
+        task_data (dict): 任務欄位
+        review (bool): True 時任務先進入「審核中」並排入背景審查佇列，
+                       審查通過才開放（不必等 AI 回應即可回覆發布者）
+    """
     session = Session()
     
     try:
@@ -292,13 +1220,21 @@ def create_task(task_data):
             is_urgent=task_data.get('is_urgent', False),
             accept_deadline=task_data.get('accept_deadline'),
             task_start_time=task_data.get('task_start_time'),
-            task_duration=task_data.get('task_duration')
+            task_duration=task_data.get('task_duration'),
+            status='pending_review' if review else 'open'
         )
         
         session.add(task)
+        if review:
+            session.flush()
+            session.add(ModerationQueue(task_id=task.id))
+        mark_stats_stale(session)
         session.commit()
+        read_cache.invalidate('tasks', 'users')
+        if not review:
+            _index_open_task(task)
         
-        print(f"✅ 任務建立成功，ID: {task.id}")
+        print(f"✅ 任務建立成功，ID: {task.id}{'（等待審查）' if review else ''}")
         return task.id
     except Exception as e:
         session.rollback()
@@ -308,6 +1244,9 @@ def create_task(task_data):
         session.close()
 
 
+CANCELLABLE_STATUSES = ('open', 'pending_review', 'flagged')
+
+
 def cancel_task(task_id, publisher_id):
     """取消任務（返還點數）"""
     session = Session()
@@ -317,7 +1256,8 @@ def cancel_task(task_id, publisher_id):
         if not task:
             return False
         
-        if task.status != 'open':
+        # 🔧 審核中/被標記的任務也可以取消（尚未開放，沒有申請）
+        if task.status not in CANCELLABLE_STATUSES:
             return False
         
         publisher = session.query(User).filter_by(id=publisher_id).first()
@@ -329,7 +1269,11 @@ def cancel_task(task_id, publisher_id):
         for app in applications:
             app.status = 'rejected'
         
+        session.query(ModerationQueue).filter_by(task_id=task_id).delete(synchronize_session=False)
+        mark_stats_stale(session)
         session.commit()
+        read_cache.invalidate('tasks', 'users', 'applications')
+        _unindex_task(task_id)
         return True
     
     except Exception as e:
@@ -340,29 +1284,94 @@ def cancel_task(task_id, publisher_id):
         session.close()
 
 
-def get_user_tasks(user_id, task_type='published'):
-    """取得使用者的任務"""
-    session = Session()
+def get_upcoming_tasks(hours=24, exclude_user_id=None, limit=20):
+    """
+    取得接下來 N 小時內開始的開放任務（依開始時間先到後）
+
+    以 (status, starts_at) 索引做範圍查詢；沒有指定開始時間的任務不包含在內。
+    查詢區間取到分鐘，同一分鐘內的呼叫共用快取。
+    """
+    now = datetime.now().replace(second=0, microsecond=0)
+    return _get_tasks_starting_between(now, now + timedelta(hours=hours), exclude_user_id, limit)
+
+
+@read_cache.cached('tasks', 'users', 'applications')
+def _get_tasks_starting_between(start, end, exclude_user_id=None, limit=20):
+    """開始時間落在 [start, end) 的開放任務"""
+    with session_scope() as session:
+        query = task_query(session).filter(
+            Task.status == 'open',
+            Task.starts_at >= start,
+            Task.starts_at < end
+        )
+        if exclude_user_id:
+            query = query.filter(Task.publisher_id != exclude_user_id)
+
+        rows = query.order_by(Task.starts_at, Task.id).limit(limit).all()
+        return tasks_to_dicts(rows)
+
+
+@read_cache.cached('tasks', 'users', 'applications')
+def get_tasks_by_ids(task_ids):
+    """
+    依 id 取得任務（保持傳入順序，已不存在的任務略過）
+
+    Args:
+        task_ids (tuple): 任務 id（需為 tuple 才能作為快取 key）
+    """
+    if not task_ids:
+        return []
     
-    if task_type == 'published':
-        tasks = session.query(Task).filter_by(publisher_id=user_id).order_by(Task.created_at.desc()).all()
-        return [t.to_dict() for t in tasks]
+    with session_scope() as session:
+        rows = task_query(session).filter(Task.id.in_(task_ids)).all()
+        tasks = {task['id']: task for task in tasks_to_dicts(rows)}
+        return [tasks[task_id] for task_id in task_ids if task_id in tasks]
+
+
+@read_cache.cached('tasks', 'users', 'applications')
+def get_user_tasks(user_id, task_type='published', cursor=None, page_size=None):
+    """
+    取得使用者的任務（新到舊）
+    
+    發布的任務依發布時間排序；申請的任務依申請時間排序，其 'cursor' 為 (applied_at, 申請 id)。
+    
+    Args:
+        cursor (tuple): 上一頁最後一筆的 'cursor'，None 表示第一頁
+        page_size (int): 每頁筆數，None 表示全部
+    """
+    if task_type not in ('published', 'applied'):
+        return []
     
-    elif task_type == 'applied':
-        applications = session.query(TaskApplication).filter_by(applicant_id=user_id).all()
+    with session_scope() as session:
+        if task_type == 'published':
+            query = task_query(session).filter(Task.publisher_id == user_id)
+            query = _apply_cursor(query, Task.created_at, Task.id, cursor)
+            query = query.order_by(Task.created_at.desc(), Task.id.desc())
+            if page_size:
+                query = query.limit(page_size)
+            return tasks_to_dicts(query.all())
+        
+        query = (
+            task_query(session)
+            .add_columns(TaskApplication.id, TaskApplication.status, TaskApplication.applied_at)
+            .join(TaskApplication, TaskApplication.task_id == Task.id)
+            .filter(TaskApplication.applicant_id == user_id)
+        )
+        query = _apply_cursor(query, TaskApplication.applied_at, TaskApplication.id, cursor)
+        query = query.order_by(TaskApplication.applied_at.desc(), TaskApplication.id.desc())
+        if page_size:
+            query = query.limit(page_size)
+        
         result = []
         
-        for app in applications:
-            task = session.query(Task).filter_by(id=app.task_id).first()
-            if task:
-                task_dict = task.to_dict()
-                task_dict['application_status'] = app.status
-                task_dict['applied_at'] = app.applied_at.strftime('%Y-%m-%d %H:%M')
-                result.append(task_dict)
+        for task, count, application_id, application_status, applied_at in query.all():
+            task_dict = task.to_dict(application_count=count)
+            task_dict['application_status'] = application_status
+            task_dict['applied_at'] = applied_at.strftime('%Y-%m-%d %H:%M')
+            task_dict['cursor'] = (applied_at.isoformat(), application_id)
+            result.append(task_dict)
         
         return result
-    
-    return []
 
 
 def apply_for_task(task_id, applicant_id):
@@ -395,6 +1404,7 @@ def apply_for_task(task_id, applicant_id):
         
         session.add(application)
         session.commit()
+        read_cache.invalidate('applications')
         
         print("✅ 申請成功")
         return True
@@ -406,11 +1416,17 @@ def apply_for_task(task_id, applicant_id):
         session.close()
 
 
+@read_cache.cached('applications', 'users')
 def get_task_applications(task_id):
     """取得任務的所有申請"""
-    session = Session()
-    applications = session.query(TaskApplication).filter_by(task_id=task_id).all()
-    return [a.to_dict() for a in applications]
+    with session_scope() as session:
+        applications = (
+            session.query(TaskApplication)
+            .options(joinedload(TaskApplication.applicant))
+            .filter_by(task_id=task_id)
+            .all()
+        )
+        return [a.to_dict() for a in applications]
 
 
 def accept_application(task_id, applicant_id, publisher_id):
@@ -440,7 +1456,10 @@ def accept_application(task_id, applicant_id, publisher_id):
             else:
                 app.status = 'rejected'
         
+        mark_stats_stale(session)
         session.commit()
+        read_cache.invalidate('tasks', 'applications')
+        _unindex_task(task_id)
         return True
     
     except Exception as e:
@@ -468,6 +1487,7 @@ def helper_notify_completion(task_id, helper_id):
         
         task.helper_notified_completion = True
         session.commit()
+        read_cache.invalidate('tasks')
         return True
     
     except Exception as e:
@@ -505,7 +1525,11 @@ def complete_task(task_id, user_id):
             helper.completed_tasks += 1
             publisher.completed_tasks += 1
         
+        affected_user_ids = (task.publisher_id, task.accepted_user_id)
+        mark_stats_stale(session)
         session.commit()
+        read_cache.invalidate('tasks', 'users')
+        _invalidate_user_recommendations(*affected_user_ids)
         return True
     
     except Exception as e:
@@ -540,7 +1564,13 @@ def auto_complete_expired_tasks():
                 helper.completed_tasks += 1
                 publisher.completed_tasks += 1
         
+        affected_user_ids = {user_id for task in expired_tasks for user_id in (task.publisher_id, task.accepted_user_id)}
+        if expired_tasks:
+            mark_stats_stale(session)
         session.commit()
+        if expired_tasks:
+            read_cache.invalidate('tasks', 'users')
+            _invalidate_user_recommendations(*affected_user_ids)
         return len(expired_tasks)
     
     except Exception as e:
@@ -585,7 +1615,10 @@ def submit_review(task_id, reviewer_id, reviewee_id, rating, comment=''):
         
         update_user_rating(session, reviewee_id)
         
+        mark_stats_stale(session)
         session.commit()
+        read_cache.invalidate('reviews', 'users')
+        _invalidate_user_recommendations(reviewee_id)
         return True
     
     except Exception as e:
@@ -609,45 +1642,422 @@ def update_user_rating(session, user_id):
             user.trust_score = round((avg_rating / 5.0 * 0.7) + (completion_rate * 0.3), 2)
 
 
+@read_cache.cached('reviews', 'users', 'tasks')
 def get_reviews_for_user(user_id):
     """取得使用者收到的評價"""
-    session = Session()
-    reviews = session.query(Review).filter_by(reviewee_id=user_id).order_by(Review.created_at.desc()).all()
-    return [r.to_dict() for r in reviews]
+    with session_scope() as session:
+        reviews = (
+            session.query(Review)
+            .options(joinedload(Review.reviewer), joinedload(Review.reviewee), joinedload(Review.task))
+            .filter_by(reviewee_id=user_id)
+            .order_by(Review.created_at.desc())
+            .all()
+        )
+        return [r.to_dict() for r in reviews]
 
 
+@read_cache.cached('tasks', 'reviews')
 def check_review_status(task_id, user_id):
     """檢查用戶是否已對任務進行評價"""
+    with session_scope() as session:
+        task = session.query(Task).filter_by(id=task_id, status='completed').first()
+        if not task:
+            return {'can_review': False, 'reviewee_id': None, 'has_reviewed': False}
+        
+        if user_id == task.publisher_id:
+            reviewee_id = task.accepted_user_id
+        elif user_id == task.accepted_user_id:
+            reviewee_id = task.publisher_id
+        else:
+            return {'can_review': False, 'reviewee_id': None, 'has_reviewed': False}
+        
+        existing = session.query(Review).filter_by(
+            task_id=task_id,
+            reviewer_id=user_id,
+            reviewee_id=reviewee_id
+        ).first()
+        
+        return {
+            'can_review': True,
+            'reviewee_id': reviewee_id,
+            'has_reviewed': existing is not None
+        }
+
+
+# ========== 背景審查佇列 ==========
+
+# 審查結果為這些等級時任務被標記（不開放），等人工處理或由發布者取消
+FLAGGED_RISK_LEVELS = ('high', 'critical')
+
+
+def is_flagged_verdict(data):
+    """審查結果是否應標記任務"""
+    return data.get('risk_level') in FLAGGED_RISK_LEVELS or data.get('recommendation') in ('需人工審核', '自動拒絕')
+
+
+def claim_moderation_batch(limit=None):
+    """
+    領取一批待審任務（依排入順序，標記為處理中）
+
+    處理中超過 Config.MODERATION_CLAIM_TIMEOUT_SECONDS 的項目視為工作者中斷，可重新領取。
+    多個工作者（Streamlit 程序內的工作者、moderation_worker.py）可同時執行：
+    每個項目以條件式 UPDATE 領取（狀態與領取時間仍是讀到的值才更新），只保留實際更新到的項目，
+    同一項目不會被兩個工作者領到。PostgreSQL 另以 FOR UPDATE SKIP LOCKED 讓工作者直接略過彼此鎖住的列；
+    SQLite 不支援 SKIP LOCKED，靠條件式 UPDATE 保證。
+
+    Returns:
+        list: [{'queue_id', 'task_id', 'attempts', 'title', 'description', 'category'}, ...]
+    """
+    now = datetime.utcnow()
+    claimable = or_(
+        ModerationQueue.status == 'queued',
+        and_(
+            ModerationQueue.status == 'processing',
+            ModerationQueue.claimed_at < now - timedelta(seconds=Config.MODERATION_CLAIM_TIMEOUT_SECONDS)
+        )
+    )
+    
+    try:
+        with session_scope() as session:
+            rows = (
+                session.query(
+                    ModerationQueue.id, ModerationQueue.task_id, ModerationQueue.status,
+                    ModerationQueue.claimed_at, ModerationQueue.attempts,
+                    Task.title, Task.description, Task.category
+                )
+                .join(Task, Task.id == ModerationQueue.task_id)
+                .filter(claimable)
+                .order_by(ModerationQueue.enqueued_at, ModerationQueue.id)
+                .limit(limit or Config.MODERATION_BATCH_SIZE)
+                .with_for_update(skip_locked=True, of=ModerationQueue)
+                .all()
+            )
+            
+            batch = []
+            for queue_id, task_id, status, claimed_at, attempts, title, description, category in rows:
+                claimed = session.query(ModerationQueue).filter(
+                    ModerationQueue.id == queue_id,
+                    ModerationQueue.status == status,
+                    ModerationQueue.claimed_at.is_(None) if claimed_at is None else ModerationQueue.claimed_at == claimed_at
+                ).update({
+                    'status': 'processing',
+                    'claimed_at': now,
+                    'attempts': func.coalesce(ModerationQueue.attempts, 0) + 1
+                }, synchronize_session=False)
+                if not claimed:
+                    continue  # 已被其他工作者領取
+                
+                batch.append({
+                    'queue_id': queue_id,
+                    'task_id': task_id,
+                    'attempts': (attempts or 0) + 1,
+                    'title': title,
+                    'description': description or '',
+                    'category': category
+                })
+            return batch
+    except Exception as e:
+        # 其他工作者同時領取（SQLite 寫入鎖）時本輪略過
+        print(f"⚠️ 領取審查項目失敗: {e}")
+        return []
+
+
+def apply_moderation_verdicts(verdicts):
+    """
+    寫入審查結果：任務由「審核中」轉為開放或被標記
+
+    被標記的任務保留點數，發布者取消任務即可取回；開放的任務加入推薦索引。
+    審查期間已被取消的任務只記錄結果。
+
+    Args:
+        verdicts (list): [{'queue_id', 'task_id', 'data', 'source'}, ...]，data 格式同 risk_assessment 的 data，
+                         source 為結果來源（存入佇列供訓練本地風險模型）
+
+    Returns:
+        dict: {'open': 開放數, 'flagged': 標記數}；失敗時為 None
+    """
+    if not verdicts:
+        return {'open': 0, 'flagged': 0}
+    
+    counts = {'open': 0, 'flagged': 0}
+    opened = []
+    now = datetime.utcnow()
     session = Session()
     
-    task = session.query(Task).filter_by(id=task_id, status='completed').first()
-    if not task:
-        return {'can_review': False, 'reviewee_id': None, 'has_reviewed': False}
+    try:
+        items = {
+            item.id: item for item in
+            session.query(ModerationQueue).filter(ModerationQueue.id.in_([v['queue_id'] for v in verdicts]))
+        }
+        tasks = {
+            task.id: task for task in
+            session.query(Task).filter(Task.id.in_([v['task_id'] for v in verdicts]))
+        }
+        
+        for verdict in verdicts:
+            data = verdict['data']
+            item = items.get(verdict['queue_id'])
+            if item is not None:
+                item.status = 'done'
+                item.finished_at = now
+                item.verdict = json.dumps(dict(data, source=verdict.get('source')), ensure_ascii=False)
+                item.error = None
+            
+            task = tasks.get(verdict['task_id'])
+            if task is None or task.status != 'pending_review':
+                continue
+            
+            task.moderation_reason = (data.get('reason') or '')[:200] or None
+            if is_flagged_verdict(data):
+                task.status = 'flagged'
+                counts['flagged'] += 1
+            else:
+                task.status = 'open'
+                opened.append(task)
+                counts['open'] += 1
+        
+        mark_stats_stale(session)
+        session.commit()
+        read_cache.invalidate('tasks')
+        for task in opened:
+            _index_open_task(task)
+        return counts
     
-    if user_id == task.publisher_id:
-        reviewee_id = task.accepted_user_id
-    elif user_id == task.accepted_user_id:
-        reviewee_id = task.publisher_id
-    else:
-        return {'can_review': False, 'reviewee_id': None, 'has_reviewed': False}
+    except Exception as e:
+        session.rollback()
+        print(f"❌ 寫入審查結果失敗: {e}")
+        return None
+    finally:
+        session.close()
+
+
+def requeue_moderation_items(queue_ids, error):
+    """審查失敗的項目放回佇列，下一輪重試"""
+    if not queue_ids:
+        return
     
-    existing = session.query(Review).filter_by(
-        task_id=task_id,
-        reviewer_id=user_id,
-        reviewee_id=reviewee_id
-    ).first()
+    try:
+        with session_scope() as session:
+            session.query(ModerationQueue).filter(ModerationQueue.id.in_(queue_ids)).update(
+                {'status': 'queued', 'claimed_at': None, 'error': str(error)[:500]},
+                synchronize_session=False
+            )
+    except Exception as e:
+        print(f"⚠️ 放回審查佇列失敗: {e}")
+
+
+def get_tasks_for_screening(after_id=0, limit=500, status='open'):
+    """
+    依 id 遞增分批讀取任務的審查欄位（重新審查既有任務用）
+
+    Returns:
+        list: [{'id', 'title', 'description', 'category'}, ...]
+    """
+    with session_scope() as session:
+        rows = session.query(Task.id, Task.title, Task.description, Task.category).filter(
+            Task.status == status,
+            Task.id > after_id
+        ).order_by(Task.id).limit(limit).all()
+        return [
+            {'id': row.id, 'title': row.title, 'description': row.description or '', 'category': row.category}
+            for row in rows
+        ]
+
+
+def flag_tasks(verdicts):
+    """
+    重新審查後標記仍開放的任務（移出推薦索引，發布者可取消任務取回點數）
+
+    Args:
+        verdicts (list): [{'task_id', 'data'}, ...]
+
+    Returns:
+        int: 標記的任務數
+    """
+    if not verdicts:
+        return 0
+    
+    reasons = {verdict['task_id']: verdict['data'].get('reason') for verdict in verdicts}
+    flagged = []
+    session = Session()
+    
+    try:
+        for task in session.query(Task).filter(Task.id.in_(list(reasons)), Task.status == 'open'):
+            task.status = 'flagged'
+            task.moderation_reason = (reasons[task.id] or '')[:200] or None
+            flagged.append(task.id)
+        
+        if flagged:
+            mark_stats_stale(session)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"❌ 標記任務失敗: {e}")
+        return 0
+    finally:
+        session.close()
+    
+    if flagged:
+        read_cache.invalidate('tasks')
+        for task_id in flagged:
+            _unindex_task(task_id)
+    return len(flagged)
+
+
+def iter_moderation_verdicts(sources=('ai',), batch_size=1000):
+    """
+    逐筆產生已完成的審查結果（訓練本地風險模型用）
+
+    Args:
+        sources (tuple): 要採用的結果來源；預設只用 AI 的判定，避免本地模型學到自己的輸出
+
+    Yields:
+        tuple: (描述, 分類, 審查結果 dict)
+    """
+    last_id = 0
+    while True:
+        with session_scope() as session:
+            rows = (
+                session.query(ModerationQueue.id, ModerationQueue.verdict, Task.description, Task.category)
+                .join(Task, Task.id == ModerationQueue.task_id)
+                .filter(ModerationQueue.status == 'done', ModerationQueue.verdict.isnot(None), ModerationQueue.id > last_id)
+                .order_by(ModerationQueue.id)
+                .limit(batch_size)
+                .all()
+            )
+        if not rows:
+            return
+        last_id = rows[-1].id
+        
+        for row in rows:
+            verdict = json.loads(row.verdict)
+            if verdict.get('source') in sources:
+                yield row.description or '', row.category, verdict
+
+
+def get_moderation_queue_stats():
+    """佇列各狀態數量、最久的等待秒數、審核中/被標記的任務數"""
+    with session_scope() as session:
+        counts = dict(
+            session.query(ModerationQueue.status, func.count(ModerationQueue.id))
+            .group_by(ModerationQueue.status).all()
+        )
+        oldest = (
+            session.query(func.min(ModerationQueue.enqueued_at))
+            .filter(ModerationQueue.status.in_(('queued', 'processing')))
+            .scalar()
+        )
+        task_counts = dict(
+            session.query(Task.status, func.count(Task.id))
+            .filter(Task.status.in_(('pending_review', 'flagged')))
+            .group_by(Task.status).all()
+        )
     
     return {
-        'can_review': True,
-        'reviewee_id': reviewee_id,
-        'has_reviewed': existing is not None
+        'queued': counts.get('queued', 0),
+        'processing': counts.get('processing', 0),
+        'done': counts.get('done', 0),
+        'oldest_wait_seconds': (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0,
+        'pending_review_tasks': task_counts.get('pending_review', 0),
+        'flagged_tasks': task_counts.get('flagged', 0)
     }
 
 
+# ========== 平台統計 ==========
+
+def mark_stats_stale(session):
+    """任務狀態改變時，在同一交易中將統計摘要標記為過期"""
+    session.query(PlatformStats).update({'is_stale': True}, synchronize_session=False)
+
+
+def _compute_platform_stats(session):
+    """以 SQL 彙總計算平台統計"""
+    total_users, total_points = (
+        session.query(func.count(User.id), func.coalesce(func.sum(User.points), 0))
+        .filter(User.status == 'active')
+        .one()
+    )
+    
+    status_counts = dict(session.query(Task.status, func.count(Task.id)).group_by(Task.status).all())
+    total_tasks = sum(status_counts.values())
+    completed_tasks = status_counts.get('completed', 0)
+    
+    points_in_tasks = (
+        session.query(func.coalesce(func.sum(Task.points_offered), 0))
+        .filter(Task.status == 'open')
+        .scalar()
+    )
+    
+    category_counts = dict(session.query(Task.category, func.count(Task.id)).group_by(Task.category).all())
+    campus_counts = dict(session.query(Task.campus, func.count(Task.id)).group_by(Task.campus).all())
+    
+    top_users = (
+        session.query(User)
+        .filter(User.status == 'active')
+        .order_by(User.completed_tasks.desc(), User.id)
+        .limit(3)
+        .all()
+    )
+    
+    return {
+        'total_users': total_users,
+        'total_tasks': total_tasks,
+        'completed_tasks': completed_tasks,
+        'open_tasks': status_counts.get('open', 0),
+        'in_progress_tasks': status_counts.get('in_progress', 0),
+        'pending_review_tasks': status_counts.get('pending_review', 0),
+        'flagged_tasks': status_counts.get('flagged', 0),
+        'total_points': total_points,
+        'points_in_tasks': points_in_tasks,
+        'category_counts': category_counts,
+        'campus_counts': campus_counts,
+        'top_users': [u.to_dict() for u in top_users],
+        'completion_rate': (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+    }
+
+
+def get_platform_stats(max_age_seconds=None):
+    """
+    取得平台統計數據
+    
+    優先讀取 platform_stats 摘要表；摘要過期（任務狀態改變）或超過
+    max_age_seconds（預設 Config.STATS_MAX_AGE_SECONDS）時才重新彙總並寫回。
+    """
+    if max_age_seconds is None:
+        max_age_seconds = Config.STATS_MAX_AGE_SECONDS
+    
+    with session_scope() as session:
+        snapshot = session.query(PlatformStats).filter_by(id=1).first()
+        fresh_after = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+        
+        if snapshot and not snapshot.is_stale and snapshot.refreshed_at >= fresh_after:
+            return json.loads(snapshot.payload)
+        
+        stats = _compute_platform_stats(session)
+    
+    try:
+        with session_scope() as session:
+            snapshot = session.query(PlatformStats).filter_by(id=1).first()
+            if snapshot is None:
+                snapshot = PlatformStats(id=1)
+                session.add(snapshot)
+            snapshot.payload = json.dumps(stats, ensure_ascii=False)
+            snapshot.is_stale = False
+            snapshot.refreshed_at = datetime.utcnow()
+    except Exception as e:
+        # 其他程序同時寫入摘要時略過，本次仍回傳剛算好的結果
+        print(f"⚠️ 更新統計摘要失敗: {e}")
+    
+    return stats
+
+
 def seed_test_data():
     """填充測試資料 - 保持原有資料不變"""
     session = Session()
     
+    session.query(PlatformStats).delete()
+    session.query(UserRecommendation).delete()
+    session.query(ModerationQueue).delete()
     session.query(Review).delete()
     session.query(TaskApplication).delete()
     session.query(Task).delete()
@@ -797,6 +2207,9 @@ def seed_test_data():
     
     session.commit()
     session.close()
+    read_cache.clear()
+    open_task_index.clear()
+    recommendation_cache.clear()
     
     print("✅ 測試資料建立完成！")
     print(f"   - 使用者: {len(users_data)} 位")
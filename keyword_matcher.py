@@ -0,0 +1,99 @@
+"""
+關鍵字比對模組 - Campus Help
+以 Aho-Corasick 自動機一次掃描文字找出所有關鍵字：
+1. 風險審查的敏感關鍵字（ai_service.py，標籤為嚴重程度）
+2. 技能推斷的技能關鍵字（matching_engine.py，標籤為技能）
+掃描成本只與文字長度及命中數有關，不隨關鍵字數量增加。
+"""
+from collections import deque
+
+
+class KeywordMatcher:
+    """由 {標籤: [關鍵字, ...]} 建立的多關鍵字比對器（不分大小寫）"""
+
+    def __init__(self, keyword_table):
+        # 每個 (標籤, 關鍵字) 依表格順序編號，輸出時依編號排序以維持原本的順序
+        self.patterns = [
+            (label, keyword.lower())
+            for label, keywords in keyword_table.items()
+            for keyword in keywords
+            if keyword
+        ]
+
+        self._goto = [{}]      # 節點 -> {字元: 子節點}
+        self._fail = [0]       # 失敗轉移
+        self._output = [()]    # 節點 -> 在此結束的關鍵字編號（含失敗鏈上的）
+
+        for pattern_id, (_, keyword) in enumerate(self.patterns):
+            node = 0
+            for char in keyword:
+                child = self._goto[node].get(char)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto[node][char] = child
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                node = child
+            self._output[node] += (pattern_id,)
+
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        """以 BFS 建立失敗轉移，並把失敗節點的輸出併入"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+
+                self._fail[child] = fail
+                self._output[child] += self._output[fail]
+
+    def find_ids(self, text):
+        """回傳文字中出現的所有關鍵字編號（集合）"""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        node = 0
+
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+
+        return found
+
+    def match(self, text):
+        """
+        找出文字中的所有關鍵字
+
+        Returns:
+            dict: {標籤: [命中的關鍵字, ...]}，只包含有命中的標籤，關鍵字依表格順序
+        """
+        hits = {}
+        for pattern_id in sorted(self.find_ids(text)):
+            label, keyword = self.patterns[pattern_id]
+            hits.setdefault(label, []).append(keyword)
+        return hits
+
+    def match_labels(self, text):
+        """文字中有命中關鍵字的標籤集合"""
+        return {self.patterns[pattern_id][0] for pattern_id in self.find_ids(text)}
+
+
+if __name__ == '__main__':
+    matcher = KeywordMatcher({
+        'critical': ['代考', '代寫', '代寫報告', 'K他命'],
+        'medium': ['代買', '深夜']
+    })
+
+    print("測試關鍵字比對...")
+    print(f"   {matcher.match('深夜幫我代寫報告，順便代買K他命')}")
+    print(f"   {matcher.match_labels('幫忙搬宿舍行李')}")
@@ -2,7 +2,15 @@
 智慧媒合引擎 - Campus Help
 多因子加權模型計算媒合分數
 """
+import heapq
+import threading
 from datetime import datetime
+from itertools import islice
+
+import numpy as np
+
+import schedule
+from keyword_matcher import KeywordMatcher
 
 class MatchingEngine:
     """任務媒合引擎"""
@@ -15,6 +23,45 @@ class MatchingEngine:
         'location': 0.2    # 地點相符度
     }
     
+    # 技能關鍵字映射
+    SKILL_KEYWORDS = {
+        '搬運': ['搬', '搬運', '行李', '家具'],
+        '修理電腦': ['電腦', '修理', '維修', '重灌'],
+        '攝影': ['攝影', '拍照', '相機', '照片'],
+        '設計': ['設計', 'photoshop', 'ps', '美編', '排版'],
+        '教學': ['教', '解題', '輔導', '家教'],
+        '程式設計': ['程式', 'python', 'coding', '寫程式'],
+        '翻譯': ['翻譯', '英文', '日文'],
+        '跑腿': ['代購', '買', '送']
+    }
+    
+    SKILL_MATCHER = KeywordMatcher(SKILL_KEYWORDS)
+    
+    # 根據分類加入的通用技能
+    CATEGORY_SKILLS = {
+        '日常支援': {'搬運', '跑腿'},
+        '學習互助': {'教學'},
+        '校園協助': {'攝影', '活動協助'},
+        '技能交換': {'設計', '程式設計'}
+    }
+    
+    # 可推斷出的所有技能（批次評分時以位元遮罩表示）
+    SKILL_VOCABULARY = sorted(
+        {skill.lower() for skill in SKILL_KEYWORDS} |
+        {skill.lower() for skills in CATEGORY_SKILLS.values() for skill in skills}
+    )
+    SKILL_BITS = {skill: 1 << i for i, skill in enumerate(SKILL_VOCABULARY)}
+    
+    # 時間重疊程度：使用者或任務未設定時段、完全涵蓋、部分重疊、完全不重疊
+    TIME_UNKNOWN, TIME_COVERED, TIME_PARTIAL, TIME_CONFLICT = range(4)
+    # 時間分數表 [重疊程度][是否急件]；急件除非使用者的時段完全涵蓋，否則打八折
+    TIME_SCORES = np.array([
+        [1.0, 0.8],
+        [1.0, 1.0],
+        [0.6, 0.48],
+        [0.2, 0.16]
+    ])
+    
     def calculate_match_score(self, user, task):
         """
         計算使用者與任務的媒合分數
@@ -29,7 +76,7 @@ class MatchingEngine:
         # 1. 技能匹配度
         skill_score = self._calculate_skill_score(user, task)
         
-        # 2. 時間重疊度 (簡化版：假設都有空)
+        # 2. 時間重疊度
         time_score = self._calculate_time_score(user, task)
         
         # 3. 評價信任值
@@ -70,9 +117,8 @@ class MatchingEngine:
         """
         user_skills = set([s.lower() for s in user.get('skills', [])])
         
-        # 根據任務分類推斷所需技能
-        category = task.get('category', '')
-        required_skills = self._infer_skills_from_category(category, task)
+        # 任務所需技能（優先使用建立任務時存下的技能需求）
+        required_skills = self.get_task_skills(task)
         
         if not required_skills:
             return 0.5  # 無法判斷時給中等分數
@@ -87,39 +133,32 @@ class MatchingEngine:
         score = min(1.0, 0.5 + (overlap * 0.2))  # 每個匹配技能加 20%
         return score
     
+    def get_task_skills(self, task):
+        """
+        任務所需技能
+
+        database.py 建立或修改任務時已將推斷結果存成 required_skills，
+        只有尚未存過（例如直接傳入的任務字典）才即時推斷。
+        """
+        required_skills = task.get('required_skills')
+        if required_skills is not None:
+            return set(required_skills)
+        return self._infer_skills_from_category(task.get('category', ''), task)
+    
+    def infer_task_skills(self, task):
+        """推斷任務所需技能，回傳排序後的列表（供 database.py 存檔）"""
+        return sorted(self._infer_skills_from_category(task.get('category', ''), task))
+    
     def _infer_skills_from_category(self, category, task):
         """根據任務分類和描述推斷所需技能"""
         description = task.get('description', '').lower()
         title = task.get('title', '').lower()
         combined = description + ' ' + title
         
-        # 技能關鍵字映射
-        skill_keywords = {
-            '搬運': ['搬', '搬運', '行李', '家具'],
-            '修理電腦': ['電腦', '修理', '維修', '重灌'],
-            '攝影': ['攝影', '拍照', '相機', '照片'],
-            '設計': ['設計', 'photoshop', 'ps', '美編', '排版'],
-            '教學': ['教', '解題', '輔導', '家教'],
-            '程式設計': ['程式', 'python', 'coding', '寫程式'],
-            '翻譯': ['翻譯', '英文', '日文'],
-            '跑腿': ['代購', '買', '送']
-        }
-        
-        inferred_skills = set()
-        for skill, keywords in skill_keywords.items():
-            if any(keyword in combined for keyword in keywords):
-                inferred_skills.add(skill.lower())
-        
-        # 根據分類加入通用技能
-        category_skills = {
-            '日常支援': {'搬運', '跑腿'},
-            '學習互助': {'教學'},
-            '校園協助': {'攝影', '活動協助'},
-            '技能交換': {'設計', '程式設計'}
-        }
+        inferred_skills = {skill.lower() for skill in self.SKILL_MATCHER.match_labels(combined)}
         
-        if category in category_skills:
-            inferred_skills.update([s.lower() for s in category_skills[category]])
+        if category in self.CATEGORY_SKILLS:
+            inferred_skills.update([s.lower() for s in self.CATEGORY_SKILLS[category]])
         
         return inferred_skills
     
@@ -127,14 +166,66 @@ class MatchingEngine:
         """
         計算時間重疊度
         
-        簡化版：假設使用者都有空（黑客松展示用）
-        實際版本需要比對時間表
+        邏輯：
+        - 比對使用者每週可接任務的時段與任務進行的時段（位元 AND）
+        - 完全涵蓋：1.0 / 部分重疊：0.6 / 不重疊：0.2
+        - 任一方未設定時段時視為有空：1.0
+        - 急件除非使用者的時段完全涵蓋，否則打八折
+        """
+        level = self.time_overlap_level(
+            schedule.decode(user.get('availability')), self.get_task_time_slots(task)
+        )
+        return float(self.TIME_SCORES[level, int(bool(task.get('is_urgent')))])
+    
+    def time_overlap_level(self, availability, task_slots):
+        """使用者時段與任務時段（位元集合）的重疊程度"""
+        if not availability or not task_slots:
+            return self.TIME_UNKNOWN
+        if task_slots & ~availability == 0:
+            return self.TIME_COVERED
+        if task_slots & availability:
+            return self.TIME_PARTIAL
+        return self.TIME_CONFLICT
+    
+    def get_task_time_slots(self, task):
+        """
+        任務進行的時段（位元集合）
+        
+        database.py 建立或修改任務時已將時段存成 time_slots（沒有固定時段為 None），
+        只有沒有這個欄位（例如直接傳入的任務字典）才即時解析。
+        """
+        if 'time_slots' in task:
+            return schedule.decode(task['time_slots'])
+        return schedule.task_slots(task.get('accept_deadline'), task.get('task_start_time'), task.get('task_duration'))
+    
+    def time_overlap_levels(self, availability_words, slot_words):
         """
-        # 如果是急件，降低分數（除非使用者明確表示有空）
-        if task.get('is_urgent'):
-            return 0.8
+        批次計算重疊程度（與 time_overlap_level 相同）
         
-        return 1.0  # 簡化版：假設時間都合適
+        Args:
+            availability_words: 使用者時段 (..., WORDS) uint64，可含使用者維度
+            slot_words: 任務時段 (任務數, WORDS) uint64
+        
+        Returns:
+            重疊程度陣列，形狀為兩者廣播後去掉最後一維
+        """
+        availability_words = np.asarray(availability_words)[..., None, :]
+        shape = np.broadcast_shapes(availability_words.shape, slot_words.shape)[:-1]
+        if not availability_words.any():
+            return np.full(shape, self.TIME_UNKNOWN)
+        
+        uncovered = np.zeros(shape, dtype=bool)
+        shared = np.zeros(shape, dtype=bool)
+        has_slots = np.zeros(len(slot_words), dtype=bool)
+        for w in range(schedule.WORDS):
+            words = slot_words[:, w]
+            uncovered |= (words & ~availability_words[..., w]) != 0
+            shared |= (words & availability_words[..., w]) != 0
+            has_slots |= words != 0
+        
+        # 未設定 → TIME_UNKNOWN(0)；完全涵蓋 → 1；部分重疊 → 2；不重疊 → 3
+        known = has_slots & (availability_words != 0).any(axis=-1)
+        return known * (self.TIME_COVERED + uncovered + (uncovered & ~shared))
     
     def _calculate_rating_score(self, user):
         """
@@ -195,38 +286,634 @@ class MatchingEngine:
         
         return 0.5  # 預設中等分數
     
-    def get_top_recommendations(self, user, tasks, top_n=5):
+    # ========== 批次評分（NumPy 向量化） ==========
+    
+    def build_task_block(self, tasks):
+        """
+        將任務列表轉成欄位式資料區塊，可重複用於多位使用者的批次評分
+        
+        Args:
+            tasks (list): 任務列表
+        
+        Returns:
+            dict: 'tasks' 原始列表與各欄位的 NumPy 陣列
+        """
+        campus_codes = {}
+        skill_masks = np.zeros(len(tasks), dtype=np.int64)
+        campus = np.zeros(len(tasks), dtype=np.int32)
+        is_online = np.zeros(len(tasks), dtype=bool)
+        is_urgent = np.zeros(len(tasks), dtype=bool)
+        time_slots = np.zeros((len(tasks), schedule.WORDS), dtype=np.uint64)
+        publisher_ids = np.full(len(tasks), -1, dtype=np.int64)
+        
+        for i, task in enumerate(tasks):
+            skill_masks[i] = self.skills_to_mask(self.get_task_skills(task))
+            time_slots[i] = schedule.to_words(self.get_task_time_slots(task))
+            
+            task_campus = task.get('campus', '')
+            campus[i] = campus_codes.setdefault(task_campus, len(campus_codes))
+            is_online[i] = '線上' in task_campus
+            is_urgent[i] = bool(task.get('is_urgent'))
+            
+            if task.get('publisher_id') is not None:
+                publisher_ids[i] = task['publisher_id']
+        
+        return {
+            'tasks': tasks,
+            'skill_masks': skill_masks,
+            'campus_codes': campus_codes,
+            'campus': campus,
+            'is_online': is_online,
+            'is_urgent': is_urgent,
+            'time_slots': time_slots,
+            'publisher_ids': publisher_ids
+        }
+    
+    def skills_to_mask(self, skills):
+        """技能集合轉為位元遮罩（不在 SKILL_VOCABULARY 內的技能不影響重疊數）"""
+        mask = 0
+        for skill in skills:
+            mask |= self.SKILL_BITS.get(skill.lower(), 0)
+        return mask
+    
+    def score_batch(self, user, block):
+        """
+        一次計算一位使用者對整個任務區塊的分數（結果與 calculate_match_score 完全一致）
+        
+        Returns:
+            dict: skill_score / time_score / rating_score / location_score / total_score 陣列
+        """
+        n = len(block['tasks'])
+        
+        # 1. 技能匹配度：重疊數 = popcount(任務遮罩 & 使用者遮罩)
+        user_mask = self.skills_to_mask(user.get('skills', []))
+        masks = block['skill_masks']
+        shared = masks & user_mask
+        overlap = np.zeros(n, dtype=np.int64)
+        for bit in range(len(self.SKILL_VOCABULARY)):
+            overlap += (shared >> bit) & 1
+        
+        skill_score = np.where(
+            masks == 0, 0.5,
+            np.where(overlap == 0, 0.3, np.minimum(1.0, 0.5 + (overlap * 0.2)))
+        )
+        
+        # 2. 時間重疊度：位元 AND 判斷重疊程度後查表
+        levels = self.time_overlap_levels(schedule.to_words(user.get('availability')), block['time_slots'])
+        time_score = self.TIME_SCORES.ravel()[levels * 2 + block['is_urgent']]
+        
+        # 3. 評價信任值（只與使用者有關）
+        rating_score = np.full(n, self._calculate_rating_score(user))
+        
+        # 4. 地點相符度
+        user_campus_code = block['campus_codes'].get(user.get('campus', ''), -1)
+        cross_campus_score = 0.6 if user.get('willing_cross_campus', False) else 0.2
+        location_score = np.where(
+            block['is_online'] | (block['campus'] == user_campus_code), 1.0, cross_campus_score
+        )
+        
+        total_score = (
+            skill_score * self.WEIGHTS['skill'] +
+            time_score * self.WEIGHTS['time'] +
+            rating_score * self.WEIGHTS['rating'] +
+            location_score * self.WEIGHTS['location']
+        )
+        
+        return {
+            'total_score': total_score,
+            'skill_score': skill_score,
+            'time_score': time_score,
+            'rating_score': rating_score,
+            'location_score': location_score
+        }
+    
+    def score_matrix(self, users, block):
+        """
+        多位使用者 × 任務區塊的分數矩陣（第 u 列與 score_batch(users[u], block) 完全一致）
+        
+        技能重疊數以「使用者技能位元矩陣 × 任務技能位元矩陣ᵀ」一次算出。
+        
+        Returns:
+            dict: total_score / skill_score / time_score / location_score 為 (使用者數, 任務數) 矩陣，
+                  rating_score 為每位使用者的向量
+        """
+        bits = 1 << np.arange(len(self.SKILL_VOCABULARY), dtype=np.int64)
+        user_masks = np.array([self.skills_to_mask(user.get('skills', [])) for user in users], dtype=np.int64)
+        user_bits = ((user_masks[:, None] & bits) != 0).astype(np.float32)
+        task_bits = ((block['skill_masks'][:, None] & bits) != 0).astype(np.float32)
+        overlap = (user_bits @ task_bits.T).astype(np.int64)  # 小整數，float32 相乘仍是精確值
+        
+        skill_score = np.where(
+            block['skill_masks'] == 0, 0.5,
+            np.where(overlap == 0, 0.3, np.minimum(1.0, 0.5 + (overlap * 0.2)))
+        )
+        availability = np.array([schedule.to_words(user.get('availability')) for user in users], dtype=np.uint64)
+        levels = self.time_overlap_levels(availability.reshape(len(users), schedule.WORDS), block['time_slots'])
+        time_score = self.TIME_SCORES.ravel()[levels * 2 + block['is_urgent']]
+        rating_score = np.array([self._calculate_rating_score(user) for user in users], dtype=np.float64)
+        
+        user_campus_codes = np.array(
+            [block['campus_codes'].get(user.get('campus', ''), -1) for user in users], dtype=np.int32
+        )
+        cross_campus_scores = np.array(
+            [0.6 if user.get('willing_cross_campus', False) else 0.2 for user in users], dtype=np.float64
+        )
+        location_score = np.where(
+            block['is_online'] | (block['campus'] == user_campus_codes[:, None]), 1.0, cross_campus_scores[:, None]
+        )
+        
+        total_score = (
+            skill_score * self.WEIGHTS['skill'] +
+            time_score * self.WEIGHTS['time'] +
+            rating_score[:, None] * self.WEIGHTS['rating'] +
+            location_score * self.WEIGHTS['location']
+        )
+        
+        return {
+            'total_score': total_score,
+            'skill_score': skill_score,
+            'time_score': time_score,
+            'rating_score': rating_score,
+            'location_score': location_score
+        }
+    
+    def top_recommendations_matrix(self, users, block, top_n=5):
+        """
+        一次計算多位使用者的前 N 名（結果與 score_matrix / score_batch 相同）
+        
+        分數只取決於使用者本身與（技能重疊情形、時間重疊程度、是否急件、地點是否相符）的組合，
+        因此先為每位使用者算出所有組合的分數表，矩陣只存組合代碼再查表，省下大部分浮點運算。
+        
+        Returns:
+            list: 每位使用者一個 [(區塊內索引, 分數明細), ...]（同分時依區塊順序）
+        """
+        n_skills = len(self.SKILL_VOCABULARY)
+        bits = 1 << np.arange(n_skills, dtype=np.int64)
+        user_masks = np.array([self.skills_to_mask(user.get('skills', [])) for user in users], dtype=np.int64)
+        user_bits = ((user_masks[:, None] & bits) != 0).astype(np.float32)
+        task_bits = ((block['skill_masks'][:, None] & bits) != 0).astype(np.float32)
+        
+        # 技能代碼：0..n_skills 為重疊數，n_skills + 1 為任務不需技能
+        skill_codes = (user_bits @ task_bits.T).astype(np.int32)
+        skill_codes[:, block['skill_masks'] == 0] = n_skills + 1
+        user_campus_codes = np.array(
+            [block['campus_codes'].get(user.get('campus', ''), -1) for user in users], dtype=np.int32
+        )
+        is_nearby = block['is_online'] | (block['campus'] == user_campus_codes[:, None])
+        availability = np.array([schedule.to_words(user.get('availability')) for user in users], dtype=np.uint64)
+        time_levels = self.time_overlap_levels(availability.reshape(len(users), schedule.WORDS), block['time_slots'])
+        n_time = self.TIME_SCORES.size
+        codes = (skill_codes * n_time + time_levels * 2 + block['is_urgent']) * 2 + is_nearby
+        
+        # 分數表 (使用者, 技能代碼, 時間代碼, 地點是否相符)，運算順序與 score_batch 相同
+        overlap = np.arange(n_skills + 1)
+        skill_values = np.append(np.where(overlap == 0, 0.3, np.minimum(1.0, 0.5 + (overlap * 0.2))), 0.5)
+        time_values = self.TIME_SCORES.ravel()
+        rating_values = np.array([self._calculate_rating_score(user) for user in users], dtype=np.float64)
+        location_values = np.stack([
+            np.array([0.6 if user.get('willing_cross_campus', False) else 0.2 for user in users]),
+            np.ones(len(users))
+        ], axis=1)
+        tables = (
+            skill_values[None, :, None, None] * self.WEIGHTS['skill'] +
+            time_values[None, None, :, None] * self.WEIGHTS['time'] +
+            rating_values[:, None, None, None] * self.WEIGHTS['rating'] +
+            location_values[:, None, None, :] * self.WEIGHTS['location']
+        ).reshape(len(users), -1)
+        
+        # 自己發布的任務改為最後一個代碼（分數 -inf）
+        n_codes = tables.shape[1]
+        tables = np.concatenate([tables, np.full((len(users), 1), -np.inf)], axis=1)
+        user_ids = np.array([user['id'] if user.get('id') is not None else -2 for user in users], dtype=np.int64)
+        codes[block['publisher_ids'][None, :] == user_ids[:, None]] = n_codes
+        totals = np.take_along_axis(tables, codes, axis=1)
+        
+        # 由各代碼的任務數找出每位使用者第 N 名的分數（不必對每列做 argpartition）
+        counts = np.bincount(
+            (codes + np.arange(len(users))[:, None] * (n_codes + 1)).ravel(), minlength=len(users) * (n_codes + 1)
+        ).reshape(len(users), n_codes + 1)
+        counts[:, n_codes] = 0
+        order = np.argsort(-tables, axis=1, kind='stable')
+        reached = np.cumsum(np.take_along_axis(counts, order, axis=1), axis=1) >= top_n
+        thresholds = np.where(
+            reached.any(axis=1),
+            np.take_along_axis(tables, order, axis=1)[np.arange(len(users)), reached.argmax(axis=1)],
+            -np.inf
+        )
+        
+        results = []
+        for u, user in enumerate(users):
+            row, threshold = totals[u], thresholds[u]
+            above = np.flatnonzero(row > threshold)
+            top = above[np.lexsort((above, -row[above]))]
+            if top_n > 0 and np.isfinite(threshold):
+                # 與第 N 名同分者依區塊順序補足
+                top = np.concatenate([top, np.flatnonzero(row == threshold)[:top_n - len(top)]])
+            top = top[:max(top_n, 0)]
+            
+            details = {
+                'total_score': row[top],
+                'skill_score': skill_values[codes[u, top] // (n_time * 2)],
+                'time_score': time_values[(codes[u, top] // 2) % n_time],
+                'rating_score': np.full(len(top), rating_values[u]),
+                'location_score': location_values[u, codes[u, top] % 2]
+            }
+            results.append([(int(i), self._score_details(details, j)) for j, i in enumerate(top)])
+        
+        return results
+    
+    @staticmethod
+    def top_k_indices(scores, k, eligible=None):
+        """
+        以 argpartition 選出分數最高的 k 個索引
+        
+        同分時依原始順序排列，與對完整列表做穩定排序後取前 k 筆的結果相同。
+        """
+        candidates = np.arange(len(scores)) if eligible is None else np.flatnonzero(eligible)
+        if k <= 0 or len(candidates) == 0:
+            return np.array([], dtype=np.int64)
+        
+        values = scores[candidates]
+        if len(candidates) <= k:
+            return candidates[np.lexsort((candidates, -values))]
+        
+        # 第 k 名的分數作為門檻：高於門檻的排序後在前，同分者依原始順序補足
+        threshold = values[np.argpartition(-values, k - 1)[k - 1]]
+        above = values > threshold
+        above_candidates, above_values = candidates[above], values[above]
+        ties = candidates[values == threshold][:k - len(above_candidates)]
+        return np.concatenate([above_candidates[np.lexsort((above_candidates, -above_values))], ties])
+    
+    def _score_details(self, scores, i):
+        """將批次結果第 i 筆轉成與 calculate_match_score 相同格式的字典"""
+        skill_score = float(scores['skill_score'][i])
+        time_score = float(scores['time_score'][i])
+        rating_score = float(scores['rating_score'][i])
+        location_score = float(scores['location_score'][i])
+        
+        return {
+            'total_score': float(scores['total_score'][i]),
+            'skill_score': skill_score,
+            'time_score': time_score,
+            'rating_score': rating_score,
+            'location_score': location_score,
+            'breakdown': {
+                '技能匹配': f"{skill_score:.0%}",
+                '時間相符': f"{time_score:.0%}",
+                '評價信任': f"{rating_score:.0%}",
+                '地點相符': f"{location_score:.0%}"
+            }
+        }
+    
+    def get_top_recommendations(self, user, tasks, top_n=5, chunk_size=512):
         """
         取得 Top N 推薦任務
         
+        任務可以是任何可迭代物件（例如產生器），
+        每次只取 chunk_size 筆批次評分，再併入只保留 N 筆的堆積，記憶體用量與任務總數無關。
+        
         Args:
             user (dict): 使用者資料
-            tasks (list): 任務列表
+            tasks (iterable): 任務，或 build_task_block() 建好的區塊
             top_n (int): 返回數量
+            chunk_size (int): 每批評分的任務數
         
         Returns:
-            list: 排序後的推薦列表
+            list: 排序後的推薦列表（同分時依任務出現順序）
         """
-        recommendations = []
+        blocks = [tasks] if isinstance(tasks, dict) else self._iter_task_blocks(tasks, chunk_size)
+        best = TopK(top_n)  # key: (分數, -出現順序)
+        offset = 0
+        
+        for block in blocks:
+            scores = self.score_batch(user, block)
+            for i in self.top_k_indices(scores['total_score'], top_n, self._eligible(user, block)):
+                details = self._score_details(scores, i)
+                best.push((details['total_score'], -(offset + int(i))), {
+                    'task': block['tasks'][i],
+                    'score': details['total_score'],
+                    'details': details
+                })
+            offset += len(block['tasks'])
+        
+        return best.items()
+    
+    def _iter_task_blocks(self, tasks, chunk_size):
+        """將任務串流切成固定大小的區塊"""
+        tasks = iter(tasks)
+        while True:
+            chunk = list(islice(tasks, chunk_size))
+            if not chunk:
+                return
+            yield self.build_task_block(chunk)
+    
+    @staticmethod
+    def _eligible(user, block):
+        """不推薦自己發布的任務"""
+        if user.get('id') is None:
+            return None
+        return block['publisher_ids'] != user['id']
+    
+    def recommend_from_index(self, user, index, top_n=5, chunk_size=256):
+        """
+        以倒排索引取得候選任務，只對可能進入前 N 名的任務評分
         
-        for task in tasks:
-            # 不推薦自己發布的任務
-            if task.get('publisher_id') == user.get('id'):
-                continue
+        由倒排表取出與使用者技能重疊的任務，依重疊技能數與地點是否相符分組，
+        不需技能、無重疊的任務也依地點分組；同一組的技能與地點分數相同，
+        時間分數以位元 AND 對所有任務一次算出，取組內最高者，因此每組都有分數上界。由上界最高的組開始，組內由新到舊分批評分，
+        當剩下的任務已不可能進入前 N 名時停止，結果與全部評分相同（同分時較新的任務在前）。
+        
+        Args:
+            user (dict): 使用者資料
+            index (OpenTaskIndex): 開放任務索引
+            top_n (int): 返回數量
+            chunk_size (int): 每批評分的任務數
+        
+        Returns:
+            tuple: ([(任務 id, 分數明細), ...], 實際評分的任務數)
+        """
+        rating_score = self._calculate_rating_score(user)
+        cross_campus_score = 0.6 if user.get('willing_cross_campus', False) else 0.2
+        user_mask = self.skills_to_mask(user.get('skills', []))
+        
+        def upper_bound(skill_score, time_score, location_score):
+            # 與 score_batch 相同的運算順序，浮點數比較才會一致
+            return (
+                skill_score * self.WEIGHTS['skill'] +
+                time_score * self.WEIGHTS['time'] +
+                rating_score * self.WEIGHTS['rating'] +
+                location_score * self.WEIGHTS['location']
+            )
+        
+        with index.lock:
+            task_ids = index.task_ids
+            nearby = index.location_bitmap(user.get('campus', ''))
+            time_scores = index.time_scores(user.get('availability'))
+            groups = []  # (slots, 分數上界)
             
-            # 計算分數
-            score_data = self.calculate_match_score(user, task)
+            def add_groups(bitmap, skill_score):
+                for slots, location_score in (
+                    (np.flatnonzero(bitmap & nearby), 1.0),
+                    (np.flatnonzero(bitmap & ~nearby), cross_campus_score)
+                ):
+                    if len(slots):
+                        groups.append((slots, upper_bound(skill_score, time_scores[slots].max(), location_score)))
             
-            recommendations.append({
-                'task': task,
-                'score': score_data['total_score'],
-                'details': score_data
-            })
-        
-        # 排序
-        recommendations.sort(key=lambda x: x['score'], reverse=True)
+            # 技能重疊的任務依重疊數分組
+            overlap = index.skill_overlap(user_mask)
+            shared = overlap > 0
+            skill_less = index.skill_less_bitmap()
+            for count in range(1, int(overlap.max(initial=0)) + 1):
+                add_groups(overlap == count, min(1.0, 0.5 + (count * 0.2)))
+            
+            add_groups(skill_less, 0.5)
+            add_groups(index.active_bitmap() & ~shared & ~skill_less, 0.3)
+            
+            groups.sort(key=lambda group: group[1], reverse=True)
+            
+            best = TopK(top_n)  # key: (分數, 任務 id)，同分時較新的任務在前
+            scored = 0
+            
+            for i, (remaining, bound) in enumerate(groups):
+                while len(remaining):
+                    # 取這一組最新的一批（不需排序整組）
+                    if len(remaining) > chunk_size:
+                        newest = np.argpartition(-task_ids[remaining], chunk_size - 1)
+                        chunk, remaining = remaining[newest[:chunk_size]], remaining[newest[chunk_size:]]
+                    else:
+                        chunk, remaining = remaining, remaining[:0]
+                    scored += len(chunk)
+                    
+                    block = index.block(chunk)
+                    scores = self.score_batch(user, block)
+                    for j in self.top_k_indices(scores['total_score'], top_n, self._eligible(user, block)):
+                        task_id = int(block['tasks'][j])
+                        best.push((float(scores['total_score'][j]), task_id), (task_id, self._score_details(scores, j)))
+                    
+                    if best.full and len(remaining):
+                        # 剩下的任務分數不超過上界，且都比已評分的舊，同分也排在後面
+                        kth_score, kth_id = best.min_key
+                        if kth_score > bound or (kth_score == bound and kth_id > task_ids[remaining].max()):
+                            break
+                
+                if i + 1 < len(groups) and best.full and best.min_key[0] > groups[i + 1][1]:
+                    break
+            
+            return best.items(), scored
+
+
+class TopK:
+    """
+    只保留 key 最大的 N 筆（最小堆積）
+    
+    key 需互不相同（例如附上出現順序或任務 id），堆積才不會比較到資料本身。
+    """
+    
+    def __init__(self, n):
+        self.n = n
+        self._heap = []
+    
+    def push(self, key, item):
+        if self.n <= 0:
+            return
+        if len(self._heap) < self.n:
+            heapq.heappush(self._heap, (key, item))
+        elif key > self._heap[0][0]:
+            heapq.heapreplace(self._heap, (key, item))
+    
+    @property
+    def full(self):
+        return len(self._heap) >= self.n
+    
+    @property
+    def min_key(self):
+        """目前第 N 名的 key"""
+        return self._heap[0][0]
+    
+    def items(self):
+        """依 key 由大到小"""
+        return [item for _, item in sorted(self._heap, key=lambda entry: entry[0], reverse=True)]
+
+
+class OpenTaskIndex:
+    """
+    開放任務的倒排索引（技能 → 任務、校區 → 任務）
+    
+    每個任務佔一個 slot；倒排表是以 slot 為位置的點陣圖（布林陣列），聯集/交集都是向量運算。
+    評分所需的欄位也以欄位式陣列保存，推薦時不必從資料庫載入全部任務；
+    由 database.py 在任務開放/關閉時同步更新。
+    """
+    
+    COLUMNS = {
+        '_task_ids': (np.int64, -1),
+        '_skill_masks': (np.int64, 0),
+        '_campus': (np.int32, 0),
+        '_is_online': (bool, False),
+        '_is_urgent': (bool, False),
+        '_time_slots': (np.uint64, 0, (schedule.WORDS,)),
+        '_publisher_ids': (np.int64, -1)
+    }
+    
+    def __init__(self, capacity=1024):
+        self.lock = threading.RLock()
+        self._matcher = MatchingEngine()
+        self._initial_capacity = capacity
+        self.clear()
+    
+    def clear(self):
+        """清空索引（之後需重新 rebuild）"""
+        with self.lock:
+            capacity = self._initial_capacity
+            self._slot_of = {}  # task_id -> slot
+            self._free_slots = []
+            for name, (dtype, fill, *shape) in self.COLUMNS.items():
+                setattr(self, name, np.full((capacity, *shape[0]) if shape else capacity, fill, dtype=dtype))
+            
+            # 倒排表：技能位元 / 校區 -> slot 點陣圖
+            self._by_skill = {bit: np.zeros(capacity, dtype=bool) for bit in self._matcher.SKILL_BITS.values()}
+            self._skill_less = np.zeros(capacity, dtype=bool)
+            self._by_campus = {}
+            self._campus_codes = {}
+            self.loaded = False
+            self.version = getattr(self, 'version', 0) + 1  # 開放任務集合的版本，任何變動都會遞增
+    
+    def rebuild(self, tasks):
+        """以目前所有開放任務重建索引"""
+        with self.lock:
+            self.clear()
+            for task in tasks:
+                self.add(task)
+            self.loaded = True
+    
+    def _grow(self):
+        """容量不足時加倍"""
+        capacity = len(self._task_ids)
+        for name, (_, fill, *_) in self.COLUMNS.items():
+            column = getattr(self, name)
+            setattr(self, name, np.concatenate([column, np.full_like(column, fill)]))
+        
+        def extend(bitmap):
+            return np.concatenate([bitmap, np.zeros(capacity, dtype=bool)])
+        
+        self._by_skill = {bit: extend(bitmap) for bit, bitmap in self._by_skill.items()}
+        self._skill_less = extend(self._skill_less)
+        self._by_campus = {campus: extend(bitmap) for campus, bitmap in self._by_campus.items()}
+    
+    def add(self, task):
+        """加入（或更新）一個開放任務"""
+        with self.lock:
+            self.remove(task['id'])
+            
+            if self._free_slots:
+                slot = self._free_slots.pop()
+            else:
+                slot = len(self._slot_of)
+                if slot >= len(self._task_ids):
+                    self._grow()
+            
+            skill_mask = self._matcher.skills_to_mask(self._matcher.get_task_skills(task))
+            campus = task.get('campus', '')
+            if campus not in self._by_campus:
+                self._campus_codes[campus] = len(self._campus_codes)
+                self._by_campus[campus] = np.zeros(len(self._task_ids), dtype=bool)
+            
+            self._slot_of[task['id']] = slot
+            self._task_ids[slot] = task['id']
+            self._skill_masks[slot] = skill_mask
+            self._campus[slot] = self._campus_codes[campus]
+            self._is_online[slot] = '線上' in campus
+            self._is_urgent[slot] = bool(task.get('is_urgent'))
+            self._time_slots[slot] = schedule.to_words(self._matcher.get_task_time_slots(task))
+            self._publisher_ids[slot] = task['publisher_id'] if task.get('publisher_id') is not None else -1
+            self.version += 1
+            
+            for bit, bitmap in self._by_skill.items():
+                bitmap[slot] = bool(skill_mask & bit)
+            self._skill_less[slot] = not skill_mask
+            self._by_campus[campus][slot] = True
+    
+    def remove(self, task_id):
+        """任務不再開放時移除"""
+        with self.lock:
+            slot = self._slot_of.pop(task_id, None)
+            if slot is None:
+                return
+            
+            for bitmap in self._by_skill.values():
+                bitmap[slot] = False
+            self._skill_less[slot] = False
+            for bitmap in self._by_campus.values():
+                bitmap[slot] = False
+            self._is_online[slot] = False
+            
+            self._task_ids[slot] = -1
+            self._free_slots.append(slot)
+            self.version += 1
+    
+    def __len__(self):
+        return len(self._slot_of)
+    
+    @property
+    def task_ids(self):
+        """slot -> 任務 id（空 slot 為 -1）"""
+        return self._task_ids
+    
+    @property
+    def skill_masks(self):
+        """slot -> 技能遮罩"""
+        return self._skill_masks
+    
+    def active_bitmap(self):
+        """目前開放的任務"""
+        return self._task_ids >= 0
+    
+    def skill_overlap(self, skill_mask):
+        """每個 slot 與指定技能重疊的技能數（合併各技能的倒排表）"""
+        with self.lock:
+            overlap = np.zeros(len(self._task_ids), dtype=np.int8)
+            for bit, postings in self._by_skill.items():
+                if skill_mask & bit:
+                    overlap += postings
+            return overlap
+    
+    def skill_less_bitmap(self):
+        """推斷不出所需技能的任務"""
+        return self._skill_less.copy()
+    
+    def location_bitmap(self, campus):
+        """地點分數為滿分的任務：同校區或線上"""
+        with self.lock:
+            bitmap = self._is_online.copy()
+            if campus in self._by_campus:
+                bitmap |= self._by_campus[campus]
+            return bitmap
+    
+    def time_scores(self, availability):
+        """每個 slot 對指定使用者時段的時間分數（與 score_batch 相同）"""
+        with self.lock:
+            levels = self._matcher.time_overlap_levels(schedule.to_words(availability), self._time_slots)
+            return self._matcher.TIME_SCORES.ravel()[levels * 2 + self._is_urgent]
+    
+    def block(self, slots):
+        """
+        將指定 slots 組成 MatchingEngine.score_batch 使用的區塊
         
-        return recommendations[:top_n]
+        依任務 id 由大到小（較新的在前）排列，'tasks' 為任務 id。
+        """
+        with self.lock:
+            slots = np.asarray(slots, dtype=np.int64)
+            slots = slots[np.argsort(-self._task_ids[slots], kind='stable')]
+            return {
+                'slots': slots,
+                'tasks': self._task_ids[slots],
+                'skill_masks': self._skill_masks[slots],
+                'campus_codes': dict(self._campus_codes),
+                'campus': self._campus[slots],
+                'is_online': self._is_online[slots],
+                'is_urgent': self._is_urgent[slots],
+                'time_slots': self._time_slots[slots],
+                'publisher_ids': self._publisher_ids[slots]
+            }
 
 
 # 測試用
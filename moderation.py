@@ -0,0 +1,234 @@
+"""
+AI 審查用戶端 - Campus Help
+發布任務時的風險審查不再讓 Streamlit 腳本卡在同步的 generate_content：
+1. 模型呼叫在共用執行緒池執行，每次都有期限，逾時就不再等待
+2. 同時進行中的模型呼叫數有上限，滿了直接降級，不排隊佔住頁面
+3. 斷路器：連續失敗/逾時達門檻後暫停呼叫一段時間，期間直接採用關鍵字檢測結果；
+   冷卻後放行一個試探呼叫，成功才恢復
+逾時的呼叫仍會在背景完成，成功的結果寫入 AI 快取，下次相同內容直接命中。
+背景審查工作者（moderation_worker.py）也經由 guarded() 透過同一個用戶端呼叫模型，
+共用期限、同時呼叫數上限與斷路器。
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+import ai_service
+from ai_service import AIService, DEMO_MODE, get_model
+from config import Config
+
+
+class CircuitBreaker:
+    """連續失敗 failure_threshold 次後斷開 reset_seconds 秒（執行緒安全）"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=3, reset_seconds=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """是否可以呼叫；冷卻結束後只放行一個試探呼叫"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+class ModelUnavailable(Exception):
+    """模型呼叫因忙碌、斷路器斷開或逾時而未取得結果（reason 為 ModerationClient.DEGRADED_REASONS 的 key）"""
+
+    def __init__(self, reason):
+        super().__init__(ModerationClient.DEGRADED_REASONS[reason])
+        self.reason = reason
+
+
+class GuardedModel:
+    """包裝模型：generate_content 經過 ModerationClient.call()，可直接交給 AIService 的各種呼叫"""
+
+    def __init__(self, client, model, timeout=None, wait=True):
+        self._client = client
+        self._model = model
+        self._timeout = timeout
+        self._wait = wait
+
+    def generate_content(self, prompt, **kwargs):
+        return self._client.call(self._model.generate_content, prompt, timeout=self._timeout, wait=self._wait, **kwargs)
+
+
+class ModerationClient:
+    """有期限、限流與斷路器的風險審查（結果格式與 AIService.risk_assessment 相同）"""
+
+    # 降級原因
+    DEGRADED_REASONS = {
+        'timeout': 'AI 審查逾時',
+        'error': 'AI 審查失敗',
+        'busy': 'AI 審查忙碌中',
+        'circuit_open': 'AI 審查暫停中'
+    }
+
+    def __init__(self, max_concurrency=None, timeout_seconds=None, breaker=None, model_getter=get_model):
+        self.max_concurrency = max_concurrency or Config.AI_MAX_CONCURRENCY
+        self.timeout_seconds = timeout_seconds or Config.AI_TIMEOUT_SECONDS
+        self.breaker = breaker or CircuitBreaker(Config.AI_BREAKER_FAILURES, Config.AI_BREAKER_RESET_SECONDS)
+        self._model_getter = model_getter
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='moderation')
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'ai_calls': 0, 'cached': 0, 'degraded': 0,
+                       'timeout': 0, 'error': 0, 'busy': 0, 'circuit_open': 0}
+
+    def assess(self, description, category, timeout=None):
+        """
+        任務風險審查
+
+        關鍵字命中或本地模型有把握時直接回傳；否則在期限內等待模型結果，
+        逾時、失敗、忙碌或斷路器斷開時回傳關鍵字檢測結果，並加上 'degraded' 原因。
+        """
+        self._count('requests')
+
+        keyword_result = AIService.keyword_screen(description)
+        if keyword_result:
+            return keyword_result
+
+        local_result = AIService.local_screen(description, category)
+        if local_result:
+            return local_result
+
+        model = None if DEMO_MODE else self._model_getter()
+        if not model:
+            return AIService.passed_result()
+
+        cache_key = AIService.risk_cache_key(description, category)
+        hit, data = ai_service.ai_cache.get(cache_key)
+        if hit:
+            self._count('cached')
+            return {'success': True, 'data': data, 'cached': True}
+
+        try:
+            data = self.call(
+                AIService.semantic_risk_assessment, model, description, category, timeout=timeout,
+                on_success=lambda data: ai_service.ai_cache.set(cache_key, 'risk', data)
+            )
+        except ModelUnavailable as e:
+            return self._degraded(e.reason)
+        except Exception as e:
+            print(f"AI 風險審查失敗: {e}")
+            return self._degraded('error')
+
+        return {'success': True, 'data': data}
+
+    def call(self, fn, *args, timeout=None, wait=False, on_success=None, **kwargs):
+        """
+        在共用執行緒池中以期限、同時呼叫數上限與斷路器執行一次模型呼叫
+
+        Args:
+            timeout: 等待結果的秒數，None 為 self.timeout_seconds
+            wait: True 時在期限內等待呼叫額度（背景工作者），False 時額度滿了立即放棄（發布頁面）
+            on_success: 呼叫成功時以結果呼叫（包含逾時後才完成的呼叫）
+
+        Raises:
+            ModelUnavailable: 忙碌、斷路器斷開或逾時
+            fn 本身拋出的例外（已記為斷路器失敗）
+        """
+        timeout = timeout if timeout is not None else self.timeout_seconds
+
+        # 先取得呼叫額度再問斷路器，避免試探呼叫被額度擋下後斷路器一直等不到結果
+        if not (self._slots.acquire(timeout=timeout) if wait else self._slots.acquire(blocking=False)):
+            raise ModelUnavailable('busy')
+        if not self.breaker.allow():
+            self._slots.release()
+            raise ModelUnavailable('circuit_open')
+
+        self._count('ai_calls')
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda done: self._finish(done, on_success))
+
+        try:
+            result = future.result(timeout=timeout)
+        except FuturesTimeoutError:
+            self.breaker.record_failure()
+            raise ModelUnavailable('timeout')
+        except Exception:
+            self.breaker.record_failure()
+            raise
+
+        self.breaker.record_success()
+        return result
+
+    def guarded(self, model, timeout=None, wait=True):
+        """包裝模型，讓批次審查等其他呼叫也經過本用戶端（見 GuardedModel）"""
+        return GuardedModel(self, model, timeout, wait)
+
+    def _finish(self, future, on_success):
+        """模型呼叫結束（包含逾時後才完成的）：釋放額度，成功時呼叫 on_success"""
+        self._slots.release()
+        if on_success and not future.cancelled() and future.exception() is None:
+            on_success(future.result())
+
+    def _degraded(self, reason):
+        self._count('degraded')
+        self._count(reason)
+        result = AIService.keyword_only_result()
+        result['data']['reason'] = f"{self.DEGRADED_REASONS[reason]}，已通過關鍵字檢測"
+        result['degraded'] = reason
+        return result
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """呼叫統計與斷路器狀態"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['breaker_state'] = self.breaker.state
+        stats['max_concurrency'] = self.max_concurrency
+        stats['timeout_seconds'] = self.timeout_seconds
+        return stats
+
+
+# 程序共用的審查用戶端（Streamlit 各 session 共用執行緒池與斷路器）
+moderation_client = ModerationClient()
+
+
+if __name__ == '__main__':
+    print("測試 AI 審查用戶端...")
+    for description, category in [("幫忙搬宿舍行李", "日常支援"), ("幫我代考期末考", "學習互助")]:
+        result = moderation_client.assess(description, category)
+        print(f"   {description}: {result['data']['risk_level']}（{result.get('degraded', result['data'].get('reason'))}）")
+    print(f"   統計：{moderation_client.stats()}")
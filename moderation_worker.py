@@ -0,0 +1,252 @@
+"""
+背景審查工作者 - Campus Help
+發布任務時只做關鍵字檢測，任務以「審核中」狀態寫入並排入 moderation_queue，
+發布者立即得到回覆；本工作者在背景領取佇列：
+1. 本地風險模型有把握的直接判定，其餘描述依 token 預算合併成少數幾個 prompt 送審（AI 快取命中的不送），批次回應缺少的項目逐則送審
+2. 審查通過的任務開放並加入推薦索引，高風險的標記為 flagged
+3. 失敗的項目放回佇列重試，超過 Config.MODERATION_MAX_ATTEMPTS 次以關鍵字檢測結果放行
+4. 模型呼叫經過 moderation_client（期限、同時呼叫數上限、斷路器）；斷路器斷開時暫停領取，不耗掉重試次數
+模型呼叫量只取決於工作者的處理速度，不隨同時發布的人數增加。
+
+用法：
+    python moderation_worker.py                       # 持續處理
+    python moderation_worker.py --once                # 處理完目前的佇列後結束
+    python moderation_worker.py --batch-size 20 --interval 5
+"""
+import argparse
+import threading
+import time
+
+import ai_service
+from ai_service import AIService, DEMO_MODE, get_model
+from config import Config
+from database import init_db, claim_moderation_batch, apply_moderation_verdicts, requeue_moderation_items
+from moderation import CircuitBreaker, moderation_client
+from risk_classifier import get_classifier
+
+
+def _verdict(item, data, source):
+    """審查結果；source 記錄結果來源（keyword/local/ai/mock/fallback），只有 ai 的結果會用來訓練本地模型"""
+    return {'queue_id': item['queue_id'], 'task_id': item['task_id'], 'data': data, 'source': source}
+
+
+def assess_items(items, model):
+    """
+    審查一批佇列項目
+
+    Args:
+        items (list): claim_moderation_batch() 的結果
+        model: 模型實例；None（模擬模式）時通過關鍵字檢測即放行
+
+    Returns:
+        tuple: (審查結果 [{'queue_id', 'task_id', 'data'}], 失敗項目 [(項目, 例外)], 模型呼叫次數)
+    """
+    verdicts, pending = [], []
+
+    for item in items:
+        # 重新做關鍵字檢測：排入佇列後才加入的關鍵字也會生效
+        keyword_result = AIService.keyword_screen(item['description'])
+        if keyword_result:
+            verdicts.append(_verdict(item, keyword_result['data'], 'keyword'))
+            continue
+
+        # 本地風險模型有把握的不送 AI
+        local_result = AIService.local_screen(item['description'], item['category'])
+        if local_result:
+            verdicts.append(_verdict(item, local_result['data'], 'local'))
+            continue
+
+        if not model:
+            verdicts.append(_verdict(item, AIService.passed_result()['data'], 'mock'))
+            continue
+
+        hit, data = ai_service.ai_cache.get(AIService.risk_cache_key(item['description'], item['category']))
+        if hit:
+            verdicts.append(_verdict(item, data, 'ai'))
+        else:
+            pending.append(item)
+
+    if not pending:
+        return verdicts, [], 0
+
+    # 其餘描述依 token 預算合併成少數幾個 prompt，批次回應缺少的項目逐則重試
+    assessed, calls = AIService.semantic_risk_assessments(
+        model, [(item['description'], item['category']) for item in pending]
+    )
+
+    failed = []
+    for item, data in zip(pending, assessed):
+        if isinstance(data, Exception):
+            print(f"⚠️ 任務 {item['task_id']} 審查失敗: {data}")
+            failed.append((item, data))
+        else:
+            ai_service.ai_cache.set(AIService.risk_cache_key(item['description'], item['category']), 'risk', data)
+            verdicts.append(_verdict(item, data, 'ai'))
+
+    return verdicts, failed, calls
+
+
+class ModerationWorker:
+    """單一執行緒的佇列處理迴圈（可在獨立程序或 Streamlit 程序內執行）"""
+
+    def __init__(self, batch_size=None, interval=None, model_getter=get_model, client=None, ai_timeout=None):
+        self.batch_size = batch_size or Config.MODERATION_BATCH_SIZE
+        self.interval = interval if interval is not None else Config.MODERATION_POLL_SECONDS
+        self.ai_timeout = ai_timeout or Config.MODERATION_AI_TIMEOUT_SECONDS
+        self._model_getter = model_getter
+        self._client = client or moderation_client
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._stats = {'batches': 0, 'tasks': 0, 'ai_calls': 0, 'open': 0, 'flagged': 0, 'retried': 0, 'fallback': 0,
+                       'paused': 0}
+
+    def run_once(self):
+        """
+        領取並處理一批
+
+        Returns:
+            dict: 'claimed' 領取數, 'open' 開放數, 'flagged' 標記數, 'retried' 放回佇列數, 'ai_calls' 模型呼叫次數,
+                  'paused' 是否因斷路器斷開而未領取
+        """
+        summary = {'claimed': 0, 'open': 0, 'flagged': 0, 'retried': 0, 'fallback': 0, 'ai_calls': 0, 'paused': False}
+        model = None if DEMO_MODE else self._model_getter()
+        if model and self._client.breaker.state == CircuitBreaker.OPEN:
+            # AI 暫停中：項目留在佇列，等冷卻後的試探呼叫
+            summary['paused'] = True
+            with self._stats_lock:
+                self._stats['paused'] += 1
+            return summary
+
+        items = claim_moderation_batch(self.batch_size)
+        summary['claimed'] = len(items)
+        if not items:
+            return summary
+
+        if model:
+            model = self._client.guarded(model, self.ai_timeout)
+        verdicts, failed, summary['ai_calls'] = assess_items(items, model)
+
+        retry_ids, last_error = [], None
+        for item, error in failed:
+            if item['attempts'] >= Config.MODERATION_MAX_ATTEMPTS:
+                # 多次失敗：與同步審查降級相同，採用關鍵字檢測結果（排入前已通過）
+                verdicts.append(_verdict(item, AIService.keyword_only_result()['data'], 'fallback'))
+                summary['fallback'] += 1
+            else:
+                retry_ids.append(item['queue_id'])
+                last_error = error
+
+        counts = apply_moderation_verdicts(verdicts)
+        if counts is None:
+            retry_ids += [verdict['queue_id'] for verdict in verdicts]
+            last_error = last_error or '寫入審查結果失敗'
+        else:
+            summary.update(counts)
+
+        requeue_moderation_items(retry_ids, last_error)
+        summary['retried'] = len(retry_ids)
+
+        with self._stats_lock:
+            self._stats['batches'] += 1
+            self._stats['tasks'] += len(items)
+            for name in ('ai_calls', 'open', 'flagged', 'retried', 'fallback'):
+                self._stats[name] += summary[name]
+        return summary
+
+    def run(self, once=False):
+        """持續處理直到 stop()；once=True 時佇列清空就結束"""
+        while not self._stop.is_set():
+            try:
+                summary = self.run_once()
+            except Exception as e:
+                print(f"❌ 審查工作者發生錯誤: {e}")
+                summary = {'claimed': 0, 'retried': 0}
+
+            # 斷路器斷開時 once 模式也結束，項目留在佇列等下次執行
+            if once and (summary.get('paused') or not summary['claimed'] or summary['retried'] == summary['claimed']):
+                break
+            # 滿批代表還有積壓，立即處理下一批；否則等下一輪（失敗時也稍等，不連續打 API）
+            if summary['claimed'] < self.batch_size or summary['retried']:
+                self._stop.wait(self.interval)
+
+    def start(self):
+        """在背景 daemon 執行緒中執行"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name='moderation-worker', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats(self):
+        """累計處理統計"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['running'] = self.running
+        stats['batch_size'] = self.batch_size
+        return stats
+
+
+_background_worker = None
+_background_lock = threading.Lock()
+
+
+def start_in_background():
+    """
+    在目前程序啟動一個背景工作者（重複呼叫只會啟動一次）
+
+    Streamlit 每次互動都會重新執行 app.py，但模組只載入一次，因此每個程序只有一個工作者。
+
+    Returns:
+        ModerationWorker: 程序共用的工作者
+    """
+    global _background_worker
+
+    if _background_worker is None:
+        with _background_lock:
+            if _background_worker is None:
+                worker = ModerationWorker()
+                worker.start()
+                _background_worker = worker
+    return _background_worker
+
+
+def get_background_worker():
+    """目前程序的背景工作者；未啟動時為 None"""
+    return _background_worker
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='處理任務審查佇列')
+    parser.add_argument('--once', action='store_true', help='處理完目前的佇列後結束')
+    parser.add_argument('--batch-size', type=int, default=Config.MODERATION_BATCH_SIZE,
+                        help='每輪從佇列領取的任務數（每個 prompt 的則數由 AI_BATCH_MAX_ITEMS 與 token 預算決定）')
+    parser.add_argument('--interval', type=float, default=Config.MODERATION_POLL_SECONDS, help='佇列空時的輪詢秒數')
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("  Campus Help 背景審查工作者")
+    print("=" * 50)
+
+    init_db()
+    get_classifier()
+    worker = ModerationWorker(args.batch_size, args.interval)
+    start = time.perf_counter()
+
+    try:
+        worker.run(once=args.once)
+    except KeyboardInterrupt:
+        print("\n⏹️ 已停止")
+
+    stats = worker.stats()
+    print(f"\n✅ 處理 {stats['tasks']:,} 個任務（{stats['batches']:,} 批、模型呼叫 {stats['ai_calls']:,} 次）："
+          f"開放 {stats['open']:,}、標記 {stats['flagged']:,}、重試 {stats['retried']:,}，"
+          f"耗時 {time.perf_counter() - start:.1f} 秒")
@@ -0,0 +1,215 @@
+"""
+推薦預先計算腳本
+為所有使用中的使用者計算前 N 名推薦任務，寫入 user_recommendations 表供推薦頁讀取
+
+用法：
+    python precompute_recommendations.py                 # 增量：只重算有變動的使用者與任務
+    python precompute_recommendations.py --full          # 全部重算
+    python precompute_recommendations.py --workers 4     # 以 4 個行程平行計算
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func
+
+from database import (
+    init_db, session_scope, get_open_task_index, recommendation_profile_hash, recommendation_cache, merge_rankings,
+    User, Task, UserRecommendation
+)
+from matching_engine import MatchingEngine
+
+# 每次矩陣運算的使用者數（單一矩陣大小約為 使用者數 × 任務數 × 8 bytes）
+DEFAULT_USER_BLOCK = 64
+# 存下的名次（需不少於推薦頁顯示的數量）
+DEFAULT_TOP_N = 20
+
+_worker_state = {}
+
+
+def _init_worker(block, top_n):
+    """行程初始化：任務區塊只傳送一次"""
+    _worker_state['matcher'] = MatchingEngine()
+    _worker_state['block'] = block
+    _worker_state['top_n'] = top_n
+
+
+def _score_users(users):
+    """計算一批使用者的前 N 名，回傳 [(使用者 id, [(任務 id, 分數明細), ...])]"""
+    matcher, block = _worker_state['matcher'], _worker_state['block']
+    rankings = matcher.top_recommendations_matrix(users, block, _worker_state['top_n'])
+    return [
+        (user['id'], [(int(block['tasks'][i]), details) for i, details in ranking])
+        for user, ranking in zip(users, rankings)
+    ]
+
+
+def compute_recommendations(users, block, top_n=DEFAULT_TOP_N, workers=1, user_block=DEFAULT_USER_BLOCK):
+    """
+    以使用者 × 任務分數矩陣計算每位使用者的前 N 名
+
+    Args:
+        users (list): 使用者字典
+        block (dict): OpenTaskIndex.block() 的任務區塊（較新的任務在前，同分時優先）
+        top_n (int): 每位使用者保留的名次
+        workers (int): 行程數，1 表示在目前行程計算
+        user_block (int): 每次矩陣運算的使用者數
+
+    Returns:
+        dict: {使用者 id: [(任務 id, 分數明細), ...]}
+    """
+    chunks = [users[i:i + user_block] for i in range(0, len(users), user_block)]
+    results = {}
+
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(block, top_n)) as pool:
+            for chunk_result in pool.map(_score_users, chunks):
+                results.update(chunk_result)
+    else:
+        _init_worker(block, top_n)
+        for chunk in chunks:
+            results.update(_score_users(chunk))
+
+    return results
+
+
+def _load_state():
+    """讀取使用中的使用者、既有結果與上次執行時間"""
+    with session_scope() as session:
+        users = [user.to_dict() for user in session.query(User).filter(User.status == 'active').order_by(User.id)]
+
+        stored = {}
+        rows = session.query(UserRecommendation).order_by(UserRecommendation.user_id, UserRecommendation.rank)
+        for row in rows:
+            entry = stored.setdefault(row.user_id, {'profile_hash': row.profile_hash, 'top_n': row.top_n, 'ranking': []})
+            entry['ranking'].append((row.task_id, row.to_details()))
+
+        last_run = session.query(func.max(UserRecommendation.computed_at)).scalar()
+        return users, stored, last_run
+
+
+def _changed_open_tasks(since):
+    """上次執行後新增或修改過的開放任務"""
+    with session_scope() as session:
+        rows = session.query(Task.id).filter(Task.status == 'open', Task.updated_at > since)
+        return {task_id for (task_id,) in rows}
+
+
+def _save(users, results, run_started_at, top_n):
+    """寫入本次結果；其餘使用者的結果仍然有效，只更新計算時間"""
+    active_ids = {user['id'] for user in users}
+    updated_ids = list(results)
+
+    with session_scope() as session:
+        stale_ids = [
+            user_id for (user_id,) in session.query(UserRecommendation.user_id).distinct()
+            if user_id not in active_ids
+        ]
+        for ids in (stale_ids, updated_ids):
+            for i in range(0, len(ids), 500):
+                session.query(UserRecommendation).filter(
+                    UserRecommendation.user_id.in_(ids[i:i + 500])
+                ).delete(synchronize_session=False)
+
+        profile_hashes = {user['id']: recommendation_profile_hash(user) for user in users}
+        rows = [
+            {
+                'user_id': user_id,
+                'rank': rank,
+                'task_id': task_id,
+                'score': details['total_score'],
+                'skill_score': details['skill_score'],
+                'time_score': details['time_score'],
+                'rating_score': details['rating_score'],
+                'location_score': details['location_score'],
+                'profile_hash': profile_hashes[user_id],
+                'top_n': top_n,
+                'computed_at': run_started_at
+            }
+            for user_id, ranking in results.items()
+            for rank, (task_id, details) in enumerate(ranking, 1)
+        ]
+        if rows:
+            session.execute(UserRecommendation.__table__.insert(), rows)
+
+        session.query(UserRecommendation).update({'computed_at': run_started_at}, synchronize_session=False)
+
+
+def precompute(top_n=DEFAULT_TOP_N, workers=1, full=False, user_block=DEFAULT_USER_BLOCK):
+    """
+    執行一次預先計算
+
+    增量模式（有上次結果且未指定 full）：
+    - 新使用者、資料改變的使用者、保留名次不同、結果中有任務已關閉或被修改的使用者 → 對全部開放任務重算
+    - 其餘使用者 → 只對上次執行後新增/修改的開放任務評分，再與既有前 N 名合併
+
+    Returns:
+        dict: 'full' 全部重算人數, 'merged' 合併更新人數, 'open_tasks' 開放任務數, 'seconds' 耗時
+    """
+    # 先記下開始時間：執行期間變動的任務下次會再處理
+    run_started_at = datetime.utcnow()
+    start = time.perf_counter()
+
+    users, stored, last_run = _load_state()
+    incremental = last_run is not None and not full
+    changed_ids = _changed_open_tasks(last_run) if incremental else set()
+
+    index = get_open_task_index()
+    with index.lock:
+        block = index.block(np.flatnonzero(index.active_bitmap()))
+    open_ids = set(block['tasks'].tolist())
+    print(f"📦 使用中使用者 {len(users):,} 位，開放任務 {len(open_ids):,} 個")
+
+    full_users, merge_users = [], []
+    for user in users:
+        entry = stored.get(user['id'])
+        if not incremental or (
+            entry is None or
+            entry['profile_hash'] != recommendation_profile_hash(user) or
+            entry['top_n'] != top_n or
+            any(task_id not in open_ids or task_id in changed_ids for task_id, _ in entry['ranking'])
+        ):
+            full_users.append(user)
+        else:
+            merge_users.append(user)
+
+    results = compute_recommendations(full_users, block, top_n, workers, user_block)
+
+    merged = 0
+    if merge_users and changed_ids:
+        delta_block = index.block(block['slots'][np.isin(block['tasks'], list(changed_ids))])
+        delta = compute_recommendations(merge_users, delta_block, top_n, workers, user_block)
+        for user in merge_users:
+            results[user['id']] = merge_rankings(stored[user['id']]['ranking'], delta[user['id']], top_n)
+        merged = len(merge_users)
+
+    _save(users, results, run_started_at, top_n)
+    recommendation_cache.clear()
+
+    return {
+        'full': len(full_users),
+        'merged': merged,
+        'open_tasks': len(open_ids),
+        'seconds': time.perf_counter() - start
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='預先計算所有使用者的推薦任務')
+    parser.add_argument('--top-n', type=int, default=DEFAULT_TOP_N, help='每位使用者保留的名次')
+    parser.add_argument('--workers', type=int, default=1, help='平行計算的行程數')
+    parser.add_argument('--full', action='store_true', help='忽略上次結果，全部重算')
+    parser.add_argument('--user-block', type=int, default=DEFAULT_USER_BLOCK, help='每次矩陣運算的使用者數')
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("  Campus Help 推薦預先計算")
+    print("=" * 50)
+
+    init_db()
+    summary = precompute(args.top_n, args.workers, args.full, args.user_block)
+
+    print(f"\n✅ 完成：全部重算 {summary['full']:,} 位、合併更新 {summary['merged']:,} 位，"
+          f"耗時 {summary['seconds']:.1f} 秒")
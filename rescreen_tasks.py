@@ -0,0 +1,77 @@
+"""
+重新審查開放任務
+關鍵字清單或審查 prompt 更新後，以批次 prompt 重新審查既有的開放任務，
+高風險/嚴重違規的任務標記為 flagged（移出列表與推薦，發布者可取消取回點數）。
+多則描述依 Config.AI_BATCH_TOKEN_BUDGET 合併成一個 prompt，請求數約為逐則審查的 1/N。
+
+用法：
+    python rescreen_tasks.py                 # 重新審查並標記
+    python rescreen_tasks.py --dry-run       # 只列出會被標記的任務
+    python rescreen_tasks.py --chunk 200     # 每次讀取 200 個任務
+"""
+import argparse
+import time
+
+from ai_service import AIService
+from database import init_db, get_tasks_for_screening, flag_tasks, is_flagged_verdict
+
+DEFAULT_CHUNK = 500
+
+
+def rescreen(chunk=DEFAULT_CHUNK, dry_run=False, status='open', token_budget=None, max_items=None):
+    """
+    重新審查所有指定狀態的任務
+
+    Returns:
+        dict: 'tasks' 審查數, 'ai_items' 需要 AI 的則數（逐則審查的請求數）,
+              'ai_calls' 實際模型呼叫次數, 'flagged' 標記數, 'seconds' 耗時
+    """
+    start = time.perf_counter()
+    summary = {'tasks': 0, 'ai_items': 0, 'ai_calls': 0, 'flagged': 0}
+    last_id = 0
+
+    while True:
+        tasks = get_tasks_for_screening(last_id, chunk, status)
+        if not tasks:
+            break
+        last_id = tasks[-1]['id']
+
+        results, counts = AIService.risk_assessment_batch(
+            [(task['description'], task['category']) for task in tasks], token_budget, max_items
+        )
+        summary['tasks'] += len(tasks)
+        summary['ai_items'] += counts['ai_items']
+        summary['ai_calls'] += counts['ai_calls']
+
+        flagged = [
+            {'task_id': task['id'], 'data': result['data']}
+            for task, result in zip(tasks, results)
+            if is_flagged_verdict(result['data'])
+        ]
+        for verdict in flagged:
+            print(f"   🚩 任務 {verdict['task_id']}：{verdict['data'].get('reason')}")
+
+        summary['flagged'] += len(flagged) if dry_run else flag_tasks(flagged)
+
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='以批次 prompt 重新審查開放任務')
+    parser.add_argument('--chunk', type=int, default=DEFAULT_CHUNK, help='每次讀取的任務數')
+    parser.add_argument('--dry-run', action='store_true', help='只列出會被標記的任務，不寫入')
+    parser.add_argument('--token-budget', type=int, default=None, help='每個 prompt 的 token 預算')
+    parser.add_argument('--max-items', type=int, default=None, help='每個 prompt 最多幾則描述')
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("  Campus Help 重新審查開放任務")
+    print("=" * 50)
+
+    init_db()
+    summary = rescreen(args.chunk, args.dry_run, token_budget=args.token_budget, max_items=args.max_items)
+
+    print(f"\n✅ 完成：審查 {summary['tasks']:,} 個任務，{'將' if args.dry_run else '已'}標記 {summary['flagged']:,} 個")
+    print(f"   需要 AI 的 {summary['ai_items']:,} 則只呼叫模型 {summary['ai_calls']:,} 次，"
+          f"耗時 {summary['seconds']:.1f} 秒")
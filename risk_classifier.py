@@ -0,0 +1,394 @@
+"""
+本地風險分類器 - Campus Help
+通過關鍵字檢測的描述不必全部送 Gemini：先以本地模型估計風險機率，
+只有落在不確定區間的才交給 AI 審查。
+1. 特徵：正規化後的字元 1~3-gram，TF-IDF（次線性 TF）+ L2 正規化
+2. 模型：以 NumPy 訓練的 logistic regression（類別加權，處理違規樣本少的問題）
+3. 決策：機率 < low_threshold 判定安全、>= high_threshold 判定需人工審核，其餘送 AI
+4. 模型檔（.npz）由 train_risk_classifier.py 從歷史審查結果訓練產生，程序內只載入一次
+單則預測只有字典查詢與一次稀疏內積，約數十微秒。
+"""
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from ai_cache import normalize_text
+from config import Config
+
+NGRAM_RANGE = (1, 3)
+
+# 訓練至少要有的樣本數（每個標籤）
+MIN_SAMPLES_PER_LABEL = 10
+
+
+def classifier_text(description, category):
+    """分類器的輸入：分類 + 描述"""
+    return f"[{category or ''}] {description or ''}"
+
+
+def char_ngrams(text, ngram_range=NGRAM_RANGE):
+    """正規化後的字元 n-gram（不含純空白的片段）"""
+    text = normalize_text(text)
+    low, high = ngram_range
+    grams = []
+    for n in range(low, high + 1):
+        for i in range(len(text) - n + 1):
+            gram = text[i:i + n]
+            if not gram.isspace():
+                grams.append(gram)
+    return grams
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -30, 30)))
+
+
+class RiskClassifier:
+    """字元 n-gram TF-IDF + logistic regression"""
+
+    SAFE = 'safe'
+    RISKY = 'risky'
+
+    def __init__(self, vocabulary, idf, weights, bias, low_threshold=0.1, high_threshold=0.9, metadata=None):
+        self.vocabulary = list(vocabulary)
+        self.index = {gram: i for i, gram in enumerate(self.vocabulary)}
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.low_threshold = low_threshold
+        self.high_threshold = high_threshold
+        self.metadata = metadata or {}
+        self._stats_lock = threading.Lock()
+        self._stats = {'predictions': 0, 'safe': 0, 'risky': 0, 'escalated': 0, 'total_us': 0.0}
+
+    def features(self, text):
+        """
+        單則文字的稀疏 TF-IDF 向量
+
+        Returns:
+            tuple: (特徵索引 ndarray, 值 ndarray)，已 L2 正規化
+        """
+        counts = {}
+        index = self.index
+        for gram in char_ngrams(text):
+            i = index.get(gram)
+            if i is not None:
+                counts[i] = counts.get(i, 0) + 1
+
+        if not counts:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = (1.0 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))) * self.idf[indices]
+        return indices, values / np.linalg.norm(values)
+
+    def predict_proba(self, text):
+        """違規（需人工審核以上）的機率"""
+        indices, values = self.features(text)
+        score = self.bias + float(values @ self.weights[indices])
+        return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, score))))
+
+    def predict_many(self, texts):
+        """多則文字的違規機率"""
+        return np.array([self.predict_proba(text) for text in texts])
+
+    def decide(self, text):
+        """
+        依不確定區間決定是否需要 AI
+
+        Returns:
+            tuple: (SAFE / RISKY / None（送 AI）, 機率)
+        """
+        start = time.perf_counter()
+        probability = self.predict_proba(text)
+        if probability < self.low_threshold:
+            decision = self.SAFE
+        elif probability >= self.high_threshold:
+            decision = self.RISKY
+        else:
+            decision = None
+
+        with self._stats_lock:
+            self._stats['predictions'] += 1
+            self._stats[decision or 'escalated'] += 1
+            self._stats['total_us'] += (time.perf_counter() - start) * 1e6
+        return decision, probability
+
+    def stats(self):
+        """預測統計（safe + risky 即省下的 AI 呼叫數）"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total_us = stats.pop('total_us')
+        stats['avg_us'] = total_us / stats['predictions'] if stats['predictions'] else 0.0
+        stats['avoided_rate'] = (stats['safe'] + stats['risky']) / stats['predictions'] if stats['predictions'] else 0.0
+        stats['low_threshold'] = self.low_threshold
+        stats['high_threshold'] = self.high_threshold
+        stats['features'] = len(self.vocabulary)
+        return stats
+
+    def save(self, path):
+        """存成 .npz（不使用 pickle）"""
+        np.savez_compressed(
+            path,
+            vocabulary=np.array(self.vocabulary, dtype=str),
+            idf=self.idf,
+            weights=self.weights,
+            bias=np.array(self.bias),
+            thresholds=np.array([self.low_threshold, self.high_threshold]),
+            metadata=np.array(json.dumps(self.metadata, ensure_ascii=False))
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            low, high = data['thresholds'].tolist()
+            return cls(
+                data['vocabulary'].tolist(), data['idf'], data['weights'], float(data['bias']),
+                low, high, json.loads(str(data['metadata']))
+            )
+
+
+# ========== 訓練 ==========
+
+def build_vocabulary(texts, min_df=2, max_features=20000):
+    """
+    依文件頻率選出 n-gram 字彙
+
+    Returns:
+        tuple: (字彙列表, idf ndarray)
+    """
+    document_frequency = {}
+    for text in texts:
+        for gram in set(char_ngrams(text)):
+            document_frequency[gram] = document_frequency.get(gram, 0) + 1
+
+    grams = [gram for gram, df in document_frequency.items() if df >= min_df]
+    grams.sort(key=lambda gram: (-document_frequency[gram], gram))
+    vocabulary = grams[:max_features]
+
+    n_docs = len(texts)
+    idf = np.array([math.log((1 + n_docs) / (1 + document_frequency[gram])) + 1.0 for gram in vocabulary])
+    return vocabulary, idf
+
+
+def vectorize(classifier, texts):
+    """
+    多則文字轉成 CSR 形式的稀疏矩陣
+
+    Returns:
+        tuple: (每個值所屬的列 ndarray, 特徵索引 ndarray, 值 ndarray)
+    """
+    rows, columns, values = [], [], []
+    for row, text in enumerate(texts):
+        indices, data = classifier.features(text)
+        rows.append(np.full(len(indices), row, dtype=np.int64))
+        columns.append(indices)
+        values.append(data)
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(rows), np.concatenate(columns), np.concatenate(values)
+
+
+def train_logistic(matrix, labels, n_features, l2=1e-4, epochs=400, learning_rate=0.1):
+    """
+    以全批次 Adam 訓練加權 logistic regression（正負樣本各占一半的權重）
+
+    Args:
+        matrix (tuple): vectorize() 的稀疏矩陣
+        labels (ndarray): 0/1 標籤
+
+    Returns:
+        tuple: (權重 ndarray, 偏差)
+    """
+    rows, columns, values = matrix
+    labels = np.asarray(labels, dtype=np.float64)
+    n_docs = len(labels)
+    positives = labels.sum()
+    sample_weight = np.where(labels == 1, n_docs / (2 * max(positives, 1)), n_docs / (2 * max(n_docs - positives, 1)))
+
+    params = np.zeros(n_features + 1)
+    first, second = np.zeros_like(params), np.zeros_like(params)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+
+    for step in range(1, epochs + 1):
+        scores = np.bincount(rows, weights=values * params[columns], minlength=n_docs) + params[-1]
+        error = (_sigmoid(scores) - labels) * sample_weight / n_docs
+
+        gradient = np.empty_like(params)
+        gradient[:-1] = np.bincount(columns, weights=values * error[rows], minlength=n_features) + l2 * params[:-1]
+        gradient[-1] = error.sum()
+
+        first = beta1 * first + (1 - beta1) * gradient
+        second = beta2 * second + (1 - beta2) * gradient ** 2
+        params -= learning_rate * (first / (1 - beta1 ** step)) / (np.sqrt(second / (1 - beta2 ** step)) + eps)
+
+    return params[:-1], params[-1]
+
+
+def fit(texts, labels, min_df=2, max_features=20000, l2=1e-4, epochs=400):
+    """從文字與 0/1 標籤訓練分類器（門檻先用預設值，之後以 choose_thresholds 調整）"""
+    vocabulary, idf = build_vocabulary(texts, min_df, max_features)
+    classifier = RiskClassifier(vocabulary, idf, np.zeros(len(vocabulary)), 0.0)
+    weights, bias = train_logistic(vectorize(classifier, texts), labels, len(vocabulary), l2, epochs)
+    classifier.weights, classifier.bias = weights, bias
+    return classifier
+
+
+def choose_thresholds(probabilities, labels, max_missed_rate=0.02, min_flag_precision=0.95):
+    """
+    在驗證集上選不確定區間
+
+    low：判定安全的項目中，漏掉的違規不超過全部違規的 max_missed_rate
+    high：判定違規的項目中，精確率至少 min_flag_precision
+    兩者都以 0.5 為界（low 不超過、high 不低於 0.5）
+
+    Returns:
+        tuple: (low_threshold, high_threshold)
+    """
+    probabilities = np.asarray(probabilities)
+    labels = np.asarray(labels)
+    candidates = np.unique(np.concatenate([[0.0, 1.0], probabilities]))
+    total_risky = max(int(labels.sum()), 1)
+
+    low = 0.0
+    for threshold in candidates:
+        missed = int(labels[probabilities < threshold].sum())
+        if missed / total_risky <= max_missed_rate:
+            low = threshold
+        else:
+            break
+
+    high = 1.0 + 1e-9
+    for threshold in candidates[::-1]:
+        flagged = labels[probabilities >= threshold]
+        if len(flagged) and flagged.mean() >= min_flag_precision:
+            high = threshold
+        elif len(flagged):
+            break
+
+    # 不確定區間一定包含 0.5，驗證集再漂亮也不讓本地模型越過決策邊界
+    return float(min(low, 0.5)), float(max(high, 0.5))
+
+
+def evaluate(classifier, texts, labels):
+    """
+    在驗證集上評估
+
+    Returns:
+        dict: 固定門檻 0.5 的精確率/召回率，以及不確定區間下省下的 AI 呼叫比例、
+              本地判定的正確率、被判定安全而漏掉的違規數、平均預測微秒數
+    """
+    labels = np.asarray(labels, dtype=int)
+    start = time.perf_counter()
+    probabilities = classifier.predict_many(texts)
+    avg_us = (time.perf_counter() - start) / max(len(texts), 1) * 1e6
+
+    def precision_recall(predicted):
+        true_positive = int((predicted & (labels == 1)).sum())
+        precision = true_positive / predicted.sum() if predicted.sum() else 0.0
+        recall = true_positive / labels.sum() if labels.sum() else 0.0
+        return float(precision), float(recall)
+
+    precision, recall = precision_recall(probabilities >= 0.5)
+    safe = probabilities < classifier.low_threshold
+    risky = probabilities >= classifier.high_threshold
+    local = safe | risky
+    flag_precision, _ = precision_recall(risky)
+
+    return {
+        'samples': len(labels),
+        'positives': int(labels.sum()),
+        'precision': precision,
+        'recall': recall,
+        'low_threshold': classifier.low_threshold,
+        'high_threshold': classifier.high_threshold,
+        'avoided_rate': float(local.mean()) if len(labels) else 0.0,
+        'local_accuracy': float(((risky & (labels == 1)) | (safe & (labels == 0)))[local].mean()) if local.any() else 0.0,
+        'local_safe': int(safe.sum()),
+        'local_risky': int(risky.sum()),
+        'missed_risky': int((safe & (labels == 1)).sum()),
+        'flag_precision': flag_precision,
+        'avg_us': avg_us
+    }
+
+
+# ========== 程序共用的分類器 ==========
+
+_classifier = None
+_classifier_ready = False
+_classifier_lock = threading.Lock()
+
+
+def get_classifier():
+    """
+    取得程序共用的分類器（第一次呼叫時載入 Config.RISK_MODEL_PATH，只載入一次）
+
+    Returns:
+        RiskClassifier；未啟用、模型檔不存在或載入失敗時為 None（全部送 AI，行為與之前相同）
+    """
+    global _classifier, _classifier_ready
+
+    if not _classifier_ready:
+        with _classifier_lock:
+            if not _classifier_ready:
+                _classifier = None
+                if Config.RISK_LOCAL_ENABLED and os.path.exists(Config.RISK_MODEL_PATH):
+                    try:
+                        _classifier = RiskClassifier.load(Config.RISK_MODEL_PATH)
+                        print(f"✅ 本地風險模型已載入（{len(_classifier.vocabulary):,} 個特徵）")
+                    except Exception as e:
+                        print(f"⚠️ 本地風險模型載入失敗: {e}")
+                elif Config.RISK_LOCAL_ENABLED:
+                    print(f"ℹ️ 找不到本地風險模型 {Config.RISK_MODEL_PATH}，全部描述送 AI 審查。"
+                          f"累積違規與正常的 AI 審查結果各至少 {MIN_SAMPLES_PER_LABEL} 筆後，"
+                          f"執行 python train_risk_classifier.py 產生模型")
+                _classifier_ready = True
+    return _classifier
+
+
+def reset_classifier(classifier=None):
+    """
+    替換程序共用的分類器（測試或重新訓練後使用）
+
+    Args:
+        classifier: 新的分類器；None 表示下次 get_classifier() 時重新從檔案載入
+    """
+    global _classifier, _classifier_ready
+
+    with _classifier_lock:
+        _classifier = classifier
+        _classifier_ready = classifier is not None
+
+
+if __name__ == '__main__':
+    import random
+
+    print("測試本地風險分類器（合成資料）...")
+    rng = random.Random(7)
+    safe_phrases = ['幫忙搬宿舍行李', '教我微積分', '借我筆記影印', '社團海報設計', '活動攝影協助', '組裝書桌', '英文口說練習', '修理腳踏車']
+    risky_phrases = ['幫我寫期末作業交出去', '考試時傳答案給我', '幫我買菸帶來', '借我一萬元下週還', '晚上到我房間陪我']
+    texts, labels = [], []
+    for _ in range(400):
+        risky = rng.random() < 0.25
+        phrase = rng.choice(risky_phrases if risky else safe_phrases)
+        texts.append(classifier_text(f"{phrase}，約{rng.randint(1, 3)}小時，地點{rng.choice(['圖書館', '宿舍', '教室'])}", '日常支援'))
+        labels.append(int(risky))
+
+    classifier = fit(texts[:300], labels[:300], epochs=200)
+    classifier.low_threshold, classifier.high_threshold = choose_thresholds(
+        classifier.predict_many(texts[300:]), labels[300:]
+    )
+    report = evaluate(classifier, texts[300:], labels[300:])
+    print(f"   {report}")
+    assert report['recall'] == 1.0 and report['missed_risky'] == 0
+
+    path = os.path.join(__import__('tempfile').mkdtemp(), 'risk_model.npz')
+    classifier.save(path)
+    loaded = RiskClassifier.load(path)
+    assert abs(loaded.predict_proba(texts[0]) - classifier.predict_proba(texts[0])) < 1e-12
+    assert loaded.decide(classifier_text('幫我買菸帶來宿舍', '日常支援'))[0] == RiskClassifier.RISKY
+    print(f"   ✅ 存檔/載入一致，單則預測 {report['avg_us']:.0f} µs")
@@ -0,0 +1,236 @@
+"""
+時間表模組 - Campus Help
+以位元集合表示一週的時段：
+1. 一週 7 天 × 24 小時 = 168 個時段，第 (星期 × 24 + 小時) 位元代表該小時
+2. 使用者可接任務的時段、任務進行的時段都以 42 字元的十六進位字串存入資料庫
+3. 媒合時只需位元 AND 即可判斷時段是否重疊，不必每次解析日期與時長
+"""
+import math
+import re
+from datetime import datetime
+
+import numpy as np
+
+DAYS = 7
+SLOTS_PER_DAY = 24
+SLOT_COUNT = DAYS * SLOTS_PER_DAY
+HEX_LENGTH = SLOT_COUNT // 4
+FULL_WEEK = (1 << SLOT_COUNT) - 1
+
+# 批次評分時每個時間表拆成 3 個 64 位元整數
+WORDS = math.ceil(SLOT_COUNT / 64)
+
+DAY_NAMES = ['週一', '週二', '週三', '週四', '週五', '週六', '週日']
+
+# 未填時長時預設的任務時長（分鐘）
+DEFAULT_DURATION_MINUTES = 60
+
+_CHINESE_DIGITS = {'零': 0, '〇': 0, '一': 1, '兩': 2, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+# 數量可帶「個」「個半」（一個半小時 = 1.5 小時）
+_DURATION_PATTERN = re.compile(
+    r'(\d+(?:\.\d+)?|[零〇一兩二三四五六七八九十]+|半)\s*(個半|個)?\s*'
+    r'(小時|鐘頭|分鐘|分|hours?\b|hrs?\b|h\b|minutes?\b|mins?\b|m\b)',
+    re.IGNORECASE
+)
+
+
+def slot(weekday, hour):
+    """星期（0 = 週一）與小時對應的位元位置"""
+    return weekday * SLOTS_PER_DAY + hour
+
+
+def encode(bits):
+    """位元集合轉為十六進位字串；空集合為 None（代表未設定）"""
+    if not bits:
+        return None
+    return format(bits & FULL_WEEK, f'0{HEX_LENGTH}x')
+
+
+def decode(value):
+    """十六進位字串轉回位元集合；None 或空字串為 0"""
+    if not value:
+        return 0
+    return int(value, 16) & FULL_WEEK
+
+
+def from_day_hours(day_hours):
+    """{星期: [小時, ...]} 轉為位元集合（供時間表設定頁使用）"""
+    bits = 0
+    for weekday, hours in day_hours.items():
+        for hour in hours:
+            bits |= 1 << slot(weekday, hour)
+    return bits
+
+
+def to_day_hours(bits):
+    """位元集合轉為 {星期: [小時, ...]}"""
+    return {
+        weekday: [hour for hour in range(SLOTS_PER_DAY) if bits >> slot(weekday, hour) & 1]
+        for weekday in range(DAYS)
+    }
+
+
+def to_words(value):
+    """十六進位字串（或位元集合）轉為 WORDS 個 uint64，供 NumPy 批次比對"""
+    bits = decode(value) if isinstance(value, str) or value is None else value
+    return np.array([(bits >> (64 * i)) & 0xFFFFFFFFFFFFFFFF for i in range(WORDS)], dtype=np.uint64)
+
+
+def parse_chinese_number(text):
+    """
+    中文數字（0～99）轉為整數
+
+    「十五」→ 15、「三十」→ 30、「二十五」→ 25、「十」→ 10；無法解析時為 None
+    """
+    if '十' in text:
+        tens, _, ones = text.partition('十')
+        if '十' in ones or len(tens) > 1 or len(ones) > 1:
+            return None
+        tens_value = _CHINESE_DIGITS.get(tens, 1 if not tens else None)
+        ones_value = _CHINESE_DIGITS.get(ones, 0 if not ones else None)
+        if tens_value is None or ones_value is None:
+            return None
+        return tens_value * 10 + ones_value
+
+    value = 0
+    for char in text:
+        value = value * 10 + _CHINESE_DIGITS[char]
+    return value
+
+
+def parse_duration_minutes(text):
+    """
+    解析任務時長文字
+
+    支援「2小時」「30分鐘」「1.5 小時」「1小時30分」「半小時」「兩個鐘頭」「十五分鐘」「一個半小時」「90 min」等寫法。
+
+    Returns:
+        int: 分鐘數；無法解析時為 None
+    """
+    if not text:
+        return None
+
+    minutes = 0.0
+    matched = False
+    for amount, counter, unit in _DURATION_PATTERN.findall(str(text)):
+        if amount == '半':
+            value = 0.5
+        elif amount[0].isdigit():
+            value = float(amount)
+        else:
+            value = parse_chinese_number(amount)
+            if value is None:
+                continue
+        if counter == '個半':
+            value += 0.5
+
+        unit = unit.lower()
+        if unit in ('小時', '鐘頭', 'h') or unit.startswith('hour') or unit.startswith('hr'):
+            minutes += value * 60
+        else:
+            minutes += value
+        matched = True
+
+    # 「1小時半」
+    if matched and re.search(r'(小時|鐘頭)半', str(text)):
+        minutes += 30
+
+    return int(round(minutes)) if matched and minutes > 0 else None
+
+
+def parse_date(value):
+    """解析 YYYY-MM-DD 日期；失敗時為 None"""
+    try:
+        return datetime.strptime(str(value).strip(), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_time(value):
+    """解析 HH:MM 時間；失敗時為 None"""
+    try:
+        return datetime.strptime(str(value).strip(), '%H:%M').time()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_task_times(accept_deadline, task_start_time, task_duration):
+    """
+    將任務的預定日期、開始時間、時長文字解析成有型別的值（存入 Task 的同名欄位）
+
+    Returns:
+        dict: 'scheduled_date' (date)、'start_time' (time)、'duration_minutes' (int)、
+              'starts_at' (datetime，日期與開始時間都有時才有)；無法解析的項目為 None
+    """
+    scheduled_date = parse_date(accept_deadline) if accept_deadline else None
+    start_time = parse_time(task_start_time) if task_start_time else None
+    return {
+        'scheduled_date': scheduled_date,
+        'start_time': start_time,
+        'duration_minutes': parse_duration_minutes(task_duration),
+        'starts_at': datetime.combine(scheduled_date, start_time) if scheduled_date and start_time else None
+    }
+
+
+def slots_between(starts_at, duration_minutes):
+    """
+    任務進行的時段
+
+    由開始時間（星期幾、幾點）與時長算出涵蓋的每個小時；
+    時長未知時以 DEFAULT_DURATION_MINUTES 計，跨過週日午夜則接回週一。
+    沒有開始時間的任務沒有固定時段，回傳 0。
+    """
+    if starts_at is None:
+        return 0
+
+    duration = duration_minutes or DEFAULT_DURATION_MINUTES
+    start_minute = slot(starts_at.weekday(), starts_at.hour) * 60 + starts_at.minute
+    first = start_minute // 60
+    last = min(math.ceil((start_minute + duration) / 60), first + SLOT_COUNT)
+
+    bits = 0
+    for hour in range(first, last):
+        bits |= 1 << (hour % SLOT_COUNT)
+    return bits
+
+
+def task_slots(accept_deadline, task_start_time, task_duration):
+    """由任務的預定日期、開始時間、時長文字算出時段（見 slots_between）"""
+    times = parse_task_times(accept_deadline, task_start_time, task_duration)
+    return slots_between(times['starts_at'], times['duration_minutes'])
+
+
+def encode_task_slots(accept_deadline, task_start_time, task_duration):
+    """task_slots() 的十六進位字串，存入 Task.time_slots"""
+    return encode(task_slots(accept_deadline, task_start_time, task_duration))
+
+
+def describe(bits):
+    """時間表的簡短說明，例如「週一 09-12、週三 14-16」"""
+    parts = []
+    for weekday, hours in to_day_hours(bits).items():
+        start = None
+        for hour in hours + [None]:
+            if start is None:
+                start = previous = hour
+            elif hour is not None and hour == previous + 1:
+                previous = hour
+            else:
+                parts.append(f"{DAY_NAMES[weekday]} {start:02d}-{previous + 1:02d}")
+                start = previous = hour
+    return '、'.join(parts)
+
+
+if __name__ == '__main__':
+    print("測試時間表...")
+    for text in ['2小時', '30分鐘', '1.5 小時', '1小時30分', '半小時', '兩個鐘頭', '90 min', '2h', '約一小時半', '不確定']:
+        print(f"   {text} → {parse_duration_minutes(text)}")
+
+    bits = task_slots('2026-10-19', '18:30', '2小時')  # 週一
+    print(f"   任務時段: {describe(bits)} ({encode(bits)})")
+
+    availability = from_day_hours({0: range(18, 22), 2: range(9, 12)})
+    print(f"   可接時段: {describe(availability)}")
+    print(f"   完全涵蓋: {bits & ~availability == 0}")
+    print(f"   週日 23:00 起兩小時: {describe(task_slots('2026-10-25', '23:00', '2小時'))}")
+    print(f"   {parse_task_times('2026-10-19', '18:30', '約兩小時')}")
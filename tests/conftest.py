@@ -0,0 +1,12 @@
+"""
+pytest 共用設定 - Campus Help
+config 與 database 在匯入時就讀取環境變數並建立連線，因此在匯入任何模組前
+先把資料庫、AI 快取與本地風險模型指到暫存目錄，測試不會動到工作目錄中的檔案。
+"""
+import os
+import tempfile
+
+_TMP_DIR = tempfile.mkdtemp(prefix='campus_help_test_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_TMP_DIR, 'campus_help.db')}"
+os.environ['AI_CACHE_PATH'] = os.path.join(_TMP_DIR, 'ai_cache.db')
+os.environ['RISK_MODEL_PATH'] = os.path.join(_TMP_DIR, 'risk_model.npz')
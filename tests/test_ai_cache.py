@@ -0,0 +1,79 @@
+"""
+AI 結果快取測試 - Campus Help
+key 正規化、LRU 淘汰、TTL 過期（時鐘以假時間取代）。
+
+執行：python -m pytest -q
+"""
+from types import SimpleNamespace
+
+import pytest
+
+import ai_cache
+from ai_cache import AIResultCache, make_key, normalize_text
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手動前進的時鐘（秒）"""
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(ai_cache, 'time', SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = AIResultCache(str(tmp_path / 'ai_cache.db'), ttl_seconds=60, max_entries=3)
+    yield cache
+    cache.close()
+
+
+def test_key_normalization():
+    key = make_key('risk', 'gemini-2.0-flash', 1, '日常支援', '幫忙搬宿舍行李')
+
+    assert key == make_key('risk', 'gemini-2.0-flash', 1, '日常支援', '  幫忙搬宿舍行李\n')
+    assert key == make_key('risk', 'gemini-2.0-flash', 1, '日常支援', '幫忙搬宿舍行李　')  # 全形空白
+    assert key != make_key('risk', 'gemini-2.0-flash', 2, '日常支援', '幫忙搬宿舍行李')
+    assert key != make_key('risk', 'gemini-2.0-flash', 1, '校園協助', '幫忙搬宿舍行李')
+    assert key != make_key('optimize', 'gemini-2.0-flash', 1, '日常支援', '幫忙搬宿舍行李')
+    assert normalize_text('ＡＢＣ  def') == 'abc def'
+
+
+def test_get_set(cache):
+    assert cache.get('k') == (False, None)
+    cache.set('k', 'risk', {'risk_level': 'safe'})
+
+    assert cache.get('k') == (True, {'risk_level': 'safe'})
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries_by_kind']) == (1, 1, {'risk': 1})
+
+
+def test_evicts_least_recently_used(cache, clock):
+    for key in ('a', 'b', 'c'):
+        cache.set(key, 'optimize', key)
+        clock.value += 1
+    cache.get('a')  # a 最近使用過，b 變成最久未使用
+    clock.value += 1
+    cache.set('d', 'optimize', 'd')
+
+    assert [cache.get(key)[0] for key in ('a', 'b', 'c', 'd')] == [True, False, True, True]
+    assert cache.stats()['entries'] == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_ttl_expiry(cache, clock):
+    cache.set('k', 'risk', 'v')
+    clock.value += 59
+    assert cache.get('k') == (True, 'v')
+
+    # 過期依寫入時間計，讀取不會延長
+    clock.value += 2
+    assert cache.get('k') == (False, None)
+    assert cache.stats()['entries'] == 0
+
+
+def test_set_purges_expired_entries(cache, clock):
+    cache.set('old', 'risk', 'v')
+    clock.value += 61
+    cache.set('new', 'risk', 'v')
+
+    assert cache.stats()['entries'] == 1
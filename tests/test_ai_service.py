@@ -0,0 +1,179 @@
+"""
+AI 服務測試 - Campus Help
+以假模型取代 Gemini（reset_model(factory)），不呼叫真實 API。
+
+執行：python -m pytest -q
+"""
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import ai_service
+from ai_cache import AIResultCache
+from ai_service import AIService, estimate_tokens, get_model, reset_model, split_batches
+from config import Config
+
+
+class FakeModel:
+    """依 prompt 回傳固定內容的假模型，記錄收到的 prompt；批次回應會漏掉描述含「漏掉」的任務"""
+
+    def __init__(self):
+        self.prompts = []
+
+    @staticmethod
+    def batch_ids(prompt):
+        parts = re.split(r'【任務 (\d+)】', prompt)[1:]
+        return [int(i) for i, body in zip(parts[::2], parts[1::2]) if '漏掉' not in body]
+
+    def generate_content(self, prompt, stream=False):
+        self.prompts.append(prompt)
+        if stream:
+            return self.stream(prompt)
+        if '逐一評估' in prompt:
+            return SimpleNamespace(text=json.dumps([
+                {'id': i, 'risk_level': 'safe', 'risk_score': 0.1, 'recommendation': '自動通過', 'reason': f'批次 {i}', 'flags': []}
+                for i in reversed(self.batch_ids(prompt))
+            ], ensure_ascii=False))
+        if '逐一分析' in prompt:
+            return SimpleNamespace(text='```json\n' + json.dumps([
+                {'id': i, 'required_skills': [f'技能 {i}'], 'estimated_time': '1小時', 'location_type': '實體', 'urgency': 'normal'}
+                for i in self.batch_ids(prompt)
+            ], ensure_ascii=False) + '\n```')
+        if '內容安全審查' in prompt:
+            return SimpleNamespace(text='{"risk_level": "safe", "risk_score": 0.1, "recommendation": "自動通過", "reason": "測試", "flags": []}')
+        if '提取關鍵資訊' in prompt:
+            return SimpleNamespace(text='```json\n{"required_skills": ["搬運"], "estimated_time": "1小時", "location_type": "實體", "urgency": "normal"}\n```')
+        return SimpleNamespace(text='優化後的描述')
+
+    @staticmethod
+    def stream(prompt):
+        """逐段產生回應，每段間隔 20 ms；描述含「中斷」時在第二段後失敗"""
+        for i, text in enumerate(['\n幫忙', '購買午餐', '便當和飲料']):
+            if i == 2 and '中斷' in prompt.split('【優化規則】')[0]:
+                raise RuntimeError('stream reset')
+            time.sleep(0.02)
+            yield SimpleNamespace(text=text)
+
+
+@pytest.fixture
+def created(monkeypatch, tmp_path):
+    """以假模型取代 Gemini；回傳模型建立紀錄（每建立一次加一筆）"""
+    created = []
+
+    def fake_factory():
+        created.append(1)
+        return FakeModel()
+
+    monkeypatch.setattr(Config, 'RISK_LOCAL_ENABLED', False)  # 不受工作目錄中的本地風險模型檔影響
+    monkeypatch.setattr(ai_service, 'ai_cache', AIResultCache(str(tmp_path / 'ai_cache.db')))
+    reset_model(fake_factory)
+    yield created
+    reset_model()
+
+
+def test_model_created_once_across_threads(created):
+    """8 個執行緒同時呼叫，模型只建立一次且全部共用"""
+    def call_all(_):
+        return (
+            AIService.optimize_task_description("幫我買便當")['optimized_description'],
+            AIService.risk_assessment("幫忙搬宿舍行李", "日常支援")['data']['risk_level'],
+            AIService.parse_task_description("幫忙搬宿舍行李")['data']['required_skills'],
+            AIService().model is get_model()
+        )
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(call_all, range(32)))
+
+    assert len(created) == 1
+    assert all(result == ('優化後的描述', 'safe', ['搬運'], True) for result in results)
+
+
+def test_cache_hit_ignores_whitespace(created):
+    """描述只差空白/全形時命中快取，分類不同則不命中"""
+    model = get_model()
+    AIService.risk_assessment("幫忙搬宿舍行李", "日常支援")
+
+    assert AIService.risk_assessment("  幫忙搬宿舍行李　", "日常支援").get('cached')
+    assert not AIService.risk_assessment("幫忙搬宿舍行李", "校園協助").get('cached')
+    assert len(model.prompts) == 2
+
+
+def test_batch_response_matched_by_id(created):
+    """多則描述一個 prompt，回應順序不同時依 id 對回"""
+    batch = AIService.semantic_risk_assessment_batch(get_model(), [("幫忙搬家", "日常支援"), ("教我 Python", "學習互助")])
+
+    assert [data['reason'] for data in batch] == ['批次 0', '批次 1']
+    assert 'id' not in batch[0]
+
+
+def test_risk_assessment_batch(created):
+    """依 token 預算分組、回應缺少的項目逐則補呼叫、關鍵字命中與快取命中不送 AI"""
+    AIService.risk_assessment("幫忙搬宿舍行李", "日常支援")
+    model = get_model()
+    model.prompts.clear()
+
+    items = [(f"協助整理社團器材第 {i} 批，約一小時" + ("（漏掉）" if i == 5 else ""), "校園協助") for i in range(12)]
+    items.append(("幫我代考期末考", "學習互助"))
+    items.append(("幫忙搬宿舍行李", "日常支援"))
+    results, counts = AIService.risk_assessment_batch(items, token_budget=1200, max_items=20)
+
+    assert counts == {'ai_items': 12, 'ai_calls': len(model.prompts)}
+    assert results[5]['data']['reason'] == '測試'
+    assert results[4]['data']['reason'].startswith('批次')
+    assert results[12]['data']['risk_level'] == 'critical'
+    assert results[13].get('cached')
+    batch_prompts = sum(1 for prompt in model.prompts if '逐一評估' in prompt)
+    assert 1 < batch_prompts < 12
+    assert max(estimate_tokens(prompt) for prompt in model.prompts) <= 1200
+
+
+def test_parse_task_descriptions(created):
+    """批次解析：漏掉的項目逐則補呼叫"""
+    parsed, counts = AIService.parse_task_descriptions(["幫忙搬家", "教我 Python（漏掉）", "修腳踏車"])
+
+    assert [p['data']['required_skills'] for p in parsed] == [['技能 0'], ['搬運'], ['技能 2']]
+    assert counts['ai_calls'] == 2
+
+
+def test_split_batches():
+    """單一項目超過預算時自成一組；則數上限"""
+    assert split_batches([5, 5, 50, 5], token_budget=12, max_items=10) == [[0, 1], [2], [3]]
+    assert split_batches([1] * 5, token_budget=100, max_items=2) == [[0, 1], [2, 3], [4]]
+
+
+def test_stream_first_chunk_before_full_text(created):
+    """第一段產生就拿到，不必等整段回應"""
+    start = time.perf_counter()
+    stream = AIService.stream_optimized_description("週四幫我買便當")
+    first = next(stream)
+    first_at = time.perf_counter() - start
+    rest = list(stream)
+    total = time.perf_counter() - start
+
+    assert first == '幫忙'
+    assert first + ''.join(rest) == '幫忙購買午餐便當和飲料'
+    assert first_at < total
+
+
+def test_stream_cache_both_ways(created):
+    """串流的完整結果寫入快取，非串流版也能命中；反之亦然"""
+    list(AIService.stream_optimized_description("週四幫我買便當"))
+    assert AIService.optimize_task_description("週四幫我買便當").get('cached')
+    assert list(AIService.stream_optimized_description("週四幫我買便當")) == ['幫忙購買午餐便當和飲料']
+
+    AIService.optimize_task_description("週五幫我買飲料")
+    assert list(AIService.stream_optimized_description("週五幫我買飲料")) == ['優化後的描述']
+    assert len(get_model().prompts) == 2
+
+
+def test_stream_failure_not_cached(created):
+    """串流中途失敗：已產生的段落保留並提示，部分結果不寫入快取"""
+    broken = list(AIService.stream_optimized_description("幫我買便當（中斷）"))
+
+    assert broken[:2] == ['幫忙', '購買午餐']
+    assert 'AI 優化中斷' in broken[-1]
+    assert not ai_service.ai_cache.get(AIService.optimize_cache_key("幫我買便當（中斷）"))[0]
@@ -0,0 +1,161 @@
+"""
+AI 審查用戶端測試 - Campus Help
+以可注入延遲與錯誤的假模型測試 ModerationClient 的期限、同時呼叫數上限與斷路器，
+以及斷路器斷開時背景審查工作者暫停領取。
+
+執行：python -m pytest -q
+"""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import ai_service
+import moderation_worker
+from ai_cache import AIResultCache
+from config import Config
+from moderation import CircuitBreaker, ModerationClient
+from moderation_worker import ModerationWorker
+
+
+class FakeModel:
+    """可注入延遲與錯誤的假模型，並記錄同時進行中的呼叫數"""
+
+    def __init__(self):
+        self.latency = 0.0
+        self.fail = False
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.latency)
+            if self.fail:
+                raise RuntimeError('upstream 503')
+            return SimpleNamespace(text='{"risk_level": "safe", "risk_score": 0.1, "recommendation": "自動通過", "reason": "測試", "flags": []}')
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def clock():
+    """斷路器用的可控時鐘，不必真的等冷卻時間"""
+    return SimpleNamespace(now=0.0)
+
+
+@pytest.fixture
+def model(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, 'RISK_LOCAL_ENABLED', False)  # 不受工作目錄中的本地風險模型檔影響
+    monkeypatch.setattr(ai_service, 'ai_cache', AIResultCache(str(tmp_path / 'ai_cache.db')))
+    return FakeModel()
+
+
+@pytest.fixture
+def client(model, clock):
+    client = ModerationClient(
+        max_concurrency=2, timeout_seconds=0.1,
+        breaker=CircuitBreaker(failure_threshold=3, reset_seconds=30, clock=lambda: clock.now),
+        model_getter=lambda: model
+    )
+    yield client
+    client._executor.shutdown(wait=True)  # 等逾時後仍在跑的呼叫結束，再還原 AI 快取
+
+
+def test_cache_and_keyword_skip_model(client, model):
+    """正常呼叫、相同內容命中快取、關鍵字命中都只呼叫模型一次"""
+    assert client.assess("幫忙搬宿舍行李", "日常支援")['data']['reason'] == '測試'
+    assert client.assess("幫忙搬宿舍行李 ", "日常支援").get('cached')
+    assert client.assess("幫我代考期末考", "學習互助")['data']['risk_level'] == 'critical'
+    assert model.calls == 1
+
+
+def test_timeout_degrades_and_caches_late_result(client, model):
+    """上游變慢時在期限內降級，不等模型回應；逾時後才完成的結果補進快取"""
+    model.latency = 0.5
+    start = time.perf_counter()
+    result = client.assess("協助活動攝影", "校園協助")
+
+    assert result['degraded'] == 'timeout'
+    assert time.perf_counter() - start < 0.4
+    assert result['data']['reason'].startswith('AI 審查逾時')
+
+    time.sleep(0.6)
+    assert client.assess("協助活動攝影", "校園協助").get('cached')
+    assert model.calls == 1
+
+
+def test_busy_when_slots_taken(client, model):
+    """額度被逾時的呼叫佔滿時立即回傳忙碌，不排隊；同時呼叫數不超過上限"""
+    model.latency = 0.5
+    assert client.assess("協助活動攝影", "校園協助")['degraded'] == 'timeout'
+    assert client.assess("教微積分解題", "學習互助")['degraded'] == 'timeout'
+
+    start = time.perf_counter()
+    assert client.assess("整理實驗數據", "學習互助")['degraded'] == 'busy'
+    assert time.perf_counter() - start < 0.05
+    assert model.calls == 2
+
+    time.sleep(0.6)
+    assert model.max_active <= 2
+    assert client.stats()['busy'] == 1
+
+
+def test_breaker_opens_and_recovers(client, model, clock):
+    """連續失敗後斷路器斷開、不再呼叫模型；冷卻後試探成功即恢復"""
+    model.fail = True
+    for i in range(3):
+        assert client.assess(f"幫忙修電腦 {i}", "日常支援")['degraded'] == 'error'
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    assert client.assess("組裝書桌家具", "日常支援")['degraded'] == 'circuit_open'
+    assert model.calls == 3
+
+    model.fail = False
+    clock.now += 30
+    assert client.breaker.state == CircuitBreaker.HALF_OPEN
+    assert 'degraded' not in client.assess("社團海報設計", "技能交換")
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_reopens_breaker(client, model, clock):
+    """冷卻後的試探呼叫失敗時重新斷開"""
+    model.fail = True
+    for i in range(3):
+        client.assess(f"幫忙修電腦 {i}", "日常支援")
+
+    clock.now += 30
+    assert client.assess("社團海報設計", "技能交換")['degraded'] == 'error'
+    assert client.breaker.state == CircuitBreaker.OPEN
+    assert model.calls == 4
+
+
+def test_worker_paused_while_breaker_open(monkeypatch, client, model, clock):
+    """斷路器斷開時工作者不領取佇列（不耗掉重試次數），冷卻後恢復領取"""
+    claims = []
+    monkeypatch.setattr(moderation_worker, 'claim_moderation_batch', lambda limit: claims.append(limit) or [])
+    worker = ModerationWorker(batch_size=5, interval=0, model_getter=lambda: model, client=client)
+
+    model.fail = True
+    for i in range(3):
+        client.assess(f"幫忙修電腦 {i}", "日常支援")
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    summary = worker.run_once()
+    assert summary['paused'] and summary['claimed'] == 0
+    assert claims == []
+    assert worker.stats()['paused'] == 1
+
+    worker.run(once=True)  # once 模式暫停時直接結束
+    assert claims == []
+
+    clock.now += 30
+    assert not worker.run_once()['paused']
+    assert claims == [5]
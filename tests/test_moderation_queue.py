@@ -0,0 +1,168 @@
+"""
+審查佇列測試 - Campus Help
+以暫存 SQLite 資料庫（見 conftest.py）測試 claim_moderation_batch 的領取規則，
+以及背景審查工作者的重試、降級放行與「審核中 → 開放 / 標記」的狀態轉換。
+
+執行：python -m pytest -q
+"""
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+import ai_service
+import database as db
+from ai_cache import AIResultCache
+from config import Config
+from moderation import CircuitBreaker, ModerationClient
+from moderation_worker import ModerationWorker
+
+
+class FakeModel:
+    """描述含「高風險」時回傳 high，其餘為 safe；fail=True 時每次呼叫都失敗"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = 0
+
+    @staticmethod
+    def verdict(body):
+        level = 'high' if '高風險' in body else 'safe'
+        return {'risk_level': level, 'risk_score': 0.9 if level == 'high' else 0.1,
+                'recommendation': '需人工審核' if level == 'high' else '自動通過', 'reason': '測試', 'flags': []}
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError('upstream 503')
+        if '逐一評估' in prompt:
+            parts = re.split(r'【任務 (\d+)】', prompt)[1:]
+            return SimpleNamespace(text=json.dumps(
+                [dict(self.verdict(body), id=int(i)) for i, body in zip(parts[::2], parts[1::2])], ensure_ascii=False
+            ))
+        return SimpleNamespace(text=json.dumps(self.verdict(prompt), ensure_ascii=False))
+
+
+@pytest.fixture
+def publisher(monkeypatch, tmp_path):
+    """重建測試資料，回傳一位發布者的 id"""
+    monkeypatch.setattr(Config, 'RISK_LOCAL_ENABLED', False)  # 不受工作目錄中的本地風險模型檔影響
+    monkeypatch.setattr(ai_service, 'ai_cache', AIResultCache(str(tmp_path / 'ai_cache.db')))
+    db.init_db()
+    db.seed_test_data()
+    with db.session_scope() as session:
+        return session.query(db.User.id).order_by(db.User.id).first()[0]
+
+
+def submit(publisher_id, description, title='測試任務'):
+    """以「審核中」狀態發布任務並排入審查佇列"""
+    return db.create_task({
+        'publisher_id': publisher_id,
+        'title': title,
+        'description': description,
+        'category': '日常支援',
+        'location': '宿舍',
+        'campus': '外雙溪校區',
+        'points_offered': 10
+    }, review=True)
+
+
+def make_worker(model, batch_size=10):
+    """斷路器門檻設高，讓重試次數只受 MODERATION_MAX_ATTEMPTS 決定"""
+    client = ModerationClient(max_concurrency=2, timeout_seconds=5, breaker=CircuitBreaker(failure_threshold=100))
+    return ModerationWorker(batch_size=batch_size, interval=0, model_getter=lambda: model, client=client)
+
+
+def task_status(task_id):
+    with db.session_scope() as session:
+        return session.query(db.Task.status).filter(db.Task.id == task_id).scalar()
+
+
+def open_index_ids():
+    index = db.get_open_task_index()
+    return set(index.task_ids[index.active_bitmap()].tolist())
+
+
+def test_back_to_back_claims_are_disjoint(publisher):
+    """連續兩次領取拿到不重疊的項目，領完後不再領到"""
+    task_ids = [submit(publisher, f"幫忙搬宿舍行李第 {i} 趟") for i in range(5)]
+
+    first = db.claim_moderation_batch(3)
+    second = db.claim_moderation_batch(3)
+
+    assert len(first) == 3 and len(second) == 2
+    assert {item['task_id'] for item in first} | {item['task_id'] for item in second} == set(task_ids)
+    assert not {item['queue_id'] for item in first} & {item['queue_id'] for item in second}
+    assert db.claim_moderation_batch(3) == []
+    assert db.get_moderation_queue_stats()['processing'] == 5
+
+
+def test_expired_claim_is_reclaimed(monkeypatch, publisher):
+    """處理中超過 MODERATION_CLAIM_TIMEOUT_SECONDS 的項目視為工作者中斷，可再領取且計入嘗試次數"""
+    task_id = submit(publisher, "幫忙搬宿舍行李")
+    [item] = db.claim_moderation_batch()
+    assert item['attempts'] == 1
+    assert db.claim_moderation_batch() == []
+
+    monkeypatch.setattr(Config, 'MODERATION_CLAIM_TIMEOUT_SECONDS', -1)
+    [reclaimed] = db.claim_moderation_batch()
+    assert (reclaimed['queue_id'], reclaimed['task_id'], reclaimed['attempts']) == (item['queue_id'], task_id, 2)
+
+
+def test_safe_verdict_opens_task(publisher):
+    """審查通過：審核中 → 開放，加入開放任務列表與推薦索引"""
+    task_id = submit(publisher, "幫忙搬宿舍行李")
+    assert task_status(task_id) == 'pending_review'
+    assert task_id not in {task['id'] for task in db.get_all_tasks(status='open')}
+    assert task_id not in open_index_ids()
+
+    summary = make_worker(FakeModel()).run_once()
+
+    assert (summary['claimed'], summary['open'], summary['flagged']) == (1, 1, 0)
+    assert task_status(task_id) == 'open'
+    assert task_id in {task['id'] for task in db.get_all_tasks(status='open')}
+    assert task_id in open_index_ids()
+    assert db.get_moderation_queue_stats()['done'] == 1
+
+
+def test_flagged_verdict_stays_out_of_open_tasks(publisher):
+    """高風險：審核中 → 標記，不出現在開放任務列表與推薦索引"""
+    safe_id = submit(publisher, "幫忙搬宿舍行李")
+    flagged_id = submit(publisher, "高風險的可疑委託")
+    db.get_open_task_index()  # 索引先建好，確認審查結果是增量更新
+
+    summary = make_worker(FakeModel()).run_once()
+
+    assert (summary['open'], summary['flagged']) == (1, 1)
+    assert task_status(flagged_id) == 'flagged'
+    assert flagged_id not in {task['id'] for task in db.get_all_tasks(status='open')}
+    assert flagged_id not in open_index_ids()
+    assert safe_id in open_index_ids()
+    assert db.get_moderation_queue_stats()['flagged_tasks'] == 1
+
+
+def test_failures_requeue_then_fall_back(publisher):
+    """模型失敗時放回佇列重試，達 MODERATION_MAX_ATTEMPTS 次後以關鍵字檢測結果放行"""
+    task_id = submit(publisher, "幫忙搬宿舍行李")
+    model = FakeModel(fail=True)
+    worker = make_worker(model)
+
+    for attempt in range(1, Config.MODERATION_MAX_ATTEMPTS):
+        summary = worker.run_once()
+        assert (summary['claimed'], summary['retried'], summary['fallback']) == (1, 1, 0)
+        assert task_status(task_id) == 'pending_review'
+        with db.session_scope() as session:
+            item = session.query(db.ModerationQueue).filter(db.ModerationQueue.task_id == task_id).one()
+            assert (item.status, item.attempts) == ('queued', attempt)
+            assert 'upstream 503' in item.error
+
+    summary = worker.run_once()
+    assert (summary['claimed'], summary['retried'], summary['fallback'], summary['open']) == (1, 0, 1, 1)
+    assert task_status(task_id) == 'open'
+    assert task_id in open_index_ids()
+    with db.session_scope() as session:
+        item = session.query(db.ModerationQueue).filter(db.ModerationQueue.task_id == task_id).one()
+        assert item.status == 'done'
+        assert json.loads(item.verdict)['source'] == 'fallback'
+    assert model.calls >= Config.MODERATION_MAX_ATTEMPTS
@@ -0,0 +1,119 @@
+"""
+時間表測試 - Campus Help
+時長文字解析、週時段位元集合、時段重疊評分。
+
+執行：python -m pytest -q
+"""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import schedule
+from matching_engine import MatchingEngine
+
+
+@pytest.mark.parametrize('text, minutes', [
+    ('2小時', 120),
+    ('30分鐘', 30),
+    ('1.5小時', 90),
+    ('1.5 小時', 90),
+    ('1小時30分鐘', 90),
+    ('1小時30分', 90),
+    ('半小時', 30),
+    ('兩個鐘頭', 120),
+    ('90 min', 90),
+    ('2h', 120),
+    ('約一小時半', 90),
+    ('十五分鐘', 15),
+    ('三十分鐘', 30),
+    ('二十五分', 25),
+    ('十小時', 600),
+    ('一小時三十分', 90),
+    ('一個半小時', 90),
+    ('兩個半鐘頭', 150),
+])
+def test_parse_duration_minutes(text, minutes):
+    assert schedule.parse_duration_minutes(text) == minutes
+
+
+@pytest.mark.parametrize('text', [None, '', '不確定', '看情況'])
+def test_parse_duration_minutes_unknown(text):
+    assert schedule.parse_duration_minutes(text) is None
+
+
+def test_parse_chinese_number():
+    assert [schedule.parse_chinese_number(text) for text in ('五', '十', '十五', '三十', '二十五', '九十九')] == [5, 10, 15, 30, 25, 99]
+    assert schedule.parse_chinese_number('十十') is None
+
+
+def test_encode_decode_round_trip():
+    availability = schedule.from_day_hours({0: range(18, 22), 2: range(9, 12)})
+
+    assert len(schedule.encode(availability)) == schedule.HEX_LENGTH
+    assert schedule.decode(schedule.encode(availability)) == availability
+    assert schedule.to_day_hours(availability)[2] == [9, 10, 11]
+    assert schedule.describe(availability) == '週一 18-22、週三 09-12'
+    assert schedule.encode(0) is None and schedule.decode(None) == 0
+
+
+def test_to_words_matches_bits():
+    bits = (1 << schedule.slot(6, 23)) | 1
+    words = schedule.to_words(schedule.encode(bits))
+
+    assert words.dtype == np.uint64 and len(words) == schedule.WORDS
+    assert sum(int(word) << (64 * i) for i, word in enumerate(words)) == bits
+
+
+def test_slots_between():
+    # 週一 18:30 起兩小時 → 18、19、20 點
+    assert schedule.task_slots('2026-10-19', '18:30', '2小時') == sum(1 << schedule.slot(0, hour) for hour in (18, 19, 20))
+    # 時長未知以 DEFAULT_DURATION_MINUTES 計
+    assert schedule.slots_between(datetime(2026, 10, 19, 9), None) == 1 << schedule.slot(0, 9)
+    # 沒有開始時間就沒有固定時段
+    assert schedule.task_slots(None, None, '2小時') == 0
+
+
+def test_slots_between_wraps_past_sunday_midnight():
+    assert schedule.task_slots('2026-10-25', '23:00', '2小時') == (1 << schedule.slot(6, 23)) | 1
+    # 超過一週的時長只佔滿一週
+    assert schedule.slots_between(datetime(2026, 10, 25, 23), 10 * 24 * 60) == schedule.FULL_WEEK
+
+
+def test_time_overlap_level():
+    engine = MatchingEngine()
+    availability = schedule.from_day_hours({0: range(18, 22)})
+    covered = schedule.from_day_hours({0: [18, 19]})
+    partial = schedule.from_day_hours({0: [21, 22]})
+    conflict = schedule.from_day_hours({1: [9]})
+
+    assert engine.time_overlap_level(availability, covered) == engine.TIME_COVERED
+    assert engine.time_overlap_level(availability, partial) == engine.TIME_PARTIAL
+    assert engine.time_overlap_level(availability, conflict) == engine.TIME_CONFLICT
+    assert engine.time_overlap_level(0, covered) == engine.TIME_UNKNOWN
+    assert engine.time_overlap_level(availability, 0) == engine.TIME_UNKNOWN
+
+    # 批次版與逐筆結果相同
+    slot_words = np.array([schedule.to_words(bits) for bits in (covered, partial, conflict, 0)])
+    levels = engine.time_overlap_levels(schedule.to_words(availability), slot_words)
+    assert levels.tolist() == [engine.time_overlap_level(availability, bits) for bits in (covered, partial, conflict, 0)]
+
+
+def test_calculate_time_score():
+    engine = MatchingEngine()
+    user = {'availability': schedule.encode(schedule.from_day_hours({0: range(18, 22)}))}
+
+    def score(hours, is_urgent=False):
+        return engine._calculate_time_score(user, {
+            'time_slots': schedule.encode(schedule.from_day_hours({0: hours})), 'is_urgent': is_urgent
+        })
+
+    assert score([18, 19]) == 1.0
+    assert score([21, 22]) == 0.6
+    assert score([8]) == 0.2
+    # 急件除非完全涵蓋，否則打八折
+    assert score([18, 19], is_urgent=True) == 1.0
+    assert score([21, 22], is_urgent=True) == pytest.approx(0.48)
+    # 任一方未設定時段視為有空
+    assert engine._calculate_time_score({}, {'time_slots': None}) == 1.0
+    assert engine._calculate_time_score({}, {'time_slots': None, 'is_urgent': True}) == 0.8
@@ -0,0 +1,144 @@
+"""
+本地風險模型訓練
+以 moderation_queue 中 AI 審查過的任務（可另加 JSONL 標註檔）訓練字元 n-gram 分類器：
+1. 標籤：審查結果為高風險/嚴重違規（任務會被標記）= 1，其餘 = 0
+2. 資料分成訓練 70%、選門檻 15%、評估 15%（依標籤分層抽樣）
+3. 在選門檻的資料上找不確定區間，在評估資料上輸出精確率/召回率與省下的 AI 呼叫比例
+4. 模型與評估報告存成 Config.RISK_MODEL_PATH，應用程式重新啟動後生效
+
+用法：
+    python train_risk_classifier.py
+    python train_risk_classifier.py --data labeled.jsonl      # 另加標註資料（每行 {"description", "category", "risk_level"}）
+    python train_risk_classifier.py --max-missed-rate 0.01 --min-flag-precision 0.98
+    python train_risk_classifier.py --output risk_model.npz --report report.json
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timezone
+
+from config import Config
+from database import init_db, iter_moderation_verdicts, is_flagged_verdict
+from risk_classifier import MIN_SAMPLES_PER_LABEL, classifier_text, fit, choose_thresholds, evaluate
+
+
+def load_samples(data_path=None, include_keyword=False):
+    """
+    讀取訓練資料
+
+    Returns:
+        tuple: (文字列表, 0/1 標籤列表)
+    """
+    texts, labels = [], []
+    sources = ('ai', 'keyword') if include_keyword else ('ai',)
+
+    for description, category, verdict in iter_moderation_verdicts(sources):
+        texts.append(classifier_text(description, category))
+        labels.append(int(is_flagged_verdict(verdict)))
+
+    if data_path:
+        with open(data_path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                risky = row['risky'] if 'risky' in row else is_flagged_verdict(row)
+                texts.append(classifier_text(row['description'], row.get('category')))
+                labels.append(int(bool(risky)))
+
+    return texts, labels
+
+
+def split_samples(texts, labels, seed=42):
+    """依標籤分層切成訓練 / 選門檻 / 評估三份（70% / 15% / 15%）"""
+    rng = random.Random(seed)
+    parts = ([], [], [])
+
+    for label in (0, 1):
+        indices = [i for i, value in enumerate(labels) if value == label]
+        rng.shuffle(indices)
+        train_end = int(len(indices) * 0.7)
+        tune_end = train_end + (len(indices) - train_end) // 2
+        parts[0].extend(indices[:train_end])
+        parts[1].extend(indices[train_end:tune_end])
+        parts[2].extend(indices[tune_end:])
+
+    return [([texts[i] for i in part], [labels[i] for i in part]) for part in parts]
+
+
+def train(texts, labels, max_missed_rate=0.02, min_flag_precision=0.95, min_df=2, epochs=400, seed=42):
+    """
+    訓練並評估
+
+    Returns:
+        tuple: (RiskClassifier, 評估報告 dict)
+    """
+    (train_texts, train_labels), (tune_texts, tune_labels), (test_texts, test_labels) = split_samples(texts, labels, seed)
+
+    classifier = fit(train_texts, train_labels, min_df=min_df, epochs=epochs)
+    classifier.low_threshold, classifier.high_threshold = choose_thresholds(
+        classifier.predict_many(tune_texts), tune_labels, max_missed_rate, min_flag_precision
+    )
+
+    report = evaluate(classifier, test_texts, test_labels)
+    report.update({
+        'train_samples': len(train_texts),
+        'tune_samples': len(tune_texts),
+        'features': len(classifier.vocabulary),
+        'max_missed_rate': max_missed_rate,
+        'min_flag_precision': min_flag_precision,
+        'trained_at': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M')
+    })
+    classifier.metadata = report
+    return classifier, report
+
+
+def print_report(report):
+    """輸出評估報告"""
+    print(f"\n📊 評估資料 {report['samples']:,} 筆（違規 {report['positives']:,}），特徵 {report['features']:,} 個")
+    print(f"   門檻 0.5：精確率 {report['precision']:.1%}、召回率 {report['recall']:.1%}")
+    print(f"   不確定區間：[{report['low_threshold']:.3f}, {report['high_threshold']:.3f})")
+    print(f"   本地判定：安全 {report['local_safe']:,}、需人工審核 {report['local_risky']:,}，"
+          f"省下 {report['avoided_rate']:.1%} 的 AI 呼叫")
+    print(f"   本地判定正確率 {report['local_accuracy']:.1%}、標記精確率 {report['flag_precision']:.1%}、"
+          f"判定安全但實為違規 {report['missed_risky']:,} 筆")
+    print(f"   單則預測平均 {report['avg_us']:.0f} µs")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='以歷史審查結果訓練本地風險模型')
+    parser.add_argument('--data', default=None, help='另加的 JSONL 標註資料')
+    parser.add_argument('--include-keyword', action='store_true', help='也使用關鍵字檢測的審查結果')
+    parser.add_argument('--output', default=Config.RISK_MODEL_PATH, help='模型檔路徑')
+    parser.add_argument('--report', default=None, help='評估報告 JSON 路徑')
+    parser.add_argument('--max-missed-rate', type=float, default=0.02, help='判定安全時可容許漏掉的違規比例')
+    parser.add_argument('--min-flag-precision', type=float, default=0.95, help='判定需人工審核時的最低精確率')
+    parser.add_argument('--min-df', type=int, default=2, help='n-gram 至少出現在幾筆資料')
+    parser.add_argument('--epochs', type=int, default=400, help='訓練回合數')
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("  Campus Help 本地風險模型訓練")
+    print("=" * 50)
+
+    init_db()
+    texts, labels = load_samples(args.data, args.include_keyword)
+    positives = sum(labels)
+    print(f"\n📦 訓練資料 {len(texts):,} 筆（違規 {positives:,}）")
+
+    if min(positives, len(labels) - positives) < MIN_SAMPLES_PER_LABEL:
+        print(f"❌ 資料不足：違規與正常各需至少 {MIN_SAMPLES_PER_LABEL} 筆，未產生模型")
+        raise SystemExit(1)
+
+    classifier, report = train(
+        texts, labels, args.max_missed_rate, args.min_flag_precision, args.min_df, args.epochs
+    )
+    print_report(report)
+
+    classifier.save(args.output)
+    print(f"\n✅ 模型已存到 {args.output}")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ 評估報告已存到 {args.report}")